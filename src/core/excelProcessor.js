@@ -8,17 +8,48 @@ import notification from '../components/Notification.js';
 import utilsNormalizersCode from '../python/utils_normalizers.py?raw';
 import excelUtilsCode from '../python/excel_utils.py?raw';
 import calculatorsMetricsCode from '../python/calculators_metrics.py?raw';
+import processorComumCode from '../python/processor_comum.py?raw';
+import processorLeveCode from '../python/processor_leve.py?raw';
 import mainProcessorCode from '../python/processor.py?raw';
 import configJson from '../python/config.json?raw';
 
 
+/**
+ * Converte o resultado colunar do Python ({formato: 'colunar', total, colunas: {campo: [valores]}, warnings, metrics})
+ * no formato {data, warnings, metrics} usado pela tabela do processador. Resultados já em registros passam direto.
+ */
+export function decodificarColunar(result) {
+    if (result.formato !== 'colunar') return result;
+
+    const { formato, total, colunas, ...resto } = result;
+    const campos = Object.keys(colunas);
+    const data = new Array(total);
+    for (let i = 0; i < total; i++) {
+        const registro = {};
+        for (const campo of campos) {
+            registro[campo] = colunas[campo][i];
+        }
+        data[i] = registro;
+    }
+    return { data, ...resto };
+}
+
 class ExcelProcessor {
     constructor() {
         this.pyodide = null;
         this.isLoaded = false;
         this.isLoading = false;
-        // Ordem de execução: Utilitários -> Utils Excel -> Cálculos -> Orquestrador
+        this.motorPandas = null;
+        // Motor leve (só openpyxl): carregado na inicialização, atende processFile
         this.pythonModules = [
+            { name: 'Excel Utils', code: excelUtilsCode },
+            { name: 'Processor Comum', code: processorComumCode },
+            { name: 'Processor Leve', code: processorLeveCode },
+        ];
+        // Motor pandas, carregado sob demanda (streaming, lote de meses, fallback)
+        // Ordem de execução: Comum -> Utilitários -> Utils Excel -> Cálculos -> Orquestrador
+        this.pandasModules = [
+            { name: 'Processor Comum', code: processorComumCode },
             { name: 'Utils Normalizers', code: utilsNormalizersCode },
             { name: 'Excel Utils', code: excelUtilsCode },
             { name: 'Calculators Metrics', code: calculatorsMetricsCode },
@@ -26,6 +57,40 @@ class ExcelProcessor {
         ];
     }
 
+    /**
+     * Executa os scripts Python em ordem no escopo global do Pyodide
+     */
+    runModules(modules) {
+        for (const module of modules) {
+            try {
+                this.pyodide.runPython(module.code);
+            } catch (pyError) {
+                console.error(`Erro ao executar módulo Python: ${module.name}`, pyError);
+                throw new Error(`Falha na inicialização do código Python: ${module.name}.`);
+            }
+        }
+    }
+
+    /**
+     * Carrega o pandas e o processor.py (uma vez só), que define
+     * processar_relatorio_para_fatura ao lado do processar_relatorio_leve.
+     */
+    async carregarMotorPandas() {
+        if (!this.isLoaded) {
+            await this.init();
+        }
+        if (!this.motorPandas) {
+            this.motorPandas = (async () => {
+                await this.pyodide.loadPackage(['pandas']);
+                this.runModules(this.pandasModules);
+            })().catch(error => {
+                this.motorPandas = null;
+                throw error;
+            });
+        }
+        return this.motorPandas;
+    }
+
     /**
      * Inicializa o Pyodide
      */
@@ -44,8 +109,9 @@ class ExcelProcessor {
             if (statusCallback) statusCallback('Carregando Pyodide...');
             this.pyodide = await loadPyodide();
 
+            // Só o micropip: o pandas fica para quando o motor pandas for pedido
             if (statusCallback) statusCallback('Carregando pacotes Python...');
-            await this.pyodide.loadPackage(['pandas', 'micropip']);
+            await this.pyodide.loadPackage(['micropip']);
 
             if (statusCallback) statusCallback('Instalando openpyxl...');
             await this.pyodide.pyimport('micropip').install('openpyxl');
@@ -60,15 +126,8 @@ class ExcelProcessor {
                 console.warn('⚠ Não foi possível escrever config.json no Pyodide:', fsError);
             }
 
-            // **Executar TODOS os scripts Python em ordem**
-            for (const module of this.pythonModules) {
-                try {
-                    this.pyodide.runPython(module.code);
-                } catch (pyError) {
-                    console.error(`Erro ao executar módulo Python: ${module.name}`, pyError);
-                    throw new Error(`Falha na inicialização do código Python: ${module.name}.`);
-                }
-            }
+            // **Executar os scripts do motor leve em ordem**
+            this.runModules(this.pythonModules);
 
             this.isLoaded = true;
             this.isLoading = false;
@@ -82,6 +141,26 @@ class ExcelProcessor {
         }
     }
 
+    /**
+     * Passa o arquivo ao Python como JsBuffer (sem toPy): a única cópia é a da
+     * memória do JS para a do WASM, feita em abrir_planilha (excel_utils.py)
+     */
+    async enviarArquivo(file) {
+        const uint8Array = new Uint8Array(await file.arrayBuffer());
+        this.pyodide.globals.set('file_content_js', uint8Array);
+    }
+
+    /**
+     * Solta a referência do Python ao arquivo (o buffer pode ser coletado)
+     */
+    liberarArquivo() {
+        try {
+            this.pyodide.globals.delete('file_content_js');
+        } catch {
+            // Nada a liberar
+        }
+    }
+
     /**
      * Processa arquivo Excel
      */
@@ -91,16 +170,94 @@ class ExcelProcessor {
         }
 
         try {
-            const arrayBuffer = await file.arrayBuffer();
-            const uint8Array = new Uint8Array(arrayBuffer);
-
-            this.pyodide.globals.set('file_content_js', this.pyodide.toPy(uint8Array));
+            await this.enviarArquivo(file);
             this.pyodide.globals.set('mes_referencia_js', mesReferencia + '-01');
             this.pyodide.globals.set('vencimento_js', dataVencimento);
 
-            // A função processar_relatorio_para_fatura agora está no escopo global
+            // Motor leve primeiro (mesmo JSON do processor.py, sem pandas).
+            // Formato colunar: cada nome de campo trafega uma vez só pela ponte Python→JS
+            let result = JSON.parse(await this.pyodide.runPythonAsync(
+                "processar_relatorio_leve(file_content_js, mes_referencia_js, vencimento_js, 'colunar')"
+            ));
+
+            // Erro inesperado no motor leve: refaz com o motor pandas
+            if (result.error && result.error.startsWith('Erro crítico')) {
+                console.warn('⚠ Motor leve falhou, usando o motor pandas:', result.error);
+                await this.carregarMotorPandas();
+                result = JSON.parse(await this.pyodide.runPythonAsync(
+                    "processar_relatorio_para_fatura(file_content_js, mes_referencia_js, vencimento_js, 'colunar')"
+                ));
+            }
+
+            // Tempo por etapa (abertura, cabeçalhos, leitura, filtro, clientes, métricas, serialização)
+            if (result.metrics) {
+                console.table(result.metrics.etapas);
+            }
+
+            if (result.error) {
+                throw new Error(result.error);
+            }
+
+            // O novo formato de retorno é {data, warnings, metrics}
+            return decodificarColunar(result);
+        } catch (error) {
+            console.error('Erro no processamento Python:', error);
+            throw error;
+        } finally {
+            this.liberarArquivo();
+        }
+    }
+
+    /**
+     * Processa arquivo Excel em streaming (NDJSON): entrega os clientes conforme
+     * são calculados, sem esperar o mês inteiro.
+     * @param {Function} onWarning - chamado para cada warning (opcional)
+     * @returns {AsyncGenerator<Object>} clientes, um a um
+     */
+    async *processFileStream(file, mesReferencia, dataVencimento, onWarning) {
+        await this.carregarMotorPandas();
+
+        await this.enviarArquivo(file);
+        this.pyodide.globals.set('mes_referencia_js', mesReferencia + '-01');
+        this.pyodide.globals.set('vencimento_js', dataVencimento);
+
+        const linhas = this.pyodide.runPython(
+            'processar_relatorio_ndjson(file_content_js, mes_referencia_js, vencimento_js)'
+        );
+
+        try {
+            for (const linha of linhas) {
+                const registro = JSON.parse(linha);
+                if (registro.type === 'error') {
+                    throw new Error(registro.error);
+                } else if (registro.type === 'warning') {
+                    if (onWarning) onWarning(registro);
+                } else if (registro.type === 'cliente') {
+                    yield registro.data;
+                }
+            }
+        } finally {
+            linhas.destroy();
+            this.liberarArquivo();
+        }
+    }
+
+    /**
+     * Processa várias competências com uma única leitura da planilha
+     * @param {Array<{mesReferencia: string, dataVencimento: string}>} competencias
+     * @returns {Promise<Array>} um item por competência ({data, warnings} ou {error})
+     */
+    async processFileMultiMonth(file, competencias) {
+        await this.carregarMotorPandas();
+
+        try {
+            const pares = competencias.map(c => [c.mesReferencia + '-01', c.dataVencimento]);
+
+            await this.enviarArquivo(file);
+            this.pyodide.globals.set('competencias_js', this.pyodide.toPy(pares));
+
             const resultJson = await this.pyodide.runPythonAsync(
-                'processar_relatorio_para_fatura(file_content_js, mes_referencia_js, vencimento_js)'
+                'processar_relatorio_multimeses(file_content_js, competencias_js)'
             );
 
             const result = JSON.parse(resultJson);
@@ -109,11 +266,12 @@ class ExcelProcessor {
                 throw new Error(result.error);
             }
 
-            // O novo formato de retorno é {data, warnings}
-            return result;
+            return result.resultados;
         } catch (error) {
-            console.error('Erro no processamento Python:', error);
+            console.error('Erro no processamento Python (lote):', error);
             throw error;
+        } finally {
+            this.liberarArquivo();
         }
     }
 
@@ -166,7 +324,8 @@ import json
 try:
     config = carregar_config()
     if config.get('enable_external_client_db'):
-        mapa = carregar_base_clientes_externa(config)
+        # Leitor do motor leve: sempre carregado, com ou sem o motor pandas
+        mapa = carregar_base_clientes_externa_leve(config)
         json.dumps({"loaded": True, "recordCount": len(mapa)})
     else:
         json.dumps({"loaded": False, "recordCount": 0})
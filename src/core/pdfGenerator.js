@@ -159,18 +159,22 @@ class PDFGenerator {
 
     /**
      * Gera múltiplos PDFs e compacta em ZIP
+     * @param {Array|AsyncIterable} clients - lista ou fluxo (ex: excelProcessor.processFileStream);
+     *   com fluxo, o total no progressCallback é desconhecido (null)
      */
     async generateZIP(clients, mesReferencia, progressCallback) {
         const zip = new JSZip();
+        const total = Array.isArray(clients) ? clients.length : null;
 
-        for (let i = 0; i < clients.length; i++) {
-            const client = clients[i];
+        let i = 0;
+        for await (const client of clients) {
+            i++;
             try {
                 const { blob, filename } = await this.generatePDF(client, mesReferencia);
                 zip.file(filename, blob);
 
                 if (progressCallback) {
-                    progressCallback(i + 1, clients.length);
+                    progressCallback(i, total);
                 }
             } catch (error) {
                 console.error(`Erro ao gerar PDF para ${client.nome}:`, error);
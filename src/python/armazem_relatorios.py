@@ -0,0 +1,435 @@
+"""
+Armazém em disco dos relatórios: as abas Detalhe e Infos Clientes são
+convertidas uma vez para um banco SQLite e as competências passam a ser
+consultadas sem abrir o .xlsx de novo.
+
+Cada relatório mensal traz o histórico inteiro; processar_relatorio_para_fatura
+relê a planilha toda a cada chamada. Aqui a leitura acontece só na ingestão:
+
+    detalhe   só as colunas usadas do Detalhe (COLUMNS_MAP + UC), uma coluna
+              SQLite por coluna da planilha, com chave primária (mes, emitir,
+              linha) numa tabela WITHOUT ROWID: as linhas de cada competência
+              ficam contíguas no disco (partição por mês) e o filtro do mês
+              (REF no mês e boleto >= R$ 5) é uma faixa da própria chave.
+              A coluna uc guarda a UC limpa (limpar_uc) das linhas a emitir,
+              com índice (mes, uc) para a busca de um cliente
+    tipos     dtype de cada coluna no DataFrame do mês inteiro
+    fichas    fichas da aba Infos Clientes, uma coluna por campo cadastral
+    chaves    UC -> ficha, na ordem do mapa original (UC crua e UC limpa)
+    meta      origem (sha256), layout do Detalhe e nomes das colunas
+
+As linhas a emitir guardam os valores do DataFrame do mês (a inferência de
+tipos do pandas é feita uma vez, na ingestão, sobre o mês inteiro) e a tabela
+tipos guarda o dtype de cada coluna; as demais linhas ficam como a leitura da
+planilha as entrega. O que o SQLite não guarda nativamente (datas, horas,
+booleanos, NaN, inteiros fora de 64 bits) vai como JSON marcado com o tipo num
+BLOB (ver _codificar). Assim o mês, ou só as linhas de uma UC, é remontado com
+os mesmos valores e tipos, e o JSON é o mesmo do processar_relatorio_para_fatura
+(só o bloco "metrics" muda).
+
+Uso:
+    python armazem_relatorios.py ingerir relatorio.xlsx armazem.db
+    python armazem_relatorios.py meses armazem.db
+    python armazem_relatorios.py processar armazem.db --mes 2025-11 --vencimento 2025-12-10
+    python armazem_relatorios.py cliente armazem.db --mes 2025-11 --vencimento 2025-12-10 --uc 10/1234-5
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import sys
+import traceback
+from contextlib import closing
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pandas as pd
+
+from excel_utils import WorkbookIndex, abrir_planilha, iter_sheet_rows, frame_from_rows
+from processor import (
+    ler_clientes_do_relatorio, carregar_base_clientes_externa, montar_clientes,
+    _periodo_da_linha, _ids_das_linhas, _limpar_uc_serie,
+)
+from processor_comum import (
+    FORMATOS_RESULTADO, carregar_config, mapear_detalhe, limpar_uc, periodo_referencia,
+    carregar_base_externa_medida, mesclar_mapas_clientes, MedidorEtapas, _json_com_metricas,
+)
+
+VERSAO_ARMAZEM = 2
+
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+
+# =================================================================
+# VALORES E METADADOS
+# =================================================================
+
+# Tipo marcado -> (valor para o JSON, valor de volta)
+_CODIFICACOES = {
+    bool: ("bool", lambda v: v, bool),
+    int: ("int", str, int),
+    float: ("float", repr, float),  # nan, inf, -inf
+    datetime: ("datetime", datetime.isoformat, datetime.fromisoformat),
+    date: ("date", date.isoformat, date.fromisoformat),
+    time: ("time", time.isoformat, time.fromisoformat),
+    timedelta: ("timedelta", lambda v: [v.days, v.seconds, v.microseconds], lambda v: timedelta(*v)),
+    # Colunas datetime64 do DataFrame do mês
+    pd.Timestamp: ("timestamp", pd.Timestamp.isoformat, pd.Timestamp),
+    type(pd.NaT): ("nat", lambda v: None, lambda v: pd.NaT),
+}
+_DECODIFICACOES = {marca: para_valor for marca, _, para_valor in _CODIFICACOES.values()}
+
+def _codificar(valor):
+    """
+    Texto, inteiro (64 bits) e float finito vão nativos; o resto vai como
+    JSON ["tipo", valor] num BLOB (texto da planilha nunca vira BLOB).
+    """
+    tipo = type(valor)
+    if valor is None or tipo is str:
+        return valor
+    if tipo is int and _INT64[0] <= valor <= _INT64[1]:
+        return valor
+    if tipo is float and math.isfinite(valor):
+        return valor
+    if tipo not in _CODIFICACOES:
+        raise TypeError(f"Valor do tipo {tipo.__name__} não pode ser armazenado: {valor!r}")
+    marca, para_json, _ = _CODIFICACOES[tipo]
+    return json.dumps([marca, para_json(valor)]).encode()
+
+def _decodificar(valor):
+    if not isinstance(valor, bytes):
+        return valor
+    marca, valor_json = json.loads(valor)
+    return _DECODIFICACOES[marca](valor_json)
+
+def _sha256(fonte):
+    """sha256 do arquivo aberto por abrir_planilha, em blocos; volta ao início."""
+    h = hashlib.sha256()
+    for bloco in iter(lambda: fonte.read(1 << 20), b""):
+        h.update(bloco)
+    fonte.seek(0)
+    return h.hexdigest()
+
+def _ler_meta(con):
+    try:
+        return {chave: json.loads(valor) for chave, valor in con.execute("SELECT chave, valor FROM meta")}
+    except sqlite3.OperationalError:
+        return {}  # banco novo, ainda sem tabelas
+
+def _texto_mes(periodo):
+    return f"{periodo // 100:04d}-{periodo % 100:02d}"
+
+def _resumo(con, meta):
+    meses = {
+        _texto_mes(mes): {"linhas": linhas, "emitir": emitir}
+        for mes, linhas, emitir in con.execute(
+            "SELECT mes, COUNT(*), SUM(emitir) FROM detalhe GROUP BY mes ORDER BY mes")
+    }
+    clientes = con.execute("SELECT COUNT(*) FROM fichas").fetchone()[0]
+    return {
+        "origem": meta.get("origem"), "sha256": meta.get("sha256"), "ingerido_em": meta.get("ingerido_em"),
+        "linhas": sum(m["linhas"] for m in meses.values()), "clientes": clientes, "meses": meses,
+    }
+
+
+# =================================================================
+# INGESTÃO
+# =================================================================
+
+def _indexar_meses(con, meta):
+    """
+    Para cada mês com linhas a emitir, monta o DataFrame do mês uma vez (mesma
+    inferência de tipos do read_excel) e grava nas linhas os valores dele, a UC
+    limpa de cada linha (coluna uc) e os dtypes das colunas (tabela tipos).
+    A inferência depende do mês inteiro (ex: "123" só vira número se a coluna
+    toda for numérica; 0 e False iguais viram o primeiro que aparece), por isso
+    as leituras não a refazem: remontam o DataFrame com os dtypes gravados.
+    """
+    n_colunas = len(meta["colunas"])
+    colunas = ", ".join(f"c{i}" for i in range(n_colunas))
+    atribuicoes = "".join(f", c{i} = ?" for i in range(n_colunas))
+    for (mes,) in con.execute("SELECT DISTINCT mes FROM detalhe WHERE emitir = 1").fetchall():
+        linhas = con.execute(f"SELECT linha, {colunas} FROM detalhe WHERE mes = ? AND emitir = 1 ORDER BY linha",
+                             (mes,)).fetchall()
+        df_mes = frame_from_rows(([_decodificar(v) for v in linha[1:]] for linha in linhas), meta["colunas"])
+        ucs = _limpar_uc_serie(_ids_das_linhas(df_mes.set_axis(meta["colunas"], axis=1), meta["col_inst"]))
+        valores = zip(*(df_mes.iloc[:, i].tolist() for i in range(n_colunas)))
+        con.executemany(f"UPDATE detalhe SET uc = ?{atribuicoes} WHERE mes = ? AND emitir = 1 AND linha = ?",
+                        ((uc, *map(_codificar, celulas), mes, linha[0])
+                         for uc, celulas, linha in zip(ucs.tolist(), valores, linhas)))
+        con.executemany("INSERT INTO tipos VALUES (?, ?, ?)",
+                        ((mes, i, str(tipo)) for i, tipo in enumerate(df_mes.dtypes)))
+
+def _gravar(con, meta, linhas_detalhe, mapa_interno):
+    """Recria as tabelas numa única transação (o armazém guarda um relatório só)."""
+    n_colunas = len(meta["colunas"])
+    campos = meta["campos_clientes"]
+    colunas_det = ", ".join(f"c{i}" for i in range(n_colunas))
+    colunas_fichas = "".join(f", f{i}" for i in range(len(campos)))
+
+    con.execute("BEGIN")
+    try:
+        for tabela in ("detalhe", "tipos", "fichas", "chaves", "meta"):
+            con.execute(f"DROP TABLE IF EXISTS {tabela}")
+        con.execute(f"CREATE TABLE detalhe (mes INTEGER NOT NULL, emitir INTEGER NOT NULL, linha INTEGER NOT NULL, "
+                    f"uc TEXT, {colunas_det}, PRIMARY KEY (mes, emitir, linha)) WITHOUT ROWID")
+        con.execute("CREATE TABLE tipos (mes INTEGER NOT NULL, coluna INTEGER NOT NULL, tipo TEXT NOT NULL, "
+                    "PRIMARY KEY (mes, coluna)) WITHOUT ROWID")
+        con.execute(f"CREATE TABLE fichas (id INTEGER PRIMARY KEY{colunas_fichas})")
+        con.execute("CREATE TABLE chaves (ordem INTEGER PRIMARY KEY, chave TEXT NOT NULL, ficha INTEGER NOT NULL)")
+        con.execute("CREATE TABLE meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+
+        con.executemany(f"INSERT INTO detalhe VALUES (?, ?, ?, NULL{', ?' * n_colunas})", linhas_detalhe)
+        _indexar_meses(con, meta)
+        con.execute("CREATE INDEX detalhe_uc ON detalhe (mes, uc)")
+
+        # Chave crua e chave limpa apontam para a mesma ficha: a ficha é gravada uma vez
+        ids = {}
+        for ordem, (chave, ficha) in enumerate((mapa_interno or {}).items()):
+            if id(ficha) not in ids:
+                ids[id(ficha)] = len(ids)
+                con.execute(f"INSERT INTO fichas VALUES (?{', ?' * len(campos)})",
+                            (ids[id(ficha)], *(ficha.get(c) for c in campos)))
+            con.execute("INSERT INTO chaves VALUES (?, ?, ?)", (ordem, chave, ids[id(ficha)]))
+
+        con.executemany("INSERT INTO meta VALUES (?, ?)", [(k, json.dumps(v)) for k, v in meta.items()])
+        con.execute("COMMIT")
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+
+def ingerir_relatorio(file_content, caminho_db, forcar=False):
+    """
+    Converte as abas Detalhe e Infos Clientes do relatório para o armazém em
+    `caminho_db`, substituindo o relatório anterior. Um arquivo já ingerido
+    (mesmo sha256) não é lido de novo, a menos que `forcar`.
+    file_content: bytes, buffer ou caminho (ver abrir_planilha).
+    Retorna o resumo do armazém (ver meses_armazenados) ou {"error": ...}.
+    """
+    config = carregar_config()
+    with closing(sqlite3.connect(caminho_db, isolation_level=None)) as con, \
+            abrir_planilha(file_content) as fonte:
+        assinatura = _sha256(fonte)
+        meta_atual = _ler_meta(con)
+        if not forcar and meta_atual.get("sha256") == assinatura and meta_atual.get("versao") == VERSAO_ARMAZEM:
+            print(f"⚡ Relatório já armazenado em {caminho_db}")
+            return {**_resumo(con, meta_atual), "reaproveitado": True}
+
+        xls = pd.ExcelFile(fonte, engine='openpyxl')
+        indice = WorkbookIndex.from_excel_file(xls)
+        det, erro = mapear_detalhe(indice, config)
+        if erro: return erro
+
+        # Linhas sem REF válida nunca entram num mês: ficam fora do armazém
+        periodo = _periodo_da_linha(det['colunas'], det['posicoes'], det['cols_map'], None, filtrar_boleto=False)
+        emitida = _periodo_da_linha(det['colunas'], det['posicoes'], det['cols_map'], None)
+
+        def linhas_detalhe():
+            for n, linha in enumerate(iter_sheet_rows(xls.book, det['aba'], det['h_idx'], det['posicoes'])):
+                mes = periodo(linha)
+                if mes is not None:
+                    yield (mes, int(emitida(linha) is not None), n, *map(_codificar, linha))
+
+        mapa_interno = ler_clientes_do_relatorio(xls, indice)
+        primeira_ficha = next(iter((mapa_interno or {}).values()), {})
+        meta = {
+            "versao": VERSAO_ARMAZEM,
+            "sha256": assinatura,
+            "origem": str(file_content) if isinstance(file_content, (str, os.PathLike)) else None,
+            "ingerido_em": datetime.now().isoformat(timespec='seconds'),
+            "aba": det['aba'],
+            "colunas": [det['colunas'][i] for i in det['posicoes']],
+            "cols_map": det['cols_map'],
+            "col_inst": det['col_inst'],
+            "campos_clientes": list(primeira_ficha),
+            "clientes_no_relatorio": mapa_interno is not None,
+        }
+        _gravar(con, meta, linhas_detalhe(), mapa_interno)
+        resumo = _resumo(con, meta)
+        print(f"✓ Armazém {caminho_db}: {resumo['linhas']} linhas em {len(resumo['meses'])} meses, "
+              f"{resumo['clientes']} clientes")
+        return {**resumo, "reaproveitado": False}
+
+
+# =================================================================
+# CONSULTAS
+# =================================================================
+
+def _conectar_leitura(caminho_db):
+    if not os.path.isfile(caminho_db):
+        raise FileNotFoundError(f"Armazém não encontrado: {caminho_db}")
+    return closing(sqlite3.connect(f"file:{Path(caminho_db).resolve().as_posix()}?mode=ro", uri=True))
+
+def meses_armazenados(caminho_db):
+    """
+    Resumo do armazém: origem, nº de linhas e de clientes e, por mês 'AAAA-MM',
+    {"linhas": linhas com REF no mês, "emitir": as que passam no filtro do boleto}.
+    """
+    with _conectar_leitura(caminho_db) as con:
+        return _resumo(con, _ler_meta(con))
+
+def _remontar(con, meta, periodo, cursor):
+    """DataFrame das linhas do `cursor` com os dtypes gravados do mês, sem nova inferência."""
+    linhas = [[_decodificar(v) for v in linha] for linha in cursor]
+    tipos = [tipo for (tipo,) in con.execute("SELECT tipo FROM tipos WHERE mes = ? ORDER BY coluna", (periodo,))]
+    if not linhas:
+        return pd.DataFrame(columns=meta["colunas"])
+    df = pd.DataFrame({i: pd.Series(valores, dtype=tipo) for i, (valores, tipo) in enumerate(zip(zip(*linhas), tipos))})
+    df.columns = meta["colunas"]
+    return df
+
+def ler_mes_armazenado(con, meta, periodo):
+    """
+    DataFrame do mês (AAAAMM) como ler_detalhe_do_mes o leria da planilha:
+    só a partição do mês, já com o filtro do boleto, na ordem das linhas.
+    """
+    colunas = ", ".join(f"c{i}" for i in range(len(meta["colunas"])))
+    cursor = con.execute(f"SELECT {colunas} FROM detalhe WHERE mes = ? AND emitir = 1 ORDER BY linha", (periodo,))
+    return _remontar(con, meta, periodo, cursor)
+
+def ler_uc_armazenada(con, meta, periodo, chave):
+    """
+    Linhas do mês (AAAAMM) cuja UC limpa é `chave`, iguais às do DataFrame do
+    mês inteiro. Lê só as linhas da UC, pelo índice (mes, uc).
+    """
+    colunas = ", ".join(f"c{i}" for i in range(len(meta["colunas"])))
+    cursor = con.execute(f"SELECT {colunas} FROM detalhe WHERE mes = ? AND uc = ? AND emitir = 1 ORDER BY linha",
+                         (periodo, chave))
+    return _remontar(con, meta, periodo, cursor)
+
+def ler_clientes_armazenados(con, meta):
+    """Mapa UC -> ficha da aba Infos Clientes (None se o relatório não tinha a aba)."""
+    if not meta["clientes_no_relatorio"]:
+        return None
+    campos = meta["campos_clientes"]
+    colunas = "".join(f", f{i}" for i in range(len(campos)))
+    fichas = {linha[0]: {c: v for c, v in zip(campos, linha[1:])}
+              for linha in con.execute(f"SELECT id{colunas} FROM fichas")}
+    return {chave: fichas[ficha] for chave, ficha in con.execute("SELECT chave, ficha FROM chaves ORDER BY ordem")}
+
+def _preparar_mes_armazenado(caminho_db, mes_referencia_str, medidor, uc=None):
+    """
+    Como _preparar_mes do processor.py, lendo do armazém. Com `uc`, só as
+    linhas dessa UC. Retorna (df_mes, meta, mapa_clientes, erro).
+    """
+    if not os.path.isfile(caminho_db):
+        return None, None, None, {"error": f"Armazém não encontrado: {caminho_db}. Ingira o relatório antes."}
+    with _conectar_leitura(caminho_db) as con:
+        meta = _ler_meta(con)
+        if meta.get("versao") != VERSAO_ARMAZEM:
+            return None, None, None, {"error": f"Armazém {caminho_db} vazio ou de outra versão: ingira o relatório de novo."}
+
+        periodo = periodo_referencia(mes_referencia_str)
+        with medidor.etapa("leitura_armazem") as info:
+            if uc is None:
+                df_mes = ler_mes_armazenado(con, meta, periodo)
+            else:
+                df_mes = ler_uc_armazenada(con, meta, periodo, limpar_uc(uc))
+            info["linhas"] = len(df_mes)
+        if df_mes.empty and uc is not None:
+            return None, None, None, {"error": f"UC {uc} não encontrada em {mes_referencia_str}."}
+        if df_mes.empty:
+            return None, None, None, {"error": f"Nenhum registro encontrado para {mes_referencia_str}. Verifique se a data na planilha bate com a data selecionada."}
+
+        mapa_clientes = carregar_base_externa_medida(carregar_base_clientes_externa, medidor=medidor)
+        with medidor.etapa("base_interna") as info:
+            mapa_interno = ler_clientes_armazenados(con, meta)
+            info["linhas"] = len(mapa_interno or ())
+    return df_mes, meta, mesclar_mapas_clientes(mapa_clientes, mapa_interno, medidor), None
+
+def processar_mes_armazenado(caminho_db, mes_referencia_str, vencimento_str, formato='registros'):
+    """
+    processar_relatorio_para_fatura sobre o relatório ingerido: mesmo JSON,
+    lendo do armazém só a partição do mês (etapa "leitura_armazem").
+    """
+    if formato not in FORMATOS_RESULTADO:
+        return json.dumps({"error": f"Formato de resultado desconhecido: {formato}. Use {FORMATOS_RESULTADO}."})
+    medidor = MedidorEtapas()
+    try:
+        df_mes, meta, mapa_clientes, erro = _preparar_mes_armazenado(caminho_db, mes_referencia_str, medidor)
+        if erro: return _json_com_metricas(erro, medidor)
+
+        with medidor.etapa("metricas") as info:
+            clientes, warnings = montar_clientes(df_mes, meta['cols_map'], meta['col_inst'], mapa_clientes, vencimento_str,
+                                                 formato=formato)
+            info["linhas"] = len(df_mes)
+
+        if formato == 'colunar':
+            return _json_com_metricas({"formato": "colunar", "total": len(df_mes), "colunas": clientes, "warnings": warnings}, medidor)
+        return _json_com_metricas({"data": clientes, "warnings": warnings}, medidor)
+
+    except Exception as e:
+        return json.dumps({"error": f"Erro crítico: {traceback.format_exc()}"})
+
+def buscar_cliente_armazenado(caminho_db, instalacao, mes_referencia_str, vencimento_str):
+    """
+    Registro de uma UC no mês, igual ao que processar_mes_armazenado traria
+    para ela (para o corretor reabrir um cliente sem reprocessar a planilha).
+    A UC casa pela chave limpa (limpar_uc) e só as linhas dela são lidas.
+    Retorna {"data": registro, "warnings": [...]} ou {"error": ...}; os warnings
+    se referem só às linhas da UC.
+    """
+    medidor = MedidorEtapas()
+    try:
+        df_uc, meta, mapa_clientes, erro = _preparar_mes_armazenado(caminho_db, mes_referencia_str, medidor,
+                                                                    uc=str(instalacao).strip())
+        if erro: return _json_com_metricas(erro, medidor)
+
+        with medidor.etapa("metricas") as info:
+            clientes, warnings = montar_clientes(df_uc, meta['cols_map'], meta['col_inst'], mapa_clientes,
+                                                 vencimento_str)
+            info["linhas"] = len(clientes)
+        # Linhas repetidas da UC no mês: vale a última, como no mapa de clientes
+        return _json_com_metricas({"data": clientes[-1], "warnings": warnings}, medidor)
+
+    except Exception as e:
+        return json.dumps({"error": f"Erro crítico: {traceback.format_exc()}"})
+
+
+# =================================================================
+# LINHA DE COMANDO
+# =================================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Armazém em disco (SQLite) dos relatórios, particionado por mês.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("ingerir", help="converte o relatório .xlsx para o armazém")
+    p.add_argument("relatorio")
+    p.add_argument("armazem")
+    p.add_argument("--forcar", action="store_true", help="relê a planilha mesmo se já foi ingerida")
+
+    p = sub.add_parser("meses", help="lista os meses armazenados")
+    p.add_argument("armazem")
+
+    for nome, ajuda in (("processar", "JSON do mês, como processar_relatorio_para_fatura"),
+                        ("cliente", "registro de uma UC no mês")):
+        p = sub.add_parser(nome, help=ajuda)
+        p.add_argument("armazem")
+        p.add_argument("--mes", required=True, help="mês de referência (AAAA-MM)")
+        p.add_argument("--vencimento", required=True, help="data de vencimento (AAAA-MM-DD)")
+        if nome == "cliente":
+            p.add_argument("--uc", required=True, help="instalação (UC)")
+    args = parser.parse_args(argv)
+
+    if args.comando == "ingerir":
+        resultado = ingerir_relatorio(args.relatorio, args.armazem, forcar=args.forcar)
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
+        return 1 if "error" in resultado else 0
+    if args.comando == "meses":
+        print(json.dumps(meses_armazenados(args.armazem), ensure_ascii=False, indent=2))
+        return 0
+    if args.comando == "processar":
+        resultado_json = processar_mes_armazenado(args.armazem, args.mes, args.vencimento)
+    else:
+        resultado_json = buscar_cliente_armazenado(args.armazem, args.uc, args.mes, args.vencimento)
+    print(resultado_json)
+    return 1 if "error" in json.loads(resultado_json) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Benchmarks do processamento, com curvas de escala sobre relatórios sintéticos
+(ver gerar_relatorio_sintetico.py).
+
+Cenários:
+    processar      processar_relatorio_para_fatura (planilha inteira), por nº de UCs, no
+                   motor pandas e no motor leve (processor_leve.py), e o mesmo mês lido
+                   do armazém SQLite (armazem_relatorios.py, ingestão fora da medida)
+    to_num         to_num escalar vs parse_money_series, por nº de células (coluna mista
+                   e coluna só de texto BR)
+    cabecalhos     find_sheet_and_header (ExcelFile vs WorkbookIndex), por nº de UCs
+    mapa_clientes  criar_mapa_completo_clientes, por nº de clientes
+    validar_pdf    pdf_value_validator.validar_pdf nos PDFs de exemplo, por recorte e pela
+                   página inteira (requer pdfplumber)
+
+Uso:
+    python benchmark_processamento.py                          # todos, tamanhos padrão
+    python benchmark_processamento.py --cenarios processar,to_num --tamanhos 500,2000,8000
+    python benchmark_processamento.py --json atual.json --comparar base.json --tolerancia 0.25
+
+Com --comparar, cada medida mais lenta que a base além da tolerância é listada
+como regressão e o código de saída é 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pandas as pd
+
+from gerar_relatorio_sintetico import gerar_relatorio_sintetico, formatar_br, MES_FINAL_PADRAO
+from processor import (
+    processar_relatorio_para_fatura, find_sheet_and_header, criar_mapa_completo_clientes,
+)
+from processor_leve import processar_relatorio_leve
+from armazem_relatorios import ingerir_relatorio, processar_mes_armazenado
+from utils_normalizers import to_num, parse_money_series
+from excel_utils import WorkbookIndex
+
+PASTA_PDFS_EXEMPLO = Path(__file__).resolve().parents[2] / "validados_divergentes"
+
+
+def medir(funcao: Callable, repeticoes: int) -> float:
+    """Menor tempo (s) entre `repeticoes` execuções, com os prints silenciados."""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcao()
+            melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+_RELATORIOS: Dict = {}
+
+def _relatorio(n_ucs: int, meses: int) -> bytes:
+    """Relatório sintético reaproveitado entre os cenários (gerar custa mais que processar)."""
+    chave = (n_ucs, meses)
+    if chave not in _RELATORIOS:
+        _RELATORIOS[chave] = gerar_relatorio_sintetico(n_ucs, meses)
+    return _RELATORIOS[chave]
+
+
+# =================================================================
+# CENÁRIOS (cada um devolve [{"caso", "n", "segundos"}, ...])
+# =================================================================
+
+def bench_processar(tamanhos: List[int], meses: int, repeticoes: int) -> List[Dict]:
+    medidas = []
+    for n in tamanhos:
+        conteudo = _relatorio(n, meses)
+        segundos = medir(lambda: processar_relatorio_para_fatura(conteudo, MES_FINAL_PADRAO, "2025-12-10"), repeticoes)
+        medidas.append({"caso": f"processar ({meses} meses)", "n": n, "segundos": segundos})
+        segundos = medir(lambda: processar_relatorio_leve(conteudo, MES_FINAL_PADRAO, "2025-12-10"), repeticoes)
+        medidas.append({"caso": f"processar motor leve ({meses} meses)", "n": n, "segundos": segundos})
+        with tempfile.TemporaryDirectory() as pasta:
+            db = str(Path(pasta) / "armazem.db")
+            with contextlib.redirect_stdout(io.StringIO()):
+                ingerir_relatorio(conteudo, db)
+            segundos = medir(lambda: processar_mes_armazenado(db, MES_FINAL_PADRAO, "2025-12-10"), repeticoes)
+        medidas.append({"caso": f"processar do armazém ({meses} meses)", "n": n, "segundos": segundos})
+    return medidas
+
+
+def bench_to_num(tamanhos: List[int], meses: int, repeticoes: int) -> List[Dict]:
+    rng = random.Random(1)
+    medidas = []
+    for n in tamanhos:
+        celulas = n * 10  # ~10 células financeiras por UC
+        valores = []
+        for _ in range(celulas):
+            v = round(rng.uniform(-500, 5000), 2)
+            valores.append(rng.choice([v, formatar_br(v), formatar_br(v, prefixo=False), str(v), None, "-"]))
+        serie = pd.Series(valores, dtype=object)
+        medidas.append({"caso": "to_num (escalar)", "n": celulas,
+                        "segundos": medir(lambda: [to_num(v) for v in valores], repeticoes)})
+        medidas.append({"caso": "parse_money_series", "n": celulas,
+                        "segundos": medir(lambda: parse_money_series(serie), repeticoes)})
+
+        # Coluna só de texto BR, sem repetição (pior caso para o caminho vetorizado)
+        textos = [formatar_br(round(rng.uniform(-500, 5000), 2), prefixo=rng.random() < 0.5)
+                  for _ in range(celulas)]
+        serie_texto = pd.Series(textos, dtype=object)
+        medidas.append({"caso": "to_num (escalar, texto)", "n": celulas,
+                        "segundos": medir(lambda: [to_num(v) for v in textos], repeticoes)})
+        medidas.append({"caso": "parse_money_series (texto)", "n": celulas,
+                        "segundos": medir(lambda: parse_money_series(serie_texto), repeticoes)})
+    return medidas
+
+
+def bench_cabecalhos(tamanhos: List[int], meses: int, repeticoes: int) -> List[Dict]:
+    obrigatorias = {"Detalhe": ["REF", "Instalação", "Data"],
+                    "Infos": ["Nome/Razão Social", "CPF/CNPJ", "Instalação"]}
+    medidas = []
+    for n in tamanhos:
+        conteudo = _relatorio(n, meses)
+
+        def com_excel_file():
+            xls = pd.ExcelFile(io.BytesIO(conteudo), engine='openpyxl')
+            for preferida, colunas in obrigatorias.items():
+                find_sheet_and_header(xls, colunas, prefer_name=preferida)
+
+        def com_indice():
+            indice = WorkbookIndex.from_source(io.BytesIO(conteudo))
+            for preferida, colunas in obrigatorias.items():
+                find_sheet_and_header(indice, colunas, prefer_name=preferida)
+
+        medidas.append({"caso": "cabecalhos (ExcelFile)", "n": n, "segundos": medir(com_excel_file, repeticoes)})
+        medidas.append({"caso": "cabecalhos (WorkbookIndex)", "n": n, "segundos": medir(com_indice, repeticoes)})
+    return medidas
+
+
+def bench_mapa_clientes(tamanhos: List[int], meses: int, repeticoes: int) -> List[Dict]:
+    medidas = []
+    for n in tamanhos:
+        conteudo = gerar_relatorio_sintetico(n, 1)
+        df_cli = pd.read_excel(io.BytesIO(conteudo), sheet_name="Infos Clientes", header=1)
+        medidas.append({"caso": "criar_mapa_completo_clientes", "n": len(df_cli),
+                        "segundos": medir(lambda: criar_mapa_completo_clientes(df_cli), repeticoes)})
+    return medidas
+
+
+def bench_validar_pdf(tamanhos: List[int], meses: int, repeticoes: int) -> List[Dict]:
+    try:
+        from pdf_value_validator import validar_pdf
+    except ImportError:
+        print("⚠ pdfplumber não instalado: cenário validar_pdf ignorado")
+        return []
+    pdfs = sorted(str(p) for p in PASTA_PDFS_EXEMPLO.glob("*.pdf"))
+    if not pdfs:
+        print(f"⚠ Nenhum PDF de exemplo em {PASTA_PDFS_EXEMPLO}: cenário validar_pdf ignorado")
+        return []
+    medidas = []
+    for n in (1, 5, 10):
+        lote = [pdfs[i % len(pdfs)] for i in range(n)]
+        medidas.append({"caso": "validar_pdf", "n": n,
+                        "segundos": medir(lambda: [validar_pdf(p) for p in lote], repeticoes)})
+        medidas.append({"caso": "validar_pdf (página inteira)", "n": n,
+                        "segundos": medir(lambda: [validar_pdf(p, recortar=False) for p in lote], repeticoes)})
+    return medidas
+
+
+CENARIOS = {
+    "processar": bench_processar,
+    "to_num": bench_to_num,
+    "cabecalhos": bench_cabecalhos,
+    "mapa_clientes": bench_mapa_clientes,
+    "validar_pdf": bench_validar_pdf,
+}
+
+
+# =================================================================
+# RELATÓRIO E COMPARAÇÃO
+# =================================================================
+
+def imprimir_curvas(medidas: List[Dict]):
+    """Tabela por caso: n, tempo total, tempo por item e fator de escala entre tamanhos."""
+    por_caso: Dict[str, List[Dict]] = {}
+    for m in medidas:
+        por_caso.setdefault(m["caso"], []).append(m)
+    for caso, pontos in por_caso.items():
+        print(f"\n📈 {caso}")
+        print(f"   {'n':>8}  {'tempo (s)':>10}  {'µs/item':>10}  {'escala':>7}")
+        anterior = None
+        for p in sorted(pontos, key=lambda p: p["n"]):
+            escala = ""
+            if anterior and anterior["segundos"] > 0:
+                # 1.0 = linear; >1 = pior que linear
+                escala = f"{(p['segundos'] / anterior['segundos']) / (p['n'] / anterior['n']):.2f}"
+            print(f"   {p['n']:>8}  {p['segundos']:>10.4f}  {p['segundos'] / p['n'] * 1e6:>10.1f}  {escala:>7}")
+            anterior = p
+
+
+def comparar(medidas: List[Dict], base: List[Dict], tolerancia: float) -> List[str]:
+    """Medidas mais lentas que a base além da tolerância (ex: 0.25 = 25%)."""
+    referencia = {(m["caso"], m["n"]): m["segundos"] for m in base}
+    regressoes = []
+    for m in medidas:
+        antes = referencia.get((m["caso"], m["n"]))
+        if antes and m["segundos"] > antes * (1 + tolerancia):
+            regressoes.append(f"{m['caso']} n={m['n']}: {antes:.4f}s → {m['segundos']:.4f}s "
+                              f"(+{(m['segundos'] / antes - 1) * 100:.0f}%)")
+    return regressoes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks do processamento com relatórios sintéticos.")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS), help=f"lista separada por vírgula: {', '.join(CENARIOS)}")
+    parser.add_argument("--tamanhos", default="100,400,1600", help="nº de UCs por mês em cada ponto da curva")
+    parser.add_argument("--meses", type=int, default=12, help="meses de histórico nos relatórios")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções por ponto (vale o menor tempo)")
+    parser.add_argument("--json", help="grava as medidas neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior (linha de base)")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="folga antes de acusar regressão (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    tamanhos = [int(t) for t in args.tamanhos.split(",")]
+    medidas = []
+    for nome in args.cenarios.split(","):
+        nome = nome.strip()
+        if nome not in CENARIOS:
+            parser.error(f"cenário desconhecido: {nome}")
+        print(f"⏱ {nome}...")
+        medidas.extend(CENARIOS[nome](tamanhos, args.meses, args.repeticoes))
+
+    imprimir_curvas(medidas)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"meses": args.meses, "repeticoes": args.repeticoes, "medidas": medidas}, f, indent=2)
+        print(f"\n💾 Medidas gravadas em {args.json}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regressoes = comparar(medidas, json.load(f)["medidas"], args.tolerancia)
+        if regressoes:
+            print(f"\n❌ {len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}:")
+            for r in regressoes:
+                print(f"   - {r}")
+            return 1
+        print(f"\n✅ Sem regressões acima de {args.tolerancia:.0%} em relação a {args.comparar}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,11 @@
-import pandas as pd
 from datetime import datetime
 
+try:
+    from utils_normalizers import to_num
+except ImportError:
+    # Pyodide: utils_normalizers.py já foi executado no mesmo escopo global
+    pass
+
 # =================================================================
 # MODO ESPELHO: TODOS OS DADOS VÊM DA PLANILHA (ZERO CÁLCULO)
 # =================================================================
@@ -93,22 +98,3 @@ def compute_metrics(row, cols_map, vencimento_iso):
         "vencimento_iso": vencimento_iso,
         "emissao_iso": datetime.now().strftime('%Y-%m-%d')
     }
-
-# Função auxiliar
-def to_num(val):
-    if pd.isna(val) or val == '': return 0.0
-    try:
-        if isinstance(val, (int, float)): return float(val)
-        if isinstance(val, str):
-            val_str = val.strip().replace('R$', '').replace(' ', '')
-            if ',' in val_str and '.' in val_str:
-                if val_str.rfind(',') > val_str.rfind('.'):
-                    val_str = val_str.replace('.', '').replace(',', '.')
-                else:
-                    val_str = val_str.replace(',', '')
-            elif ',' in val_str:
-                val_str = val_str.replace(',', '.')
-            return float(val_str)
-        return float(val)
-    except:
-        return 0.0
\ No newline at end of file
@@ -1,13 +1,366 @@
-import pandas as pd
+import io
+import mmap
+import os
 import re
-# Importa a função de normalização
-# from .utils_normalizers import _norm 
+from contextlib import contextmanager
+
+try:
+    import pandas as pd
+except ImportError:
+    # Motor leve (processor_leve.py): só WorkbookIndex, nomes_de_colunas e
+    # _converter_celula são usados, e nenhum deles depende do pandas
+    pd = None
+
+try:
+    # Importa a função de normalização
+    from utils_normalizers import _norm
+except ImportError:
+    # Pyodide: utils_normalizers.py já foi executado no mesmo escopo global
+    pass
+
+try:
+    # Pyodide: Uint8Array/ArrayBuffer vindos do JS chegam como JsBuffer
+    from pyodide.ffi import JsBuffer
+except ImportError:
+    JsBuffer = None
+
+# Erros de fórmula do Excel: o pandas lê essas células como NaN
+_ERROS_EXCEL = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A', '#GETTING_DATA'}
+
+# Textos que o pandas (read_excel) considera vazios por padrão
+_TEXTOS_NA = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+_NAN = float('nan')
+
+def _converter_celula(valor):
+    """
+    Converte o valor cru do openpyxl como o read_excel faria
+    (erro de fórmula -> NaN, float inteiro -> int).
+    """
+    if valor is None or isinstance(valor, bool):
+        return valor
+    if isinstance(valor, float):
+        if valor != valor or valor in (float('inf'), float('-inf')):
+            return valor
+        inteiro = int(valor)
+        return inteiro if inteiro == valor else valor
+    if isinstance(valor, str) and valor in _ERROS_EXCEL:
+        return _NAN
+    return valor
+
+def _celulas_preenchidas(linha):
+    """Valores não vazios de uma linha do índice (mesmo critério do pd.notna no preview)."""
+    return [v for v in linha if v is not None and not (isinstance(v, str) and v in _TEXTOS_NA)
+            and not (isinstance(v, float) and v != v)]
+
+
+def nomes_de_colunas(cabecalho):
+    """
+    Nomes de coluna que o read_excel daria para a linha de cabeçalho
+    (vazios viram 'Unnamed: N', repetidos ganham sufixo '.1', '.2'...).
+    """
+    nomes = []
+    for i, v in enumerate(cabecalho):
+        vazio = v is None or (isinstance(v, str) and v == '')
+        nomes.append(f"Unnamed: {i}" if vazio else v)
+
+    contagem = {}
+    for i, col in enumerate(nomes):
+        atual = contagem.get(col, 0)
+        while atual > 0:
+            contagem[col] = atual + 1
+            col = f"{col}.{atual}"
+            atual = contagem.get(col, 0)
+        nomes[i] = col
+        contagem[col] = atual + 1
+    return nomes
+
+
+class WorkbookIndex:
+    """
+    Índice das primeiras linhas de TODAS as abas, lido numa única passada
+    (openpyxl read_only). Responde "qual aba/linha de cabeçalho tem estas
+    colunas" para todos os chamadores sem reabrir/reprocessar as abas.
+    """
+
+    def __init__(self, book, max_rows=50):
+        self.max_rows = max_rows
+        self.sheet_names = []
+        self._linhas = {}
+        for ws in book.worksheets:
+            if getattr(book, 'read_only', False):
+                ws.reset_dimensions()  # dimensões gravadas no arquivo nem sempre são confiáveis
+            self.sheet_names.append(ws.title)
+            self._linhas[ws.title] = [
+                [_converter_celula(v) for v in row]
+                for row in ws.iter_rows(max_row=max_rows, values_only=True)
+            ]
+
+    @classmethod
+    def from_excel_file(cls, xls: 'pd.ExcelFile', max_rows=50):
+        """Reaproveita o workbook já aberto por um pd.ExcelFile (engine openpyxl)."""
+        return cls(xls.book, max_rows=max_rows)
+
+    @classmethod
+    def from_source(cls, source, max_rows=50):
+        """Abre um caminho ou arquivo binário e indexa as primeiras linhas."""
+        from openpyxl import load_workbook
+        book = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+        try:
+            return cls(book, max_rows=max_rows)
+        finally:
+            book.close()
+
+    def rows(self, sheet_name, max_rows=None):
+        """Primeiras linhas indexadas de uma aba (listas de valores)."""
+        linhas = self._linhas.get(sheet_name, [])
+        return linhas[:max_rows] if max_rows else linhas
+
+    def header_row(self, sheet_name, row_idx):
+        """Valores da linha `row_idx` (0-based) de uma aba, ou [] se fora do índice."""
+        linhas = self._linhas.get(sheet_name, [])
+        return linhas[row_idx] if 0 <= row_idx < len(linhas) else []
+
+    def column_names(self, sheet_name, row_idx):
+        """Nomes de coluna que o read_excel daria com header=row_idx (ver nomes_de_colunas)."""
+        return nomes_de_colunas(self.header_row(sheet_name, row_idx))
+
+    def find_header(self, mandatory_cols, prefer_name=None, max_rows=20):
+        """
+        Primeira aba/linha em que ALGUMA das colunas obrigatórias aparece
+        como célula exata (sem diferenciar maiúsculas). Retorna (aba, linha) ou (None, 0).
+        """
+        sheets_to_try = self.sheet_names
+        if prefer_name:
+            sheets_to_try = sorted(sheets_to_try, key=lambda x: 0 if prefer_name.lower() in x.lower() else 1)
+
+        procurados = [m.lower() for m in mandatory_cols]
+        for sheet in sheets_to_try:
+            for r, linha in enumerate(self.rows(sheet, max_rows)):
+                row_vals = {str(v).strip().lower() for v in _celulas_preenchidas(linha)}
+                if any(m in row_vals for m in procurados):
+                    return sheet, r
+        return None, 0
+
+    def find_header_all_keys(self, key_cols, prefer_name=None, max_rows=50):
+        """
+        Primeira aba/linha cuja linha normalizada contém TODAS as colunas chave
+        (busca parcial com _norm). Retorna (aba, linha) ou (None, -1).
+        """
+        sheet_names = list(self.sheet_names)
+        if prefer_name:
+            matches = [s for s in sheet_names if prefer_name.lower() in s.lower()]
+            if matches:
+                sheet_names.insert(0, sheet_names.pop(sheet_names.index(matches[0])))
+
+        chaves = [_norm(k) for k in key_cols]
+        for sheet_name in sheet_names:
+            for i, linha in enumerate(self.rows(sheet_name, max_rows)):
+                row_str = _norm(" ".join(str(v) for v in _celulas_preenchidas(linha)))
+                if all(k in row_str for k in chaves):
+                    return sheet_name, i
+        return None, -1
+
+
+# =================================================================
+# ENTRADA DA PLANILHA (SEM CÓPIAS)
+# =================================================================
+
+class LeitorBuffer(io.RawIOBase):
+    """
+    Arquivo binário somente leitura sobre um buffer (bytes, bytearray,
+    memoryview, mmap...), sem copiar o conteúdo: só os trechos pedidos pelo
+    zipfile viram bytes.
+    """
+
+    def __init__(self, buffer):
+        self._mv = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._mv) + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+        if pos < 0:
+            raise ValueError(f"posição negativa: {pos}")
+        self._pos = pos
+        return pos
+
+    def read(self, size=-1):
+        fim = len(self._mv) if size is None or size < 0 else min(self._pos + size, len(self._mv))
+        if fim <= self._pos:
+            return b''
+        trecho = self._mv[self._pos:fim].tobytes()
+        self._pos = fim
+        return trecho
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, destino):
+        trecho = self.read(len(destino))
+        destino[:len(trecho)] = trecho
+        return len(trecho)
+
+    def close(self):
+        if not self.closed:
+            self._mv.release()
+        super().close()
+
+
+@contextmanager
+def abrir_planilha(conteudo):
+    """
+    Arquivo binário para o openpyxl/pd.ExcelFile a partir do que o chamador tiver,
+    sem cópias do conteúdo inteiro:
+      - bytes: io.BytesIO (compartilha o buffer);
+      - bytearray, memoryview ou outro objeto com buffer protocol: LeitorBuffer;
+      - caminho (str/Path): arquivo mapeado em memória (mmap), lido sob demanda;
+      - JsBuffer (Pyodide): uma única cópia da memória do JS para o WASM.
+    O arquivo só é válido dentro do bloco `with`.
+    """
+    if JsBuffer is not None and isinstance(conteudo, JsBuffer):
+        conteudo = conteudo.to_bytes()
+
+    if isinstance(conteudo, bytes):
+        yield io.BytesIO(conteudo)
+    elif isinstance(conteudo, (str, os.PathLike)):
+        with open(conteudo, 'rb') as f:
+            try:
+                mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                mapa = None
+            if mapa is None:
+                # Arquivo vazio ou sistema sem mmap: lê direto do arquivo aberto
+                yield f
+                return
+            leitor = LeitorBuffer(mapa)
+            try:
+                yield leitor
+            finally:
+                leitor.close()
+                mapa.close()
+    else:
+        leitor = LeitorBuffer(conteudo)
+        try:
+            yield leitor
+        finally:
+            leitor.close()
+
 
 # =================================================================
 # FUNÇÕES DE UTILIDADE DE EXCEL (src/python/excel_utils.py)
 # =================================================================
 
-def pick_col(df: pd.DataFrame, *alternativas) -> str:
+def _linhas_projetadas(book, sheet_name, header_row, usecols):
+    """
+    Fonte única das leituras em streaming: a partir do cabeçalho, cada linha
+    da aba como (valores das colunas de `usecols` convertidos como o read_excel
+    faria, linha crua tem alguma célula preenchida).
+    """
+    ws = book[sheet_name]
+    if getattr(book, 'read_only', False):
+        ws.reset_dimensions()
+
+    def projetar(row):
+        return [_converter_celula(row[p]) if p < len(row) else None for p in usecols]
+
+    linhas = ws.iter_rows(min_row=header_row + 1, values_only=True)
+    yield projetar(next(linhas, ())), True
+    for row in linhas:
+        yield projetar(row), any(v is not None for v in row)
+
+def iter_sheet_rows(book, sheet_name, header_row, usecols):
+    """
+    Linhas de dados de uma aba (depois do cabeçalho) em streaming, projetadas
+    em `usecols` e convertidas como o read_excel faria - as mesmas que o
+    row_filter do read_sheet_filtered recebe, inclusive as vazias.
+    """
+    linhas = _linhas_projetadas(book, sheet_name, header_row, usecols)
+    next(linhas)
+    for linha, _ in linhas:
+        yield linha
+
+def frame_from_rows(linhas, cabecalho):
+    """
+    DataFrame de linhas já projetadas (ver iter_sheet_rows) com `cabecalho`
+    como nomes, com a mesma inferência de tipos do read_excel para essas linhas.
+    """
+    from pandas.io.parsers import TextParser
+
+    def para_parser(linha):
+        # Mesma convenção do read_excel: célula vazia -> "" (vira NaN no parser)
+        return ["" if v is None else v for v in linha]
+
+    dados = [para_parser(cabecalho)] + [para_parser(linha) for linha in linhas]
+    return TextParser(dados, header=0, skip_blank_lines=False).read()
+
+def read_sheet_filtered(book, sheet_name, header_row, usecols, row_filter=None):
+    """
+    Lê uma aba em streaming (openpyxl read_only, linha a linha) e monta o
+    DataFrame apenas com as linhas aceitas por `row_filter`.
+
+    Args:
+        book: workbook openpyxl (ex: pd.ExcelFile(...).book)
+        header_row: linha do cabeçalho (0-based, como o `header` do read_excel)
+        usecols: posições (0-based) das colunas a materializar
+        row_filter: função(linha) -> bool, recebendo os valores das colunas de
+            `usecols` já convertidos como o read_excel faria. None aceita tudo.
+
+    O resultado tem os mesmos tipos que read_excel(header=..., usecols=...)
+    daria para essas linhas; memória proporcional às linhas aceitas.
+    """
+    linhas = _linhas_projetadas(book, sheet_name, header_row, usecols)
+    cabecalho, _ = next(linhas)
+    if row_filter is not None:
+        return frame_from_rows((linha for linha, _ in linhas if row_filter(linha)), cabecalho)
+
+    dados = []
+    pendentes = []  # linhas vazias só entram se houver dados depois (como no read_excel)
+    for linha, preenchida in linhas:
+        if preenchida:
+            dados.extend(pendentes)
+            pendentes = []
+            dados.append(linha)
+        else:
+            pendentes.append(linha)
+    return frame_from_rows(dados, cabecalho)
+
+def read_sheet_grouped(book, sheet_name, header_row, usecols, row_key):
+    """
+    Como read_sheet_filtered, mas distribui as linhas em grupos numa única
+    passada pela aba: `row_key(linha)` devolve a chave do grupo ou None para
+    descartar a linha. Retorna {chave: DataFrame}, cada grupo com os tipos que
+    read_sheet_filtered daria se fosse lido sozinho (inferência por grupo).
+    """
+    linhas = _linhas_projetadas(book, sheet_name, header_row, usecols)
+    cabecalho, _ = next(linhas)
+    grupos = {}
+    for linha, _ in linhas:
+        chave = row_key(linha)
+        if chave is not None:
+            grupos.setdefault(chave, []).append(linha)
+
+    return {chave: frame_from_rows(dados, cabecalho) for chave, dados in grupos.items()}
+
+def pick_col(df: 'pd.DataFrame', *alternativas) -> str:
     """Encontra coluna no DataFrame usando chaves normalizadas."""
     # Assume _norm é global após execução de utils_normalizers.py
     cols_norm = {_norm(c): c for c in df.columns} 
@@ -25,8 +378,11 @@ def pick_col(df: pd.DataFrame, *alternativas) -> str:
                 return k_orig
     return None
 
-def find_sheet_and_header(xls: pd.ExcelFile, key_cols, prefer_name=None, max_rows=50):
+def find_sheet_and_header(xls: 'pd.ExcelFile', key_cols, prefer_name=None, max_rows=50):
     """Localiza a aba e a linha de cabeçalho corretas procurando por palavras-chave."""
+    if isinstance(xls, WorkbookIndex):
+        return xls.find_header_all_keys(key_cols, prefer_name=prefer_name, max_rows=max_rows)
+
     sheet_names = list(xls.sheet_names)
     # Prioriza aba sugerida
     if prefer_name:
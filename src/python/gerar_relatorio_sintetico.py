@@ -0,0 +1,238 @@
+"""
+Gerador de relatórios sintéticos (abas 'Detalhe Por UC' e 'Infos Clientes')
+para benchmarks e testes, sem depender da planilha real da usina.
+
+Layouts:
+    'padrao'      - igual ao relatório real: linhas de título antes do cabeçalho
+                    (Detalhe na linha 7, Infos Clientes na linha 1), nomes de
+                    coluna reais e dezenas de colunas que o processador ignora
+    'alternativo' - cabeçalho na primeira linha, nomes de coluna tirados dos
+                    aliases alternativos do COLUMNS_MAP e datas como texto (dd/mm/aaaa)
+
+Parte das células financeiras sai como texto no formato brasileiro
+("R$ 1.234,56"), como acontece nas planilhas editadas à mão.
+
+Uso:
+    python gerar_relatorio_sintetico.py saida.xlsx --ucs 5000 --meses 24 [--layout alternativo]
+"""
+import argparse
+import io
+import random
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from openpyxl import Workbook
+
+# Último mês gerado (os anteriores vêm antes dele); é o mês a processar nos benchmarks
+MES_FINAL_PADRAO = "2025-11-01"
+
+# Campo do COLUMNS_MAP -> nome da coluna em cada layout
+COLUNAS_DETALHE = {
+    'padrao': {
+        'nome': "Nome/Razão Social",
+        'doc': "CPF/CNPJ",
+        'inst': "Instalação",
+        'ref': "REF (sempre dia 01 de cada mês)",
+        'tarifa_consumo': "TARIFA FP",
+        'tarifa_credito': "Tarifa média compensada sobre energia compensada",
+        'consumo_qtd': "CONSUMO_FP",
+        'comp_qtd': "CRÉD. CONSUMIDO_FP",
+        'outros': "OUTROS",
+        'fatura_c_gd': "FATURA C/GD",
+        'boleto_ev': "Valor enviado para emissão",
+        'custo_sem_gd': "CUSTO_S_GD ",
+        'custo_com_gd': "CUSTO_C_GD\n(Fatura real+Boleto Gera Final)",
+        'economia': "Ganho energia compensada (R$) Final",
+    },
+    'alternativo': {
+        'inst': "Instalação",
+        'ref': "Competência",
+        'nome': "Nome Cliente",
+        'doc': "CPF",
+        'num_conta': "Conta",
+        'consumo_qtd': "Consumo KWh",
+        'comp_qtd': "Energia Compensada",
+        'tarifa_consumo': "Tarifa Cheia",
+        'tarifa_credito': "Tarifa Acordada",
+        'fatura_c_gd': "Valor Fatura Distribuidora",
+        'outros': "CIP",
+        'boleto_ev': "Valor Boleto",
+        'custo_sem_gd': "Custo Sem GD",
+        'custo_com_gd': "Custo Com GD",
+        'economia': "Economia",
+    },
+}
+
+COLUNAS_CLIENTES = {
+    'padrao': [None, "INSTALACAO", "Nome/Razão Social", "CPF/CNPJ", "Endereço", "Bairro", "Cidade", "E-mail"],
+    'alternativo': ["Instalação", "Nome Cliente", "CPF", "Logradouro", "Bairro", "Município"],
+}
+
+# Colunas de exemplo do relatório real que o processador não usa
+_COLUNAS_IGNORADAS = [
+    "MODELO FAT ENERGIA (CRÉD. CONSUMIDO/GERADO)", "TENSAO", "MEDIDOR", "USINA", "Região",
+    "Desconto Contratado", "Rateio enviado", "TARIFA P", "CONSUMO_P", "CREDITO ACUMULADO_FP",
+    "Cofins", "pis", "ICMS", "GERADO", "DIFERENÇA", "Boleto PAGO StarkBank (Compromisso dos consorciados)",
+    "Multa atraso pgto (StarkBank)", "Tarifa Média Projeto", "Créd. Faturados", "OBS Boleto", "E-mail",
+]
+
+_CAMPOS_MONETARIOS = {'outros', 'fatura_c_gd', 'boleto_ev', 'custo_sem_gd', 'custo_com_gd', 'economia'}
+
+_BAIRROS = ["Centro", "Vila Nova", "Jardim América", "Tiradentes", "Coronel Antonino"]
+_CIDADES = ["Campo Grande", "Dourados", "Corumbá", "Três Lagoas", "Ponta Porã"]
+
+
+def formatar_br(valor: float, prefixo: bool = True) -> str:
+    """1234.5 -> 'R$ 1.234,50' (ou '1.234,50' sem prefixo)."""
+    texto = f"{abs(valor):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    texto = ("-" if valor < 0 else "") + texto
+    return f"R$ {texto}" if prefixo else texto
+
+
+def _meses(mes_final: str, quantidade: int) -> List[datetime]:
+    ano, mes = int(mes_final[:4]), int(mes_final[5:7])
+    datas = []
+    for _ in range(quantidade):
+        datas.append(datetime(ano, mes, 1))
+        ano, mes = (ano - 1, 12) if mes == 1 else (ano, mes - 1)
+    return datas[::-1]
+
+
+def _uc(i: int) -> str:
+    numero = 10000 + i * 37
+    return f"10/{numero}-{numero % 10}"
+
+
+def _linha_detalhe(rng, campos, uc, ficha, data, layout, fracao_texto, fracao_abaixo_minimo):
+    consumo = rng.randint(80, 3500)
+    comp = int(consumo * rng.uniform(0.6, 1.0))
+    tarifa = round(rng.uniform(0.85, 1.25), 5)
+    tarifa_comp = round(tarifa * rng.uniform(0.75, 0.95), 5)
+    fatura = round(consumo * tarifa - comp * tarifa_comp + rng.uniform(5, 60), 2)
+    boleto = round(comp * tarifa_comp * 0.75, 2)
+    if rng.random() < fracao_abaixo_minimo:
+        boleto = round(rng.uniform(0, 4.99), 2)
+    custo_sem = round(consumo * tarifa + rng.uniform(5, 40), 2)
+    custo_com = round(fatura + boleto, 2)
+    valores = {
+        'inst': uc,
+        'ref': data if layout == 'padrao' else data.strftime("%d/%m/%Y"),
+        'nome': ficha['nome'],
+        'doc': ficha['doc'],
+        'num_conta': ficha['conta'],
+        'consumo_qtd': consumo,
+        'comp_qtd': comp,
+        'tarifa_consumo': tarifa,
+        'tarifa_credito': tarifa_comp,
+        'fatura_c_gd': fatura,
+        'outros': round(rng.uniform(0, 90), 2),
+        'boleto_ev': boleto,
+        'custo_sem_gd': custo_sem,
+        'custo_com_gd': custo_com,
+        'economia': round(custo_sem - custo_com, 2),
+    }
+    linha = []
+    for campo in campos:
+        valor = valores.get(campo)
+        if campo in _CAMPOS_MONETARIOS and rng.random() < fracao_texto:
+            valor = formatar_br(valor, prefixo=rng.random() < 0.5)
+        linha.append(valor)
+    return linha
+
+
+def gerar_relatorio_sintetico(n_ucs: int = 200, meses: int = 12, layout: str = 'padrao',
+                              colunas_extras: Optional[int] = None, fracao_texto: float = 0.1,
+                              fracao_sem_cadastro: float = 0.02, fracao_abaixo_minimo: float = 0.03,
+                              mes_final: str = MES_FINAL_PADRAO, semente: int = 42,
+                              destino: Optional[str] = None) -> bytes:
+    """
+    Gera o relatório e retorna o conteúdo .xlsx (também grava em `destino`, se dado).
+
+    Args:
+        n_ucs: UCs por mês (linhas do Detalhe = n_ucs * meses)
+        meses: meses de histórico, terminando em `mes_final`
+        layout: 'padrao' ou 'alternativo' (ver COLUNAS_DETALHE)
+        colunas_extras: colunas ignoradas pelo processador (padrão: 60 no layout
+            'padrao', 0 no 'alternativo')
+        fracao_texto: fração das células financeiras gravadas como texto BR
+        fracao_sem_cadastro: fração das UCs ausentes da aba Infos Clientes
+        fracao_abaixo_minimo: fração de linhas com boleto < R$ 5 (filtradas)
+    """
+    if layout not in COLUNAS_DETALHE:
+        raise ValueError(f"Layout desconhecido: {layout}. Use {list(COLUNAS_DETALHE)}.")
+    if colunas_extras is None:
+        colunas_extras = 60 if layout == 'padrao' else 0
+
+    rng = random.Random(semente)
+    fichas: Dict[str, Dict] = {}
+    for i in range(n_ucs):
+        fichas[_uc(i)] = {
+            'nome': f"CLIENTE SINTÉTICO {i:05d}",
+            'doc': f"{rng.randint(0, 999):03d}.{rng.randint(0, 999):03d}.{rng.randint(0, 999):03d}-{rng.randint(0, 99):02d}",
+            'conta': rng.randint(1000000, 9999999),
+            'endereco': f"Rua {rng.randint(1, 300)}, {rng.randint(1, 2000)}",
+            'bairro': rng.choice(_BAIRROS),
+            'cidade': rng.choice(_CIDADES),
+        }
+
+    wb = Workbook(write_only=True)
+
+    # --- Infos Clientes
+    ws_cli = wb.create_sheet("Infos Clientes")
+    cabecalho_cli = COLUNAS_CLIENTES[layout]
+    if layout == 'padrao':
+        ws_cli.append(["INFORMAÇÕES DOS CLIENTES"])
+    ws_cli.append(cabecalho_cli)
+    for uc, ficha in fichas.items():
+        if rng.random() < fracao_sem_cadastro:
+            continue
+        if layout == 'padrao':
+            ws_cli.append([None, uc, ficha['nome'], ficha['doc'], ficha['endereco'], ficha['bairro'],
+                           ficha['cidade'], f"cliente{ficha['conta']}@exemplo.com"])
+        else:
+            ws_cli.append([uc, ficha['nome'], ficha['doc'], ficha['endereco'], ficha['bairro'], ficha['cidade']])
+
+    # --- Detalhe Por UC
+    ws_det = wb.create_sheet("Detalhe Por UC")
+    mapa_colunas = COLUNAS_DETALHE[layout]
+    campos = list(mapa_colunas)
+    cabecalho = [mapa_colunas[c] for c in campos]
+    extras = [_COLUNAS_IGNORADAS[i % len(_COLUNAS_IGNORADAS)] + ("" if i < len(_COLUNAS_IGNORADAS) else f" {i}")
+              for i in range(colunas_extras)]
+    if layout == 'padrao':
+        ws_det.append(["RELATÓRIO OPERACIONAL - USINA SINTÉTICA"])
+        for _ in range(6):
+            ws_det.append([])
+    ws_det.append(cabecalho + extras)
+
+    for data in _meses(mes_final, meses):
+        for uc, ficha in fichas.items():
+            linha = _linha_detalhe(rng, campos, uc, ficha, data, layout, fracao_texto, fracao_abaixo_minimo)
+            ws_det.append(linha + [round(rng.random() * 100, 2) for _ in extras])
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    conteudo = buffer.getvalue()
+    if destino:
+        with open(destino, 'wb') as f:
+            f.write(conteudo)
+    return conteudo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um relatório sintético (Detalhe Por UC + Infos Clientes).")
+    parser.add_argument("destino", help="arquivo .xlsx de saída")
+    parser.add_argument("--ucs", type=int, default=200, help="UCs por mês")
+    parser.add_argument("--meses", type=int, default=12, help=f"meses de histórico (até {MES_FINAL_PADRAO[:7]})")
+    parser.add_argument("--layout", choices=list(COLUNAS_DETALHE), default='padrao')
+    parser.add_argument("--colunas-extras", type=int, default=None, help="colunas ignoradas pelo processador")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    conteudo = gerar_relatorio_sintetico(args.ucs, args.meses, args.layout, args.colunas_extras,
+                                         semente=args.semente, destino=args.destino)
+    print(f"✅ {args.destino}: {args.ucs} UCs x {args.meses} meses ({len(conteudo) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,16 @@ Separa PDFs em pastas conforme resultado da validação.
 
 import os
 import re
+import csv
+import json
 import shutil
+import time
+import hashlib
+import multiprocessing
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict
+from typing import Optional, Tuple, List, Dict, Iterator
+
+from processor_comum import _temporario_do_processo
 
 try:
     import pdfplumber
@@ -21,6 +28,22 @@ except ImportError:
     raise
 
 
+# Padrões pré-compilados (validar_pdf roda milhares de vezes por lote)
+_RE_TOTAL_PAGAR = re.compile(r'Total\s*a\s*Pagar.*?R\$\s*([\d.,]+)', re.IGNORECASE | re.DOTALL)
+_RE_TOTAL_PAGAR_CAMPO = re.compile(r'totalPagar.*?R\$\s*([\d.,]+)', re.IGNORECASE)
+_RE_PAGAR_VALOR = re.compile(r'Pagar\s*R\$\s*([\d.,]+)', re.IGNORECASE)
+_RE_CODIGO_BARRAS = re.compile(r'1296[0]+(\d{5,7})')
+_RE_IGUAL_VALOR_DOCUMENTO = re.compile(r'\(=\)\s*Valor\s*(?:do\s*)?Documento', re.IGNORECASE)
+_RE_VALOR_DOCUMENTO = re.compile(r'Valor\s*(?:do\s*)?Documento[^\d]*R?\$?\s*([\d.,]+)', re.IGNORECASE)
+_RE_REAIS = re.compile(r'R\$\s*([\d.,]+)')
+
+# Regiões onde os valores ficam no layout da fatura unificada, em frações da
+# página (x0, topo, x1, base) para não depender do tamanho em pontos
+REGIAO_TOTAL_PAGAR = (0.05, 0.13, 0.40, 0.22)      # pág. 1: bloco "Total a pagar"
+REGIAO_LINHA_DIGITAVEL = (0.40, 0.16, 1.00, 0.20)  # pág. 2: linha digitável do recibo
+REGIAO_VALOR_DOCUMENTO = (0.74, 0.60, 1.00, 0.64)  # pág. 2: "(=) Valor do Documento" da ficha
+
+
 def extrair_valor_pagina1(texto: str) -> Optional[float]:
     """
     Extrai o valor "Total a Pagar" da primeira página (fatura EGS).
@@ -30,26 +53,40 @@ def extrair_valor_pagina1(texto: str) -> Optional[float]:
     - "R$ 125,70" após "Total a Pagar"
     """
     # Padrão 1: Total a Pagar seguido de valor
-    padrao1 = r'Total\s*a\s*Pagar.*?R\$\s*([\d.,]+)'
-    match = re.search(padrao1, texto, re.IGNORECASE | re.DOTALL)
-    if match:
-        return _parse_valor_br(match.group(1))
-    
     # Padrão 2: totalPagar ou similar
-    padrao2 = r'totalPagar.*?R\$\s*([\d.,]+)'
-    match = re.search(padrao2, texto, re.IGNORECASE)
-    if match:
-        return _parse_valor_br(match.group(1))
-    
     # Padrão 3: Valor após "Pagar"
-    padrao3 = r'Pagar\s*R\$\s*([\d.,]+)'
-    match = re.search(padrao3, texto, re.IGNORECASE)
-    if match:
-        return _parse_valor_br(match.group(1))
+    for padrao in (_RE_TOTAL_PAGAR, _RE_TOTAL_PAGAR_CAMPO, _RE_PAGAR_VALOR):
+        match = padrao.search(texto)
+        if match:
+            return _parse_valor_br(match.group(1))
     
     return None
 
 
+def _valor_codigo_barras(texto: str) -> Optional[float]:
+    """
+    Valor embutido no código de barras / linha digitável.
+    Formato: 1296 + zeros + valor em centavos
+    Exemplo: "12960000011945" -> 11945 centavos = R$ 119,45
+    """
+    match = _RE_CODIGO_BARRAS.search(texto)
+    if match:
+        valor = int(match.group(1)) / 100
+        if 1 < valor < 10000:
+            return round(valor, 2)
+    return None
+
+
+def _valor_documento(texto: str) -> Optional[float]:
+    """Valor logo após o rótulo "Valor do Documento"."""
+    match = _RE_VALOR_DOCUMENTO.search(texto)
+    if match:
+        valor = _parse_valor_br(match.group(1))
+        if valor and 10 < valor < 10000:
+            return valor
+    return None
+
+
 def extrair_valor_pagina2(texto: str) -> Optional[float]:
     """
     Extrai o valor "Valor do Documento" da segunda página (boleto).
@@ -60,39 +97,26 @@ def extrair_valor_pagina2(texto: str) -> Optional[float]:
     3. "R$ XXX,XX" mais comum no documento
     """
     # PADRÃO 1 (PRIORIDADE): Extrair do código de barras
-    # Formato: 1296 + zeros + valor em centavos
-    # Exemplo: "12960000011945" -> 11945 centavos = R$ 119,45
-    padrao_barras = r'1296[0]+(\d{5,7})'
-    match = re.search(padrao_barras, texto)
-    if match:
-        valor_centavos_str = match.group(1)
-        valor = int(valor_centavos_str) / 100
-        if 1 < valor < 10000:
-            return round(valor, 2)
+    valor = _valor_codigo_barras(texto)
+    if valor is not None:
+        return valor
     
     # Padrão 2: "(=) Valor do Documento" - buscar valor R$ após esse texto
-    padrao2 = r'\(=\)\s*Valor\s*(?:do\s*)?Documento'
-    match2 = re.search(padrao2, texto, re.IGNORECASE)
+    match2 = _RE_IGUAL_VALOR_DOCUMENTO.search(texto)
     if match2:
-        texto_apos = texto[match2.end():]
-        valores_apos = re.findall(r'R\$\s*([\d.,]+)', texto_apos)
-        for v in valores_apos:
+        for v in _RE_REAIS.findall(texto, match2.end()):
             valor = _parse_valor_br(v)
             if valor and 10 < valor < 10000:
                 return valor
     
     # Padrão 3: Buscar "Valor do Documento" seguido de valor
-    padrao3 = r'Valor\s*(?:do\s*)?Documento[^\d]*R?\$?\s*([\d.,]+)'
-    match = re.search(padrao3, texto, re.IGNORECASE)
-    if match:
-        valor = _parse_valor_br(match.group(1))
-        if valor and 10 < valor < 10000:
-            return valor
+    valor = _valor_documento(texto)
+    if valor is not None:
+        return valor
     
     # Padrão 4: Último recurso - pegar o valor mais comum
-    valores = re.findall(r'R\$\s*([\d.,]+)', texto)
     valores_parsed = []
-    for v in valores:
+    for v in _RE_REAIS.findall(texto):
         val = _parse_valor_br(v)
         if val and 10 < val < 10000:
             valores_parsed.append(val)
@@ -106,6 +130,32 @@ def extrair_valor_pagina2(texto: str) -> Optional[float]:
     return None
 
 
+def _texto_da_regiao(pagina, regiao: Tuple[float, float, float, float]) -> str:
+    """Texto só dentro da região (frações da página) - sem montar o texto da página inteira."""
+    x0, topo, x1, base = regiao
+    largura, altura = float(pagina.width), float(pagina.height)
+    caixa = (x0 * largura, topo * altura, x1 * largura, base * altura)
+    return pagina.within_bbox(caixa).extract_text() or ''
+
+
+def extrair_valor_recorte_pagina1(pagina) -> Optional[float]:
+    """"Total a Pagar" lido só do bloco onde ele fica; None se não estiver lá."""
+    match = _RE_TOTAL_PAGAR.search(_texto_da_regiao(pagina, REGIAO_TOTAL_PAGAR))
+    return _parse_valor_br(match.group(1)) if match else None
+
+
+def extrair_valor_recorte_pagina2(pagina) -> Optional[float]:
+    """
+    Valor do boleto lido só das regiões conhecidas: primeiro a linha digitável
+    (mais confiável) e, se não houver, o campo "Valor do Documento".
+    Para no primeiro valor encontrado; None se nenhuma região tiver o valor.
+    """
+    valor = _valor_codigo_barras(_texto_da_regiao(pagina, REGIAO_LINHA_DIGITAVEL))
+    if valor is None:
+        valor = _valor_documento(_texto_da_regiao(pagina, REGIAO_VALOR_DOCUMENTO))
+    return valor
+
+
 def _parse_valor_br(valor_str: str) -> Optional[float]:
     """Converte string de valor BR (1.234,56) para float."""
     if not valor_str:
@@ -121,10 +171,14 @@ def _parse_valor_br(valor_str: str) -> Optional[float]:
         return None
 
 
-def validar_pdf(caminho_pdf: str) -> Dict:
+def validar_pdf(caminho_pdf: str, recortar: bool = True) -> Dict:
     """
     Valida um PDF comparando valores das páginas 1 e 2.
     
+    Com `recortar`, cada valor é lido primeiro só da região onde ele fica no
+    layout da fatura; o texto da página inteira só é extraído quando o recorte
+    não encontra o valor (layout diferente).
+    
     Returns:
         Dict com: {
             'arquivo': nome do arquivo,
@@ -132,7 +186,8 @@ def validar_pdf(caminho_pdf: str) -> Dict:
             'valor_pagina2': valor extraído da página 2,
             'divergente': True se valores diferentes,
             'diferenca': diferença absoluta entre valores,
-            'erro': mensagem de erro se houver
+            'erro': mensagem de erro se houver,
+            'tempo_extracao': segundos gastos na leitura do PDF
         }
     """
     resultado = {
@@ -142,22 +197,27 @@ def validar_pdf(caminho_pdf: str) -> Dict:
         'valor_pagina2': None,
         'divergente': None,
         'diferenca': None,
-        'erro': None
+        'erro': None,
+        'tempo_extracao': None
     }
     
+    inicio = time.perf_counter()
     try:
         with pdfplumber.open(caminho_pdf) as pdf:
             if len(pdf.pages) < 2:
                 resultado['erro'] = f"PDF tem apenas {len(pdf.pages)} página(s)"
                 return resultado
             
-            # Extrair texto das páginas
-            texto_p1 = pdf.pages[0].extract_text() or ''
-            texto_p2 = pdf.pages[1].extract_text() or ''
+            pagina1, pagina2 = pdf.pages[0], pdf.pages[1]
             
-            # Extrair valores
-            resultado['valor_pagina1'] = extrair_valor_pagina1(texto_p1)
-            resultado['valor_pagina2'] = extrair_valor_pagina2(texto_p2)
+            # Extrair valores (recorte primeiro, página inteira como fallback)
+            if recortar:
+                resultado['valor_pagina1'] = extrair_valor_recorte_pagina1(pagina1)
+                resultado['valor_pagina2'] = extrair_valor_recorte_pagina2(pagina2)
+            if resultado['valor_pagina1'] is None:
+                resultado['valor_pagina1'] = extrair_valor_pagina1(pagina1.extract_text() or '')
+            if resultado['valor_pagina2'] is None:
+                resultado['valor_pagina2'] = extrair_valor_pagina2(pagina2.extract_text() or '')
             
             # Verificar se conseguiu extrair
             if resultado['valor_pagina1'] is None:
@@ -173,14 +233,410 @@ def validar_pdf(caminho_pdf: str) -> Dict:
     except Exception as e:
         resultado['erro'] = str(e)
     
+    resultado['tempo_extracao'] = round(time.perf_counter() - inicio, 4)
+    return resultado
+
+
+def _resultado_com_erro(caminho_pdf: str, erro: str) -> Dict:
+    """Resultado no formato de validar_pdf para falhas fora dele (timeout, worker morto)."""
+    return {
+        'arquivo': os.path.basename(caminho_pdf),
+        'caminho': caminho_pdf,
+        'valor_pagina1': None,
+        'valor_pagina2': None,
+        'divergente': None,
+        'diferenca': None,
+        'erro': erro,
+        'tempo_extracao': None
+    }
+
+
+def validar_em_paralelo(caminhos: List[str], workers: int, timeout: float = 120) -> Iterator[Tuple[str, Dict]]:
+    """
+    Valida os PDFs num pool de processos e devolve (caminho, resultado) na MESMA
+    ordem de `caminhos`, à medida que ficam prontos.
+    
+    Cada arquivo tem até `timeout` segundos. Se estourar, o arquivo sai com erro
+    de tempo limite, o pool é descartado (o worker travado é encerrado) e os
+    arquivos ainda não concluídos são reenviados a um pool novo. Os que já
+    terminaram no pool antigo são aproveitados.
+    """
+    fila = list(enumerate(caminhos))
+    prontos = {}
+    while fila:
+        pool = multiprocessing.Pool(workers)
+        try:
+            tarefas = {i: pool.apply_async(validar_pdf, (caminho,)) for i, caminho in fila if i not in prontos}
+            restantes = []
+            for pos, (i, caminho) in enumerate(fila):
+                if i in prontos:
+                    yield caminho, prontos.pop(i)
+                    continue
+                try:
+                    resultado = tarefas[i].get(timeout)
+                except multiprocessing.TimeoutError:
+                    yield caminho, _resultado_com_erro(caminho, f"Tempo limite excedido ({timeout:g}s)")
+                    restantes = fila[pos + 1:]
+                    for j, _ in restantes:
+                        if j in tarefas and tarefas[j].ready():
+                            prontos[j] = _resultado_pronto(tarefas[j], caminhos[j])
+                    break
+                except Exception as e:
+                    resultado = _resultado_com_erro(caminho, f"Falha no processo de validação: {e}")
+                yield caminho, resultado
+            fila = restantes
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+def _resultado_pronto(tarefa, caminho_pdf: str) -> Dict:
+    try:
+        return tarefa.get(0)
+    except Exception as e:
+        return _resultado_com_erro(caminho_pdf, f"Falha no processo de validação: {e}")
+
+
+# =================================================================
+# MANIFESTO (validação incremental)
+# =================================================================
+
+NOME_MANIFESTO = "manifesto_validacao.jsonl"
+_CAMPOS_VALIDACAO = ('valor_pagina1', 'valor_pagina2', 'divergente', 'diferenca', 'erro')
+
+
+def hash_arquivo(caminho: str) -> str:
+    """SHA-256 do conteúdo do arquivo."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class ManifestoValidacao:
+    """
+    Registro das validações já feitas: por nome de arquivo, o hash do conteúdo,
+    tamanho, mtime, os valores das páginas 1 e 2 e o veredito.
+    
+    Gravado em JSON Lines, uma linha por PDF validado, acrescentada assim que o
+    resultado sai: uma execução interrompida retoma de onde parou. Ao carregar,
+    vale a última linha de cada arquivo; `compactar` reescreve só essas.
+    """
+    
+    def __init__(self, caminho: str):
+        self.caminho = Path(caminho)
+        self.registros: Dict[str, Dict] = {}
+        if self.caminho.exists():
+            with open(self.caminho, encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                        self.registros[registro['arquivo']] = registro
+                    except (ValueError, KeyError):
+                        continue  # linha truncada por interrupção
+    
+    def consultar(self, caminho_pdf: str) -> Optional[Dict]:
+        """
+        Resultado já registrado para este PDF, se o conteúdo não mudou; senão None.
+        Tamanho e mtime iguais bastam; se só o mtime mudou, confere o hash.
+        Resultados com erro nunca são reaproveitados.
+        """
+        registro = self.registros.get(os.path.basename(caminho_pdf))
+        if not registro or registro.get('erro'):
+            return None
+        info = os.stat(caminho_pdf)
+        if info.st_size != registro['tamanho']:
+            return None
+        if info.st_mtime != registro['mtime']:
+            if hash_arquivo(caminho_pdf) != registro['sha256']:
+                return None
+            registro['mtime'] = info.st_mtime
+        resultado = {'arquivo': registro['arquivo'], 'caminho': caminho_pdf}
+        resultado.update({campo: registro.get(campo) for campo in _CAMPOS_VALIDACAO})
+        return resultado
+    
+    def registrar(self, caminho_pdf: str, resultado: Dict):
+        """Acrescenta o resultado de uma validação ao manifesto (em disco na hora)."""
+        info = os.stat(caminho_pdf)
+        registro = {
+            'arquivo': os.path.basename(caminho_pdf),
+            'sha256': hash_arquivo(caminho_pdf),
+            'tamanho': info.st_size,
+            'mtime': info.st_mtime,
+        }
+        registro.update({campo: resultado.get(campo) for campo in _CAMPOS_VALIDACAO})
+        self.registros[registro['arquivo']] = registro
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    
+    def compactar(self):
+        """
+        Reescreve o manifesto com uma linha por arquivo. O temporário é do
+        processo: vigiar_pasta e processar_pasta podem rodar na mesma pasta.
+        """
+        temporario = _temporario_do_processo(self.caminho)
+        with open(temporario, 'w', encoding='utf-8') as f:
+            for registro in self.registros.values():
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        os.replace(temporario, self.caminho)
+
+
+# =================================================================
+# CONCILIAÇÃO COM A SAÍDA DO PROCESSADOR
+# =================================================================
+
+# "UC_1015487416_20251130.pdf" ou "1015487416_NOME DO CLIENTE_20251130.pdf" (pdfGenerator.js)
+# O pdfGenerator.js só tira <>:"/\|?*- da UC: ela vai até o primeiro "_"
+_RE_UC_ARQUIVO = re.compile(r'^(?:UC_)?([^_]+)_', re.IGNORECASE)
+_RE_NAO_ALFANUMERICO = re.compile(r'[^a-zA-Z0-9]')
+
+
+def _chave_uc(uc) -> str:
+    """'10/1548741-6' -> '1015487416' (mesma limpeza do processador e do nome dos PDFs)."""
+    return _RE_NAO_ALFANUMERICO.sub('', str(uc)).upper()
+
+
+def uc_do_arquivo(nome_arquivo: str) -> Optional[str]:
+    """UC (já limpa) do nome do PDF; None se o nome não seguir o padrão."""
+    match = _RE_UC_ARQUIVO.match(os.path.basename(nome_arquivo))
+    return (_chave_uc(match.group(1)) or None) if match else None
+
+
+def carregar_esperados(caminho_json: str) -> Dict[str, Dict]:
+    """
+    Índice UC -> {'instalacao', 'totalPagar'} a partir da saída do processador:
+    JSON em registros ({"data": [...]}), colunar ({"formato": "colunar", "colunas": {...}})
+    ou NDJSON (linhas {"type": "cliente", "data": {...}}).
+    """
+    with open(caminho_json, encoding='utf-8') as f:
+        texto = f.read()
+    
+    if caminho_json.lower().endswith(('.ndjson', '.jsonl')):
+        linhas = (json.loads(l) for l in texto.splitlines() if l.strip())
+        registros = [l['data'] for l in linhas if l.get('type') == 'cliente']
+    else:
+        conteudo = json.loads(texto)
+        if conteudo.get('error'):
+            raise ValueError(f"Saída do processador com erro: {conteudo['error']}")
+        if conteudo.get('formato') == 'colunar':
+            colunas = conteudo['colunas']
+            registros = [{'instalacao': i, 'totalPagar': t}
+                         for i, t in zip(colunas['instalacao'], colunas['totalPagar'])]
+        else:
+            registros = conteudo['data']
+    
+    esperados = {}
+    for r in registros:
+        esperados[_chave_uc(r['instalacao'])] = {'instalacao': r['instalacao'], 'totalPagar': r['totalPagar']}
+    return esperados
+
+
+def comparar_com_esperado(resultado: Dict, esperados: Dict[str, Dict], tolerancia: float = 0.01) -> Dict:
+    """
+    Acrescenta ao resultado 'uc', 'valor_esperado' e 'divergente_esperado'
+    (página 1 ou 2 diferente do totalPagar do processador). Sem UC no índice,
+    'valor_esperado' fica None.
+    """
+    uc = uc_do_arquivo(resultado['arquivo'])
+    esperado = esperados.get(uc) if uc else None
+    resultado['uc'] = uc
+    resultado['valor_esperado'] = esperado['totalPagar'] if esperado else None
+    resultado['divergente_esperado'] = None
+    if esperado and not resultado['erro']:
+        alvo = esperado['totalPagar']
+        resultado['divergente_esperado'] = any(
+            abs(v - alvo) > tolerancia for v in (resultado['valor_pagina1'], resultado['valor_pagina2']))
     return resultado
 
 
+def conciliar(resultados: List[Dict], esperados: Dict[str, Dict]) -> Dict[str, List]:
+    """
+    Confronta o lote com o processamento do mês:
+    - 'diferentes': PDFs cujo valor difere do totalPagar esperado
+    - 'faltando': instalações processadas sem PDF na pasta
+    - 'inesperados': PDFs sem UC correspondente no processamento
+    """
+    presentes = set()
+    diferentes, inesperados = [], []
+    for r in resultados:
+        uc = r.get('uc', uc_do_arquivo(r['arquivo']))
+        if uc in esperados:
+            presentes.add(uc)
+            if r.get('divergente_esperado'):
+                diferentes.append(r)
+        else:
+            inesperados.append(r['arquivo'])
+    faltando = [e['instalacao'] for uc, e in esperados.items() if uc not in presentes]
+    return {'diferentes': diferentes, 'faltando': faltando, 'inesperados': inesperados}
+
+
+# =================================================================
+# SAÍDA POR REGISTRO E RESUMO INCREMENTAL
+# =================================================================
+
+CAMPOS_REGISTRO = ['arquivo', 'valor_pagina1', 'valor_pagina2', 'diferenca', 'veredito', 'erro', 'tempo_extracao']
+CAMPOS_CONCILIACAO = ['uc', 'valor_esperado']
+
+
+def veredito(resultado: Dict) -> str:
+    """'erro', 'divergente' (pág. 1 x pág. 2), 'divergente_processador' (x totalPagar) ou 'ok'."""
+    if resultado['erro']:
+        return 'erro'
+    if resultado['divergente']:
+        return 'divergente'
+    if resultado.get('divergente_esperado'):
+        return 'divergente_processador'
+    return 'ok'
+
+
+class EscritorRegistros:
+    """
+    Grava um registro por PDF assim que o resultado sai, em CSV (planilhas) ou
+    JSON Lines (monitoramento), conforme a extensão do arquivo. Cada registro
+    vai para o disco na hora: dá para acompanhar o arquivo com o lote rodando.
+    """
+    
+    def __init__(self, caminho: str, conciliacao: bool = False):
+        self.caminho = str(caminho)
+        self.formato = 'csv' if self.caminho.lower().endswith('.csv') else 'jsonl'
+        self.campos = CAMPOS_REGISTRO + (CAMPOS_CONCILIACAO if conciliacao else [])
+        # utf-8-sig: o Excel reconhece os acentos dos nomes de arquivo
+        self._arquivo = open(self.caminho, 'w', encoding='utf-8-sig' if self.formato == 'csv' else 'utf-8',
+                             newline='')
+        if self.formato == 'csv':
+            self._csv = csv.DictWriter(self._arquivo, fieldnames=self.campos)
+            self._csv.writeheader()
+    
+    def escrever(self, resultado: Dict):
+        registro = {campo: resultado.get(campo) for campo in self.campos}
+        registro['veredito'] = veredito(resultado)
+        if self.formato == 'csv':
+            self._csv.writerow(registro)
+        else:
+            self._arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._arquivo.flush()
+    
+    def fechar(self):
+        self._arquivo.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *_):
+        self.fechar()
+
+
+class ResumoValidacao:
+    """
+    Contadores do lote, atualizados a cada resultado: o resumo não depende de
+    guardar os resultados. Com `esperados`, também acompanha a conciliação
+    (só as UCs vistas ficam em memória, limitadas ao tamanho do processamento).
+    """
+    
+    def __init__(self, esperados: Dict[str, Dict] = None):
+        self.esperados = esperados
+        self.contagem = {'ok': 0, 'divergente': 0, 'divergente_processador': 0, 'erro': 0}
+        self.total = 0
+        self.reaproveitados = 0
+        self.tempo_extracao = 0.0
+        self.extraidos = 0
+        self.inesperados = 0
+        self._ucs_presentes = set()
+    
+    def adicionar(self, resultado: Dict, reaproveitado: bool = False):
+        self.total += 1
+        self.contagem[veredito(resultado)] += 1
+        if reaproveitado:
+            self.reaproveitados += 1
+        if resultado.get('tempo_extracao') is not None:
+            self.tempo_extracao += resultado['tempo_extracao']
+            self.extraidos += 1
+        if self.esperados is not None:
+            uc = resultado.get('uc')
+            if uc in self.esperados:
+                self._ucs_presentes.add(uc)
+            else:
+                self.inesperados += 1
+    
+    def faltando(self) -> List[str]:
+        """Instalações processadas que não tiveram PDF."""
+        if self.esperados is None:
+            return []
+        return [e['instalacao'] for uc, e in self.esperados.items() if uc not in self._ucs_presentes]
+    
+    def texto(self) -> str:
+        linhas = ["📊 RESUMO:",
+                  f"   ✓ OK: {self.contagem['ok']}",
+                  f"   ⚠ Divergentes: {self.contagem['divergente'] + self.contagem['divergente_processador']}",
+                  f"   ❌ Erros: {self.contagem['erro']}"]
+        if self.reaproveitados:
+            linhas.append(f"   ↺ Sem mudança (do manifesto): {self.reaproveitados}")
+        linhas.append(f"   Total: {self.total}")
+        if self.extraidos:
+            linhas.append(f"   ⏱ Extração: {self.tempo_extracao:.1f}s ({self.tempo_extracao / self.extraidos:.2f}s por PDF)")
+        if self.esperados is not None:
+            faltando = self.faltando()
+            linhas.append(f"🔎 CONCILIAÇÃO COM O PROCESSADOR ({len(self.esperados)} instalações):")
+            linhas.append(f"   ⚠ Valor diferente do esperado: {self.contagem['divergente_processador']}")
+            linhas.append(f"   📭 Sem PDF: {len(faltando)}")
+            linhas.extend(f"      - {instalacao}" for instalacao in faltando)
+            linhas.append(f"   ❓ PDF sem UC no processamento: {self.inesperados}")
+        return "\n".join(linhas)
+
+
+def _destinar_pdf(pdf_path: Path, resultado: Dict, pasta_ok: Path, pasta_divergentes: Path,
+                  mover_arquivos: bool = True, sufixo: str = "") -> str:
+    """
+    Imprime o veredito e move (ou copia) o PDF para a pasta correspondente.
+    Retorna o veredito (ver `veredito`).
+    """
+    # Determinar destino
+    categoria = veredito(resultado)
+    if categoria == 'erro':
+        # Arquivos com erro vão para divergentes
+        destino = pasta_divergentes / pdf_path.name
+        status = f"❌ ERRO: {resultado['erro']}"
+    elif categoria == 'divergente':
+        destino = pasta_divergentes / pdf_path.name
+        diff = resultado['diferenca']
+        v1 = resultado['valor_pagina1']
+        v2 = resultado['valor_pagina2']
+        status = f"⚠ DIVERGENTE: Pág1=R${v1:.2f} | Pág2=R${v2:.2f} | Diff=R${diff:.2f}"
+    elif categoria == 'divergente_processador':
+        destino = pasta_divergentes / pdf_path.name
+        status = (f"⚠ DIFERE DO PROCESSADOR: PDF=R${resultado['valor_pagina1']:.2f} | "
+                  f"Esperado=R${resultado['valor_esperado']:.2f}")
+    else:
+        destino = pasta_ok / pdf_path.name
+        v = resultado['valor_pagina1']
+        status = f"✓ OK: R$ {v:.2f}"
+    
+    print(f"{pdf_path.name}: {status}{sufixo}")
+    
+    # Mover ou copiar arquivo
+    try:
+        if mover_arquivos:
+            shutil.move(str(pdf_path), str(destino))
+        else:
+            shutil.copy2(str(pdf_path), str(destino))
+    except Exception as e:
+        print(f"   Erro ao mover/copiar: {e}")
+    return categoria
+
+
 def processar_pasta(
     pasta_origem: str,
     pasta_ok: str = None,
     pasta_divergentes: str = None,
-    mover_arquivos: bool = True
+    mover_arquivos: bool = True,
+    workers: int = 1,
+    timeout: float = 120,
+    usar_manifesto: bool = True,
+    caminho_manifesto: str = None,
+    esperados: Dict[str, Dict] = None,
+    saida: str = None,
+    guardar_resultados: bool = True
 ) -> List[Dict]:
     """
     Processa todos os PDFs de uma pasta e separa em subpastas.
@@ -190,9 +646,21 @@ def processar_pasta(
         pasta_ok: Pasta para PDFs com valores iguais (default: pasta_origem/validados_ok)
         pasta_divergentes: Pasta para PDFs divergentes (default: pasta_origem/validados_divergentes)
         mover_arquivos: Se True, move os arquivos; se False, apenas copia
+        workers: Processos em paralelo; com 1, valida no próprio processo (sem timeout)
+        timeout: Segundos por PDF antes de desistir dele (só com workers > 1)
+        usar_manifesto: Se True, PDFs sem mudança desde a última validação não são
+            reabertos (ver ManifestoValidacao)
+        caminho_manifesto: default: manifesto_validacao.jsonl ao lado das pastas de saída
+        esperados: índice de carregar_esperados; cada PDF também é conferido com o
+            totalPagar da sua UC, e os que diferem vão para divergentes
+        saida: arquivo .csv ou .jsonl com um registro por PDF, gravado conforme
+            os resultados saem (ver EscritorRegistros)
+        guardar_resultados: se False, não acumula os resultados (memória constante
+            em lotes grandes; use `saida` para tê-los)
         
     Returns:
-        Lista de resultados de validação
+        Lista de resultados de validação (em ordem alfabética de arquivo);
+        vazia com guardar_resultados=False
     """
     pasta_origem = Path(pasta_origem)
     
@@ -207,8 +675,8 @@ def processar_pasta(
     pasta_ok.mkdir(exist_ok=True)
     pasta_divergentes.mkdir(exist_ok=True)
     
-    # Listar PDFs
-    pdfs = list(pasta_origem.glob("*.pdf"))
+    # Listar PDFs (ordem determinística)
+    pdfs = sorted(pasta_origem.glob("*.pdf"))
     
     if not pdfs:
         print(f"⚠ Nenhum PDF encontrado em: {pasta_origem}")
@@ -217,61 +685,240 @@ def processar_pasta(
     print(f"📂 Processando {len(pdfs)} PDF(s) em: {pasta_origem}")
     print(f"   ✓ OK: {pasta_ok}")
     print(f"   ✗ Divergentes: {pasta_divergentes}")
+    if workers > 1:
+        print(f"   ⚙ {workers} processos, tempo limite de {timeout:g}s por PDF")
     print("-" * 60)
     
     resultados = []
-    ok_count = 0
-    divergente_count = 0
-    erro_count = 0
+    resumo = ResumoValidacao(esperados)
+    escritor = EscritorRegistros(saida, conciliacao=esperados is not None) if saida else None
     
-    for pdf_path in pdfs:
-        resultado = validar_pdf(str(pdf_path))
-        resultados.append(resultado)
-        
-        # Determinar destino
-        if resultado['erro']:
-            # Arquivos com erro vão para divergentes
-            destino = pasta_divergentes / pdf_path.name
-            erro_count += 1
-            status = f"❌ ERRO: {resultado['erro']}"
-        elif resultado['divergente']:
-            destino = pasta_divergentes / pdf_path.name
-            divergente_count += 1
-            diff = resultado['diferenca']
-            v1 = resultado['valor_pagina1']
-            v2 = resultado['valor_pagina2']
-            status = f"⚠ DIVERGENTE: Pág1=R${v1:.2f} | Pág2=R${v2:.2f} | Diff=R${diff:.2f}"
-        else:
-            destino = pasta_ok / pdf_path.name
-            ok_count += 1
-            v = resultado['valor_pagina1']
-            status = f"✓ OK: R$ {v:.2f}"
-        
-        print(f"{pdf_path.name}: {status}")
-        
-        # Mover ou copiar arquivo
-        try:
-            if mover_arquivos:
-                shutil.move(str(pdf_path), str(destino))
+    caminhos = [str(p) for p in pdfs]
+    manifesto = None
+    anteriores = {}
+    if usar_manifesto:
+        manifesto = ManifestoValidacao(caminho_manifesto or pasta_ok.parent / NOME_MANIFESTO)
+        for caminho in caminhos:
+            anterior = manifesto.consultar(caminho)
+            if anterior:
+                anteriores[caminho] = anterior
+    pendentes = [c for c in caminhos if c not in anteriores]
+    if anteriores:
+        print(f"   ↺ {len(anteriores)} sem mudança desde a última validação, {len(pendentes)} a validar")
+    
+    if workers > 1:
+        validacoes = validar_em_paralelo(pendentes, workers, timeout)
+    else:
+        validacoes = ((c, validar_pdf(c)) for c in pendentes)
+    
+    # Os arquivos só são movidos aqui, no processo principal, depois do resultado
+    try:
+        for caminho in caminhos:
+            reaproveitado = anteriores.pop(caminho, None)
+            if reaproveitado:
+                resultado = reaproveitado
             else:
-                shutil.copy2(str(pdf_path), str(destino))
-        except Exception as e:
-            print(f"   Erro ao mover/copiar: {e}")
+                _, resultado = next(validacoes)
+                if manifesto:
+                    manifesto.registrar(caminho, resultado)
+            if esperados is not None:
+                comparar_com_esperado(resultado, esperados)
+            
+            _destinar_pdf(Path(caminho), resultado, pasta_ok, pasta_divergentes, mover_arquivos,
+                          sufixo=" (sem mudança)" if reaproveitado else "")
+            resumo.adicionar(resultado, reaproveitado=bool(reaproveitado))
+            if escritor:
+                escritor.escrever(resultado)
+            if guardar_resultados:
+                resultados.append(resultado)
+    finally:
+        if escritor:
+            escritor.fechar()
+        if manifesto:
+            manifesto.compactar()
     
     # Resumo
     print("-" * 60)
-    print(f"📊 RESUMO:")
-    print(f"   ✓ OK: {ok_count}")
-    print(f"   ⚠ Divergentes: {divergente_count}")
-    print(f"   ❌ Erros: {erro_count}")
-    print(f"   Total: {len(pdfs)}")
+    print(resumo.texto())
+    if escritor:
+        print(f"📄 Registros gravados em: {saida}")
+    
+    return resultados
+
+
+# =================================================================
+# MODO CONTÍNUO (vigiar pasta)
+# =================================================================
+
+def _instantaneo(pasta: Path) -> Dict[str, Tuple[int, float]]:
+    """Nome -> (tamanho, mtime) dos PDFs da pasta (sem subpastas)."""
+    instantaneo = {}
+    with os.scandir(pasta) as entradas:
+        for entrada in entradas:
+            if entrada.is_file() and entrada.name.lower().endswith('.pdf'):
+                try:
+                    info = entrada.stat()
+                except FileNotFoundError:
+                    continue  # removido entre a listagem e o stat
+                instantaneo[entrada.name] = (info.st_size, info.st_mtime)
+    return instantaneo
+
+
+def vigiar_pasta(
+    pasta_origem: str,
+    pasta_ok: str = None,
+    pasta_divergentes: str = None,
+    workers: int = 2,
+    timeout: float = 120,
+    intervalo: float = 2.0,
+    tamanho_fila: int = None,
+    encerrar_ocioso: float = None,
+    usar_manifesto: bool = True,
+    caminho_manifesto: str = None,
+    esperados: Dict[str, Dict] = None,
+    saida: str = None,
+    guardar_resultados: bool = True
+) -> List[Dict]:
+    """
+    Modo contínuo: valida os PDFs à medida que chegam na pasta (ex: extraídos do
+    ZIP enquanto o gerador ainda roda) e move cada um para validados_ok /
+    validados_divergentes assim que o resultado sai.
+    
+    A pasta é varrida a cada `intervalo` segundos. Um PDF entra na fila quando
+    aparece com o mesmo tamanho e mtime em duas varreduras seguidas (terminou de
+    ser gravado). A fila é limitada a `tamanho_fila` arquivos em validação
+    (default: 2 x workers); o excedente espera no disco até a próxima varredura.
+    
+    Roda até Ctrl+C ou até passar `encerrar_ocioso` segundos sem arquivo novo e
+    com a fila vazia. Os demais argumentos são os de processar_pasta.
+    
+    Returns:
+        Lista de resultados, na ordem em que ficaram prontos (vazia com
+        guardar_resultados=False)
+    """
+    pasta_origem = Path(pasta_origem)
+    if not pasta_origem.exists():
+        raise ValueError(f"Pasta não encontrada: {pasta_origem}")
+    
+    pasta_ok = Path(pasta_ok) if pasta_ok else pasta_origem / "validados_ok"
+    pasta_divergentes = Path(pasta_divergentes) if pasta_divergentes else pasta_origem / "validados_divergentes"
+    pasta_ok.mkdir(exist_ok=True)
+    pasta_divergentes.mkdir(exist_ok=True)
+    tamanho_fila = tamanho_fila or 2 * workers
+    manifesto = ManifestoValidacao(caminho_manifesto or pasta_ok.parent / NOME_MANIFESTO) if usar_manifesto else None
+    
+    print(f"👀 Vigiando {pasta_origem} a cada {intervalo:g}s (Ctrl+C para encerrar)")
+    print(f"   ⚙ {workers} processos, fila de {tamanho_fila}, tempo limite de {timeout:g}s por PDF")
+    print("-" * 60)
+    
+    resultados = []
+    resumo = ResumoValidacao(esperados)
+    escritor = EscritorRegistros(saida, conciliacao=esperados is not None) if saida else None
+    tratados: Dict[str, Tuple[int, float]] = {}
+    # nome -> [tarefa, instantâneo do arquivo, início]; ordem de envio = ordem do pool
+    em_validacao: Dict[str, list] = {}
+    
+    def concluir(nome, resultado, estado, reaproveitado=False):
+        caminho = str(pasta_origem / nome)
+        if manifesto and not reaproveitado:
+            manifesto.registrar(caminho, resultado)
+        if esperados is not None:
+            comparar_com_esperado(resultado, esperados)
+        _destinar_pdf(Path(caminho), resultado, pasta_ok, pasta_divergentes,
+                      sufixo=" (sem mudança)" if reaproveitado else "")
+        resumo.adicionar(resultado, reaproveitado=reaproveitado)
+        if escritor:
+            escritor.escrever(resultado)
+        if guardar_resultados:
+            resultados.append(resultado)
+        if os.path.exists(caminho):
+            tratados[nome] = estado  # o move falhou: não revalida o mesmo arquivo
+    
+    pool = multiprocessing.Pool(workers)
+    anterior: Dict[str, Tuple[int, float]] = {}
+    ultima_atividade = time.monotonic()
+    try:
+        while True:
+            agora = time.monotonic()
+            
+            # Os `workers` primeiros enviados são os que estão rodando: o relógio
+            # do tempo limite só começa para eles
+            for item in list(em_validacao.values())[:workers]:
+                if item[2] is None:
+                    item[2] = agora
+            
+            # 1. Resultados prontos (ou estourados)
+            travou = False
+            for nome, (tarefa, estado, inicio) in list(em_validacao.items()):
+                caminho = str(pasta_origem / nome)
+                if tarefa.ready():
+                    resultado = _resultado_pronto(tarefa, caminho)
+                elif inicio is not None and agora - inicio > timeout:
+                    resultado = _resultado_com_erro(caminho, f"Tempo limite excedido ({timeout:g}s)")
+                    travou = True
+                else:
+                    continue
+                del em_validacao[nome]
+                concluir(nome, resultado, estado)
+            
+            if travou:
+                # Descarta o worker travado e reenvia o que ainda estava na fila
+                pool.terminate()
+                pool.join()
+                pool = multiprocessing.Pool(workers)
+                for nome, item in em_validacao.items():
+                    item[0] = pool.apply_async(validar_pdf, (str(pasta_origem / nome),))
+                    item[2] = None
+            
+            # 2. Varredura: arquivos estáveis desde a anterior entram na fila
+            atual = _instantaneo(pasta_origem)
+            for nome in sorted(atual):
+                estado = atual[nome]
+                if nome in em_validacao or tratados.get(nome) == estado:
+                    continue
+                if anterior.get(nome) != estado or estado[0] == 0:
+                    ultima_atividade = agora
+                    continue  # novo ou ainda sendo gravado
+                if len(em_validacao) >= tamanho_fila:
+                    break
+                ultima_atividade = agora
+                caminho = str(pasta_origem / nome)
+                reaproveitado = manifesto.consultar(caminho) if manifesto else None
+                if reaproveitado:
+                    concluir(nome, reaproveitado, estado, reaproveitado=True)
+                else:
+                    em_validacao[nome] = [pool.apply_async(validar_pdf, (caminho,)), estado, None]
+            anterior = atual
+            
+            if em_validacao:
+                ultima_atividade = agora
+            elif encerrar_ocioso is not None and agora - ultima_atividade >= encerrar_ocioso:
+                break
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        print("\n⏹ Encerrado pelo usuário")
+    finally:
+        pool.terminate()
+        pool.join()
+        if escritor:
+            escritor.fechar()
+        if manifesto:
+            manifesto.compactar()
+    
+    print("-" * 60)
+    print(resumo.texto())
+    if em_validacao:
+        print(f"   ⏸ Não concluídos (ficaram na pasta): {len(em_validacao)}")
+    if escritor:
+        print(f"📄 Registros gravados em: {saida}")
     
     return resultados
 
 
-def gerar_relatorio(resultados: List[Dict], caminho_saida: str = None) -> str:
+def gerar_relatorio(resultados: List[Dict], caminho_saida: str = None, esperados: Dict[str, Dict] = None) -> str:
     """
-    Gera relatório em texto com os resultados da validação.
+    Gera relatório em texto com os resultados da validação
+    (e a conciliação com o processador, se `esperados` for dado).
     """
     linhas = ["=" * 60]
     linhas.append("RELATÓRIO DE VALIDAÇÃO DE VALORES - FATURAS PDF")
@@ -280,7 +927,7 @@ def gerar_relatorio(resultados: List[Dict], caminho_saida: str = None) -> str:
     
     divergentes = [r for r in resultados if r.get('divergente')]
     erros = [r for r in resultados if r.get('erro')]
-    ok = [r for r in resultados if not r.get('divergente') and not r.get('erro')]
+    ok = [r for r in resultados if not r.get('divergente') and not r.get('erro') and not r.get('divergente_esperado')]
     
     if divergentes:
         linhas.append("⚠ DIVERGÊNCIAS ENCONTRADAS:")
@@ -299,10 +946,38 @@ def gerar_relatorio(resultados: List[Dict], caminho_saida: str = None) -> str:
             linhas.append(f"  {r['arquivo']}: {r['erro']}")
         linhas.append("")
     
+    if esperados is not None:
+        conciliacao = conciliar(resultados, esperados)
+        if conciliacao['diferentes']:
+            linhas.append("⚠ VALORES DIFERENTES DO PROCESSADOR (totalPagar):")
+            linhas.append("-" * 40)
+            for r in conciliacao['diferentes']:
+                linhas.append(f"  Arquivo: {r['arquivo']}")
+                linhas.append(f"    Esperado: R$ {r['valor_esperado']:.2f}")
+                linhas.append(f"    Página 1 (Fatura): R$ {r['valor_pagina1']:.2f}")
+                linhas.append(f"    Página 2 (Boleto): R$ {r['valor_pagina2']:.2f}")
+                linhas.append("")
+        if conciliacao['faltando']:
+            linhas.append("📭 INSTALAÇÕES PROCESSADAS SEM PDF:")
+            linhas.append("-" * 40)
+            for instalacao in conciliacao['faltando']:
+                linhas.append(f"  {instalacao}")
+            linhas.append("")
+        if conciliacao['inesperados']:
+            linhas.append("❓ PDFs SEM UC NO PROCESSAMENTO:")
+            linhas.append("-" * 40)
+            for arquivo in conciliacao['inesperados']:
+                linhas.append(f"  {arquivo}")
+            linhas.append("")
+    
     linhas.append("📊 RESUMO:")
     linhas.append(f"   ✓ OK: {len(ok)}")
     linhas.append(f"   ⚠ Divergentes: {len(divergentes)}")
     linhas.append(f"   ❌ Erros: {len(erros)}")
+    if esperados is not None:
+        linhas.append(f"   ⚠ Diferentes do processador: {len(conciliacao['diferentes'])}")
+        linhas.append(f"   📭 Sem PDF: {len(conciliacao['faltando'])}")
+        linhas.append(f"   ❓ Sem UC no processamento: {len(conciliacao['inesperados'])}")
     linhas.append(f"   Total: {len(resultados)}")
     
     texto = "\n".join(linhas)
@@ -318,24 +993,51 @@ def gerar_relatorio(resultados: List[Dict], caminho_saida: str = None) -> str:
 # === INTERFACE DE LINHA DE COMANDO ===
 if __name__ == "__main__":
     import sys
+    import argparse
     
-    if len(sys.argv) < 2:
-        print("Uso: python pdf_value_validator.py <pasta_com_pdfs>")
-        print("")
-        print("Exemplo:")
-        print("  python pdf_value_validator.py C:\\Faturas\\Novembro")
-        print("")
-        print("Os PDFs serão separados em:")
-        print("  - <pasta>/validados_ok (valores iguais)")
-        print("  - <pasta>/validados_divergentes (valores diferentes)")
-        sys.exit(1)
-    
-    pasta = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description="Valida os PDFs de uma pasta (valor da página 1 x página 2).",
+        epilog="Exemplo: python pdf_value_validator.py C:\\Faturas\\Novembro --workers 4\n\n"
+               "Os PDFs serão separados em:\n"
+               "  - <pasta>/validados_ok (valores iguais)\n"
+               "  - <pasta>/validados_divergentes (valores diferentes)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("pasta", help="pasta com os PDFs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processos em paralelo (padrão: nº de CPUs; 1 = sequencial)")
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="segundos por PDF antes de marcá-lo como erro (padrão: 120)")
+    parser.add_argument("--sem-manifesto", action="store_true",
+                        help="revalida todos os PDFs, ignorando o manifesto_validacao.jsonl")
+    parser.add_argument("--vigiar", action="store_true",
+                        help="modo contínuo: valida os PDFs conforme chegam na pasta")
+    parser.add_argument("--intervalo", type=float, default=2.0,
+                        help="(--vigiar) segundos entre varreduras da pasta (padrão: 2)")
+    parser.add_argument("--fila", type=int, default=None,
+                        help="(--vigiar) máximo de PDFs em validação ao mesmo tempo (padrão: 2 x workers)")
+    parser.add_argument("--encerrar-ocioso", type=float, default=None, metavar="SEGUNDOS",
+                        help="(--vigiar) encerra após tantos segundos sem PDF novo")
+    parser.add_argument("--saida", metavar="ARQUIVO",
+                        help="grava um registro por PDF (.csv ou .jsonl) conforme saem os resultados; "
+                             "nesse caso os resultados não ficam em memória")
+    parser.add_argument("--esperado", metavar="SAIDA_PROCESSADOR",
+                        help="JSON/NDJSON do processador do mês: confere cada PDF com o totalPagar "
+                             "da sua UC e lista PDFs faltando ou sobrando")
+    args = parser.parse_args()
     
     try:
-        resultados = processar_pasta(pasta)
+        esperados = carregar_esperados(args.esperado) if args.esperado else None
+        comuns = dict(workers=args.workers, timeout=args.timeout, usar_manifesto=not args.sem_manifesto,
+                      esperados=esperados, saida=args.saida, guardar_resultados=not args.saida)
+        if args.vigiar:
+            resultados = vigiar_pasta(args.pasta, intervalo=args.intervalo, tamanho_fila=args.fila,
+                                      encerrar_ocioso=args.encerrar_ocioso, **comuns)
+        else:
+            resultados = processar_pasta(args.pasta, **comuns)
+        # Com --saida, o resumo (contadores) já foi impresso e o detalhe está no arquivo
         if resultados:
-            relatorio = gerar_relatorio(resultados)
+            relatorio = gerar_relatorio(resultados, esperados=esperados)
             print("\n" + relatorio)
     except Exception as e:
         print(f"❌ Erro: {e}")
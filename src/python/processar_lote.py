@@ -0,0 +1,186 @@
+"""
+Processamento em lote de vários relatórios (um por usina) pela linha de comando.
+
+Cada planilha é processada por processar_relatorio_para_fatura num processo
+separado (a leitura com openpyxl é CPU-bound e segura o GIL, então só
+paralelismo por processo usa todos os núcleos).
+
+Uso:
+    python processar_lote.py <pasta_ou_glob> --mes 2025-11 --vencimento 2025-12-10 [--jobs 4] [--saida pasta]
+
+Saída (em --saida, padrão <pasta dos relatórios>/resultados_<mes>):
+    <nome_do_relatorio>.json   resultado de cada planilha ({data, warnings} ou {error});
+                               planilhas de mesmo nome em pastas diferentes viram
+                               <pasta>__<nome>.json (ver nomes_de_saida)
+    resumo.json                consolidado: status, nº de clientes/warnings e tempo por arquivo
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from processor import processar_relatorio_para_fatura
+
+
+def listar_relatorios(entrada: str) -> List[str]:
+    """Aceita uma pasta (todas as .xlsx dela) ou um padrão glob."""
+    if os.path.isdir(entrada):
+        arquivos = glob.glob(os.path.join(entrada, '*.xlsx'))
+    else:
+        arquivos = glob.glob(entrada)
+    # Ignora arquivos de lock do Excel (~$Relatorio.xlsx)
+    return sorted(a for a in arquivos if os.path.isfile(a) and not os.path.basename(a).startswith('~$'))
+
+
+def nomes_de_saida(arquivos: List[str]) -> Dict[str, str]:
+    """
+    Nome do JSON de cada planilha: o nome dela ou, quando planilhas de pastas
+    diferentes têm o mesmo nome (ex: */relatorio.xlsx), o caminho relativo à
+    pasta comum com as pastas unidas por '__'. Um sufixo _2, _3... desfaz o que
+    ainda colidir (inclusive com resumo.json). Sem diferenciar maiúsculas, como
+    no Windows.
+    """
+    repetidos = Counter(Path(a).stem.lower() for a in arquivos)
+    pastas = [os.path.dirname(os.path.abspath(a)) for a in arquivos]
+    try:
+        comum = os.path.commonpath(pastas) if pastas else ''
+    except ValueError:
+        comum = ''  # unidades diferentes no Windows
+
+    nomes, usados = {}, {'resumo'}
+    for caminho in arquivos:
+        nome = Path(caminho).stem
+        if repetidos[nome.lower()] > 1:
+            sem_extensao = os.path.splitext(os.path.abspath(caminho))[0]
+            relativo = os.path.relpath(sem_extensao, comum) if comum else sem_extensao
+            nome = '__'.join(p for p in Path(relativo).parts if p not in (os.sep, Path(relativo).anchor))
+        candidato, n = nome, 2
+        while candidato.lower() in usados:
+            candidato, n = f"{nome}_{n}", n + 1
+        usados.add(candidato.lower())
+        nomes[caminho] = candidato + '.json'
+    return nomes
+
+
+def processar_arquivo(caminho: str, mes_referencia: str, vencimento: str, pasta_saida: str,
+                      nome_saida: str = None) -> Dict:
+    """
+    Processa uma planilha e grava o JSON em pasta_saida (<nome>.json ou `nome_saida`).
+    Roda no processo worker; devolve só o resumo (o JSON completo fica no disco).
+    """
+    inicio = time.perf_counter()
+    saida = os.path.join(pasta_saida, nome_saida or Path(caminho).stem + '.json')
+    resumo = {"arquivo": caminho, "saida": saida}
+
+    try:
+        # Os prints de diagnóstico do processor se misturariam entre os workers.
+        # O caminho vai direto: a planilha é mapeada em memória, não lida inteira
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado_json = processar_relatorio_para_fatura(caminho, mes_referencia, vencimento)
+        with open(saida, 'w', encoding='utf-8') as f:
+            f.write(resultado_json)
+
+        resultado = json.loads(resultado_json)
+        if "error" in resultado:
+            resumo.update(status="erro", erro=resultado["error"])
+        else:
+            resumo.update(status="ok", clientes=len(resultado["data"]), warnings=len(resultado["warnings"]))
+    except Exception as e:
+        resumo.update(status="erro", erro=str(e))
+
+    resumo["segundos"] = round(time.perf_counter() - inicio, 3)
+    return resumo
+
+
+def processar_lote(arquivos: List[str], mes_referencia: str, vencimento: str,
+                   pasta_saida: str, jobs: int = None) -> Dict:
+    """
+    Distribui as planilhas num pool de processos e grava resumo.json.
+    Retorna o resumo consolidado.
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(arquivos) or 1))
+    inicio = time.perf_counter()
+    resultados = []
+    nomes = nomes_de_saida(arquivos)
+
+    def registrar(resumo):
+        resultados.append(resumo)
+        if resumo["status"] == "ok":
+            print(f"✅ {Path(resumo['arquivo']).name}: {resumo['clientes']} clientes, "
+                  f"{resumo['warnings']} avisos ({resumo['segundos']:.1f}s)")
+        else:
+            print(f"❌ {Path(resumo['arquivo']).name}: {resumo['erro']}")
+
+    if jobs == 1:
+        for caminho in arquivos:
+            registrar(processar_arquivo(caminho, mes_referencia, vencimento, pasta_saida, nomes[caminho]))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futuros = {pool.submit(processar_arquivo, caminho, mes_referencia, vencimento, pasta_saida,
+                                   nomes[caminho]): caminho
+                       for caminho in arquivos}
+            for futuro in as_completed(futuros):
+                try:
+                    resumo = futuro.result()
+                except Exception as e:
+                    # Worker morto (BrokenProcessPool: falta de memória, crash no openpyxl...):
+                    # a planilha entra no resumo como erro e o lote segue até o resumo.json
+                    caminho = futuros[futuro]
+                    resumo = {"arquivo": caminho, "saida": os.path.join(pasta_saida, nomes[caminho]),
+                              "status": "erro", "erro": f"{type(e).__name__}: {e}", "segundos": None}
+                registrar(resumo)
+
+    resultados.sort(key=lambda r: r["arquivo"])
+    consolidado = {
+        "mes_referencia": mes_referencia,
+        "vencimento": vencimento,
+        "jobs": jobs,
+        "arquivos": len(resultados),
+        "ok": sum(1 for r in resultados if r["status"] == "ok"),
+        "erros": sum(1 for r in resultados if r["status"] == "erro"),
+        "clientes": sum(r.get("clientes", 0) for r in resultados),
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "resultados": resultados,
+    }
+    with open(os.path.join(pasta_saida, 'resumo.json'), 'w', encoding='utf-8') as f:
+        json.dump(consolidado, f, ensure_ascii=False, indent=2)
+    return consolidado
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Processa em paralelo os relatórios de várias usinas.")
+    parser.add_argument("entrada", help="pasta com os relatórios .xlsx ou padrão glob (entre aspas)")
+    parser.add_argument("--mes", required=True, help="mês de referência (AAAA-MM ou AAAA-MM-DD)")
+    parser.add_argument("--vencimento", required=True, help="data de vencimento (AAAA-MM-DD)")
+    parser.add_argument("--jobs", type=int, default=None, help="processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--saida", default=None, help="pasta de saída (padrão: <pasta>/resultados_<mes>)")
+    args = parser.parse_args(argv)
+
+    arquivos = listar_relatorios(args.entrada)
+    if not arquivos:
+        print(f"❌ Nenhum relatório .xlsx encontrado em: {args.entrada}")
+        return 1
+
+    base = args.entrada if os.path.isdir(args.entrada) else os.path.dirname(arquivos[0])
+    pasta_saida = args.saida or os.path.join(base, f"resultados_{args.mes}")
+
+    print(f"📂 {len(arquivos)} relatório(s) para {args.mes} → {pasta_saida}")
+    resumo = processar_lote(arquivos, args.mes, args.vencimento, pasta_saida, args.jobs)
+    print(f"\n📊 {resumo['ok']}/{resumo['arquivos']} ok, {resumo['clientes']} clientes, "
+          f"{resumo['jobs']} processo(s), {resumo['segundos']:.1f}s")
+    return 0 if resumo["erros"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
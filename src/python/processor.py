@@ -1,39 +1,35 @@
 import pandas as pd
-import io, json
+import numpy as np
+import json
 import traceback
 import warnings as python_warnings
 from datetime import datetime
 import re
-from typing import Optional, Dict, Any
-import os
-from pathlib import Path
+from typing import Dict, Any
+import time
+
+try:
+    # Execução como módulo (servidor / scripts de linha de comando)
+    from utils_normalizers import (
+        to_num, parse_money_series, conversor_de_datas,
+    )
+    from excel_utils import WorkbookIndex, abrir_planilha, read_sheet_filtered, read_sheet_grouped
+    from processor_comum import (
+        CO2_PER_KWH, TREES_PER_TON_CO2, FORMATOS_RESULTADO, COLUMNS_MAP,
+        carregar_config, carregar_base_clientes, escolher_aba_base_clientes,
+        resolver_colunas_clientes, mapear_detalhe, periodo_referencia,
+        localizar_aba_clientes, carregar_base_externa_medida, mesclar_mapas_clientes,
+        MedidorEtapas, _json_com_metricas, _avisos_valores_invalidos,
+    )
+except ImportError:
+    # Pyodide: os módulos são executados em sequência no mesmo escopo global
+    # (ver excelProcessor.js), então essas funções já estão definidas.
+    pass
 
 # =================================================================
 # MÓDULO DE CÁLCULOS INTEGRADO (MODO ESPELHO)
 # =================================================================
 
-CO2_PER_KWH = 0.07
-TREES_PER_TON_CO2 = 8
-
-def to_num(val):
-    """
-    Converte valores para float de forma segura (BR ou US).
-    """
-    if pd.isna(val) or val == '': return 0.0
-    try:
-        if isinstance(val, (int, float)): return float(val)
-        val_str = str(val).strip().replace('R$', '').replace(' ', '')
-        if ',' in val_str and '.' in val_str:
-            if val_str.rfind(',') > val_str.rfind('.'): # BR
-                val_str = val_str.replace('.', '').replace(',', '.')
-            else: # US
-                val_str = val_str.replace(',', '')
-        elif ',' in val_str: # BR
-            val_str = val_str.replace(',', '.')
-        return float(val_str)
-    except:
-        return 0.0
-
 def compute_metrics(row, cols_map, vencimento_iso):
     """
     Prepara os dados para o PDF coletando TODOS os valores da planilha.
@@ -120,218 +116,189 @@ def compute_metrics(row, cols_map, vencimento_iso):
     }
 
 # =================================================================
-# PROCESSADOR PRINCIPAL
+# MOTOR COLUNAR (MESMO RESULTADO DE compute_metrics, PARA O MÊS INTEIRO)
 # =================================================================
 
-# Suprime warnings do openpyxl
-python_warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
+def _arredondar(valores, casas=2):
+    """
+    Equivalente vetorizado de round(float(x or 0), casas).
+    np.round difere do round() do Python em valores próximos de empate
+    (ex: 1.005), então esses poucos casos são refeitos com round().
+    """
+    valores = np.asarray(valores, dtype=float) + 0.0  # -0.0 vira 0.0, como em float(x or 0)
+    resultado = np.round(valores, casas)
+    fracao = np.abs(valores * (10.0 ** casas)) % 1.0
+    for i in np.flatnonzero(np.abs(fracao - 0.5) < 1e-6):
+        resultado[i] = round(float(valores[i]), casas)
+    return resultado
+
+def _coluna_num(df, col, invalidos=None):
+    """
+    Converte a coluna inteira com parse_money_series (0.0 quando não mapeada).
+    Se `invalidos` for um dict, acumula nele {coluna: células não convertidas}.
+    """
+    if not col or col not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    valores, n_invalidos = parse_money_series(df[col])
+    if n_invalidos and invalidos is not None:
+        invalidos[col] = n_invalidos
+    return valores
+
+def _coluna_texto(df, col):
+    """Aplica safe_str na coluna inteira ('' para vazios ou coluna não mapeada)."""
+    texto = pd.Series('', index=df.index, dtype=object)
+    if not col or col not in df.columns:
+        return texto
+    serie = df[col]
+    preenchido = serie.notna()
+    if preenchido.any():
+        texto[preenchido] = serie[preenchido].astype(object).map(str).str.strip()
+    return texto
+
+def _campo_cadastral(df, cols_map, field, fichas=None):
+    """
+    Versão colunar do get_val: valor da linha primeiro, ficha do cliente depois.
+    `fichas` é um DataFrame alinhado ao índice de `df` com os campos da base de clientes.
+    """
+    valor = _coluna_texto(df, cols_map.get(field))
+    if fichas is not None and field in fichas.columns:
+        da_ficha = fichas[field].where(fichas[field].notna(), '').astype(object)
+        valor = valor.where(valor != '', da_ficha)
+    return valor
+
+def compute_metrics_frame(df, cols_map, vencimento_iso, fichas=None, invalidos=None):
+    """
+    Prepara os dados de TODAS as UCs do mês de uma só vez (coluna a coluna).
+    Produz exatamente os mesmos campos e valores de compute_metrics linha a linha,
+    mais o 'endereco' concatenado (rua - bairro - cidade).
+    NENHUM VALOR FINANCEIRO É CALCULADO - todos vêm da planilha.
+    Células financeiras não numéricas são contadas em `invalidos` (ver _coluna_num).
+    """
+    def get(key):
+        return _coluna_num(df, cols_map.get(key), invalidos).to_numpy()
+
+    consumo_qtd = get('consumo_qtd')
+    comp_qtd = get('comp_qtd')
+    tarifa_consumo = get('tarifa_consumo')
+    tarifa_credito = get('tarifa_credito')
+    dist_total = get('fatura_c_gd')
+    outros = get('outros')
+    egs_total = get('boleto_ev')
+    custo_sem_solar = get('custo_sem_gd')
+    custo_com_solar = get('custo_com_gd')
+    economia_planilha = get('economia')
+
+    # Mesma cadeia de fallback: economia da planilha -> diferença de custos -> zero
+    economia_mes = np.where(
+        economia_planilha > 0,
+        economia_planilha,
+        np.where(
+            (custo_sem_solar > 0) & (custo_com_solar > 0),
+            np.maximum(0.0, custo_sem_solar - custo_com_solar),
+            0.0
+        )
+    )
+
+    co2_evitado = consumo_qtd * CO2_PER_KWH
+    arvores = (co2_evitado / 1000.0) * TREES_PER_TON_CO2
+
+    r = _arredondar
+    n = len(df)
+    metricas = pd.DataFrame({
+        # Bloco Distribuidora
+        "dist_consumo_qtd": r(consumo_qtd),
+        "dist_consumo_tar": r(tarifa_consumo, 4),
+        "dist_consumo_total": r(dist_total),
+        "dist_comp_qtd": r(comp_qtd),
+        "dist_comp_tar": np.zeros(n, dtype=int),
+        "dist_comp_total": np.zeros(n, dtype=int),
+        "dist_outros": r(outros),
+        "dist_total": r(dist_total),
+
+        # Bloco EGS / Boleto
+        "det_credito_qtd": r(comp_qtd),
+        "det_credito_tar": r(tarifa_credito, 4),
+        "det_credito_total": r(egs_total),
+        "det_total_contrib": r(egs_total),
+        "totalPagar": r(egs_total),
+
+        # Economia
+        "econ_total_sem": r(custo_sem_solar),
+        "econ_total_com": r(custo_com_solar),
+        "economiaMes": r(economia_mes),
+
+        # Métricas Ambientais
+        "co2Evitado": r(co2_evitado),
+        "arvoresEquivalentes": r(arvores, 1),
+
+        # Datas (emissão calculada uma vez para o lote todo)
+        "vencimento_iso": vencimento_iso,
+        "emissao_iso": datetime.now().strftime('%Y-%m-%d'),
+    }, index=df.index)
+
+    # Endereço completo: "rua - bairro - cidade", pulando partes vazias
+    endereco = _campo_cadastral(df, cols_map, 'endereco', fichas)
+    for field in ('bairro', 'cidade'):
+        parte = _campo_cadastral(df, cols_map, field, fichas)
+        separador = np.where((endereco != '') & (parte != ''), ' - ', '')
+        endereco = endereco + separador + parte
+    metricas['endereco'] = endereco
+
+    return metricas
 
 # =================================================================
-# CONFIGURAÇÃO E CARREGAMENTO DE BASE EXTERNA
+# PROCESSADOR PRINCIPAL
 # =================================================================
 
-def carregar_config():
-    """Carrega configuração do arquivo config.json"""
-    try:
-        # Tentar diferentes caminhos para compatibilidade com Pyodide e servidor
-        possible_paths = []
-        
-        # 1. Caminho raiz do Pyodide (onde excelProcessor.js escreve o arquivo)
-        possible_paths.append(Path('/config.json'))
-        
-        # 2. Tentar usar __file__ (funciona em servidor Python normal)
-        try:
-            possible_paths.append(Path(__file__).parent / 'config.json')
-        except NameError:
-            pass  # __file__ não existe no Pyodide
-        
-        # 3. Tentar caminhos relativos
-        possible_paths.append(Path('config.json'))
-        possible_paths.append(Path('./config.json'))
-        possible_paths.append(Path('src/python/config.json'))
-        
-        # Tentar cada caminho
-        for config_path in possible_paths:
-            try:
-                if config_path.exists():
-                    with open(config_path, 'r', encoding='utf-8') as f:
-                        config = json.load(f)
-                        print(f"✓ Configuração carregada de: {config_path}")
-                        return config
-            except:
-                continue
-        
-        print("⚠ Arquivo config.json não encontrado em nenhum caminho")
-    except Exception as e:
-        print(f"⚠ Erro ao carregar config.json: {e}")
-    return {}
-
-def carregar_base_clientes_externa(config):
-    """
-    Carrega a base de clientes de um arquivo externo configurado.
-    Retorna um mapa {UC: {nome, doc, endereco, bairro, cidade, num_conta}}
-    """
-    if not config.get('enable_external_client_db', False):
-        print("📋 Base de clientes externa desabilitada na configuração")
-        return {}
-    
-    db_path = config.get('client_database_path', '')
-    
-    # Prioridade 1: Arquivo carregado via upload no Pyodide (/external_client_db.xlsx)
-    # Prioridade 2: Caminho do SharePoint (expandir variáveis de ambiente)
-    if db_path and not db_path.startswith('/'):
-        db_path = os.path.expandvars(db_path)
-    
-    if not db_path or not os.path.exists(db_path):
-        print(f"⚠ Arquivo de base de clientes não encontrado: {db_path}")
-        return {}
-    
-    try:
-        print(f"📂 Carregando base de clientes externa: {db_path}")
-        xls_ext = pd.ExcelFile(db_path, engine='openpyxl')
-        
-        # Tentar encontrar a aba correta
-        sheet_name = config.get('client_database_sheet', None)
-        if not sheet_name or sheet_name not in xls_ext.sheet_names:
-            # Tentar primeira aba ou aba com nome relevante
-            for sn in xls_ext.sheet_names:
-                if any(term in sn.lower() for term in ['cliente', 'base', 'cadastro']):
-                    sheet_name = sn
-                    break
-            if not sheet_name:
-                sheet_name = xls_ext.sheet_names[0]
-        
-        print(f"📄 Usando aba: '{sheet_name}'")
-        
-        # Usar header_row configurado ou tentar encontrar automaticamente
-        h_idx = config.get('client_database_header_row', None)
-        
-        if h_idx is None:
-            # Tentar encontrar header automaticamente
-            _, h_idx = find_sheet_and_header(
-                xls_ext, 
-                ["Instalação", "Nome", "CPF", "CNPJ", "Endereço", "NOME COMPLETO"],
-                prefer_name=sheet_name
-            )
-        else:
-            print(f"✓ Usando header configurado: linha {h_idx}")
-        
-        df_ext = pd.read_excel(xls_ext, sheet_name=sheet_name, header=h_idx)
-        print(f"✓ Base externa carregada: {len(df_ext)} linhas")
-        print(f"  Colunas disponíveis: {list(df_ext.columns[:15])}")
-        
-        mapa = criar_mapa_completo_clientes(df_ext)
-        print(f"✓ Mapa de clientes externos criado: {len(mapa)} registros")
-        
-        return mapa
-        
-    except Exception as e:
-        print(f"✗ ERRO ao carregar base de clientes externa: {str(e)}")
-        print(f"   Traceback: {traceback.format_exc()}")
-        return {}
+# Suprime warnings do openpyxl
+python_warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
-# COLUMNS_MAP AJUSTADO COM NOMES REAIS DAS COLUNAS DO RELATÓRIO
-COLUMNS_MAP = {
-    'ref': ["REF (sempre dia 01 de cada mês)", "REF", "Mês de Referência", "Competência", "Data", "Data Ref", "Referencia", "Mês", "Referência", "Data Emissao"],
-    'inst': ["Instalação", "Nº Instalação", "UC", "Codigo"],
-    # Dados Cadastrais
-    'nome': ["NOME COMPLETO OU RAZÃO SOCIAL", "Nome Cliente", "Nome/Razão Social", "Cliente", "NOME", "RAZÃO SOCIAL"],
-    'doc': ["CNPJ", "Documento", "CPF/CNPJ", "CPF"],
-    'endereco': ["ENDEREÇO COMPLETO", "Endereço", "Logradouro", "Rua"],
-    'bairro': ["Bairro"],
-    'cidade': ["Cidade", "Município"],
-    'num_conta': ["Número da conta", "Conta Contrato", "Conta"],
-    
-    # ============================================================
-    # DADOS FINANCEIROS - TODOS COLETADOS DA PLANILHA
-    # ============================================================
-    
-    # Quantidades (kWh)
-    'consumo_qtd': ["CONSUMO_FP", "Energia consumida - Fora ponta - quantidade", "Consumo KWh"],
-    'comp_qtd': ["CRÉD. CONSUMIDO_FP", "Creditos consumidos - Fora ponta - quantidade", "Energia Compensada"],
+def _ler_base_clientes_pandas(db_path, config):
+    """Lê a base de clientes externa com o pandas e monta o mapa (ver carregar_base_clientes)."""
+    xls_ext = pd.ExcelFile(db_path, engine='openpyxl')
     
-    # Tarifas (R$/kWh) - COLETADAS, NÃO CALCULADAS
-    'tarifa_consumo': [
-        "TARIFA FP",                    # ← Tarifa com impostos (prioridade)
-        "TARIFA S/ IMPOSTOS FP",        # ← Tarifa sem impostos (fallback)
-        "Energia consumida - Fora ponta - tarifa",
-        "Tarifa Cheia"
-    ],
-    'tarifa_credito': [
-        "Tarifa média compensada sobre energia compensada",  # ← Tarifa média real
-        "TARIFA_Comp_FP",               # ← Tarifa de compensação
-        "Tarifa EGS",
-        "Tarifa Acordada"
-    ],
+    # Tentar encontrar a aba correta
+    sheet_name = escolher_aba_base_clientes(xls_ext.sheet_names, config)
+    print(f"📄 Usando aba: '{sheet_name}'")
     
-    # Valores da Distribuidora (R$)
-    'fatura_c_gd': ["FATURA C/GD", "FATURA C/GD COM RESTITUIÇÃO", "Saldo Próximo Mês", "Valor Fatura Distribuidora"],
-    'outros': [
-        "OUTROS",                       # ← Contrib. Ilum. Pública e Outros
-        "Contrib Ilum Publica",
-        "CIP",
-        "Iluminação Pública"
-    ],
+    # Usar header_row configurado ou tentar encontrar automaticamente
+    h_idx = config.get('client_database_header_row', None)
     
-    # Boleto EGS (R$)
-    'boleto_ev': [
-        "Valor enviado para emissão",              # ← PRIORIDADE 1
-        "Boleto Emitido Gera StarkBank",           # ← PRIORIDADE 2
-        "Boleto PAGO StarkBank",                   # ← PRIORIDADE 3
-        "Boleto Hube definido para a ref. Mensal", # ← PRIORIDADE 4
-        "valorTotal",
-        "Valor Cobrado",
-        "Valor Boleto"
-    ],
+    if h_idx is None:
+        # Tentar encontrar header automaticamente
+        _, h_idx = find_sheet_and_header(
+            WorkbookIndex.from_excel_file(xls_ext), 
+            ["Instalação", "Nome", "CPF", "CNPJ", "Endereço", "NOME COMPLETO"],
+            prefer_name=sheet_name
+        )
+    else:
+        print(f"✓ Usando header configurado: linha {h_idx}")
     
-    # Custos para Economia (R$) - COLETADOS, NÃO CALCULADOS
-    'custo_sem_gd': [
-        "CUSTO_S_GD ",                  # ← Com espaço (nome real)
-        "CUSTO_S_GD",                   # ← Sem espaço (fallback)
-        "Custo Sem GD",
-        "CUSTO SEM GD"
-    ],
-    'custo_com_gd': [
-        "CUSTO_C_GD\n(Fatura real+Boleto Gera Final)",
-        "CUSTO_C_GD\n(Fatura real+Boleto Gera Padrão)",
-        "CUSTO_C_GD",
-        "Custo Com GD"
-    ],
+    df_ext = pd.read_excel(xls_ext, sheet_name=sheet_name, header=h_idx)
+    print(f"✓ Base externa carregada: {len(df_ext)} linhas")
+    print(f"  Colunas disponíveis: {list(df_ext.columns[:15])}")
     
-    # Economia (R$) - COLETADA DIRETAMENTE
-    'economia': [
-        "Ganho energia compensada (R$) Final",  # ← Economia final
-        "Ganho Total (R$) Padrão",
-        "Ganho total Final",
-        "Economia",
-        "Ganho"
-    ]
-}
+    return criar_mapa_completo_clientes(df_ext)
 
+def carregar_base_clientes_externa(config):
+    """
+    Carrega a base de clientes de um arquivo externo configurado.
+    Retorna um mapa {UC: {nome, doc, endereco, bairro, cidade, num_conta}}
+    """
+    return carregar_base_clientes(config, _ler_base_clientes_pandas)
 
-def limpar_uc(valor):
-    if not valor: return ""
-    return re.sub(r'[^a-zA-Z0-9]', '', str(valor)).upper()
+def _limpar_uc_serie(serie: pd.Series) -> pd.Series:
+    """limpar_uc aplicado na coluna inteira (serie de strings)."""
+    return serie.str.replace(r'[^a-zA-Z0-9]', '', regex=True).str.upper()
 
 def safe_str(val):
     if pd.isna(val) or val is None: return ""
     return str(val).strip()
 
-def safe_parse_date(val):
-    try:
-        if pd.isna(val): return None
-        if isinstance(val, datetime): return val
-        # Tenta múltiplos formatos
-        val_str = str(val).strip()[:10] # Pega só a data se tiver hora
-        for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d']:
-            try:
-                return datetime.strptime(val_str, fmt)
-            except: continue
-        return pd.to_datetime(val, dayfirst=True)
-    except:
-        return None
-
 def find_sheet_and_header(xls, mandatory_cols, prefer_name=None):
+    if isinstance(xls, WorkbookIndex):
+        return xls.find_header(mandatory_cols, prefer_name=prefer_name, max_rows=20)
+
     sheets_to_try = xls.sheet_names
     if prefer_name:
         sheets_to_try = sorted(sheets_to_try, key=lambda x: 0 if prefer_name.lower() in x.lower() else 1)
@@ -355,33 +322,9 @@ def pick_col(df, *possibles):
 def _norm(s):
     return re.sub(r'[^a-zA-Z0-9]', '', str(s).lower())
 
-def _diagnosticar_colunas(df: pd.DataFrame) -> str:
-    colunas = list(df.columns)
-    mostrar = colunas[:10]
-    res = f"Colunas encontradas ({len(colunas)}): {', '.join(mostrar)}"
-    if len(colunas) > 10: res += "..."
-    return res
-
-def _mapear_coluna_uc(df: pd.DataFrame) -> Optional[str]:
-    termos = ["INSTALACAO", "INSTALAÇÃO", "Nº INSTALACAO", "UC", "CODIGO"]
-    colunas_map = {_norm(col): col for col in df.columns}
-    for t in termos:
-        if _norm(t) in colunas_map: return colunas_map[_norm(t)]
-    for c_norm, c_orig in colunas_map.items():
-        if "instal" in c_norm or "cod" in c_norm: return c_orig
-    return None
-
-def _mapear_coluna_generic(df: pd.DataFrame, keys_list) -> Optional[str]:
-    colunas_map = {_norm(col): col for col in df.columns}
-    for k in keys_list:
-        if _norm(k) in colunas_map: return colunas_map[_norm(k)]
-    return None
-
 def criar_mapa_completo_clientes(df_clientes: pd.DataFrame) -> Dict[str, Dict]:
-    col_uc = _mapear_coluna_uc(df_clientes)
-    cols_cli = {}
-    for field in ['nome', 'doc', 'endereco', 'bairro', 'cidade', 'num_conta']:
-        cols_cli[field] = _mapear_coluna_generic(df_clientes, COLUMNS_MAP[field])
+    # Coluna UC e campos cadastrais pelos aliases pré-compilados (ver resolver_colunas_clientes)
+    col_uc, cols_cli, _ = resolver_colunas_clientes(list(df_clientes.columns))
 
     if not col_uc: 
         print("✗ ERRO: Coluna UC não encontrada na aba Infos Clientes")
@@ -390,190 +333,394 @@ def criar_mapa_completo_clientes(df_clientes: pd.DataFrame) -> Dict[str, Dict]:
     print(f"✓ Coluna UC encontrada: '{col_uc}'")
     print(f"✓ Colunas mapeadas: {cols_cli}")
 
+    # UC bruta e limpa calculadas na coluna inteira
+    coluna_uc = df_clientes[col_uc].astype(object)
+    raw_ucs = coluna_uc.where(coluna_uc.notna(), '').map(str).str.strip()
+    validas = (raw_ucs != '') & (raw_ucs.str.lower() != 'nan')
+    raw_ucs = raw_ucs[validas]
+    chaves_limpas = _limpar_uc_serie(raw_ucs)
+
+    campos = {field: _coluna_texto(df_clientes, col_name)[validas].tolist()
+              for field, col_name in cols_cli.items() if col_name}
+    if campos:
+        fichas = pd.DataFrame(campos).to_dict('records')
+    else:
+        fichas = [{} for _ in range(len(raw_ucs))]
+
+    # Chave original e chave limpa apontam para a mesma ficha; linhas posteriores prevalecem
     mapa = {}
-    for idx, row in df_clientes.iterrows():
-        raw_uc = str(row.get(col_uc, '')).strip()
-        if not raw_uc or raw_uc.lower() == 'nan': continue
-        ficha = {}
-        for field, col_name in cols_cli.items():
-            if col_name: 
-                valor = safe_str(row.get(col_name))
-                ficha[field] = valor
-                if idx < 3:  # Debug primeiras 3 linhas
-                    print(f"  UC {raw_uc} - {field}: '{valor}' (coluna: {col_name})")
+    for raw_uc, chave_limpa, ficha in zip(raw_ucs.tolist(), chaves_limpas.tolist(), fichas):
         mapa[raw_uc] = ficha
-        chave_limpa = limpar_uc(raw_uc)
         if chave_limpa: mapa[chave_limpa] = ficha
-    
+
     print(f"✓ Mapa criado com {len(mapa)} registros")
     return mapa
 
-def processar_relatorio_para_fatura(file_content, mes_referencia_str, vencimento_str):
-    try:
-        xls = pd.ExcelFile(io.BytesIO(file_content), engine='openpyxl')
-        
-        # 1. Carregar Aba Detalhe
-        aba_detalhe, h_idx_det = find_sheet_and_header(xls, ["REF", "Instalação", "Data"], prefer_name="Detalhe")
-        if not aba_detalhe: return json.dumps({"error": "Aba 'Detalhe Por UC' não encontrada."})
+def _periodo_da_linha(colunas_det, posicoes, cols_map_det, periodos, filtrar_boleto=True):
+    """
+    Função linha -> período (AAAAMM) para as linhas com REF num dos `periodos`
+    e boleto >= R$ 5; None para as demais. Recebe a linha já projetada em `posicoes`.
+    periodos=None aceita qualquer REF válida; filtrar_boleto=False dispensa o boleto.
+    As REFs em texto usam o formato dominante detectado numa amostra das
+    primeiras linhas lidas (ver conversor_de_datas e _formato_dominante).
+    """
+    i_ref = posicoes.index(colunas_det.index(cols_map_det['ref']))
+    i_boleto = None
+    if filtrar_boleto and cols_map_det.get('boleto_ev'):
+        i_boleto = posicoes.index(colunas_det.index(cols_map_det['boleto_ev']))
+    alvos = None if periodos is None else {divmod(p, 100) for p in periodos}
+    converter_data = conversor_de_datas()
+
+    def periodo(linha):
+        data = converter_data(linha[i_ref])
+        if data is None or (alvos is not None and (data.year, data.month) not in alvos):
+            return None
+        if i_boleto is not None and to_num(linha[i_boleto]) < 5:
+            return None
+        return data.year * 100 + data.month
+
+    return periodo
+
+def ler_detalhe_do_mes(book, aba_detalhe, h_idx_det, colunas_det, posicoes, cols_map_det, mes_referencia_str,
+                       medidor=None):
+    """
+    Lê da aba Detalhe apenas as linhas do mês de referência com boleto >= R$ 5,
+    avaliando os dois filtros linha a linha durante a leitura (streaming).
+    A memória fica proporcional às UCs do mês, não ao histórico inteiro.
+    Com `medidor`, registra as etapas "leitura_detalhe" e "filtro_data"
+    (datas + boleto), separando o tempo do filtro do tempo de leitura.
+    """
+    periodo = _periodo_da_linha(colunas_det, posicoes, cols_map_det, [periodo_referencia(mes_referencia_str)])
+    aceita = lambda linha: periodo(linha) is not None
 
-        df = pd.read_excel(xls, sheet_name=aba_detalhe, header=h_idx_det)
-        df.columns = [str(c).strip() for c in df.columns]
-        
-        cols_map_det = {k: pick_col(df, *v) for k, v in COLUMNS_MAP.items()}
-        col_inst_det = _mapear_coluna_uc(df)
-        
-        # Log de debug para verificar mapeamento do boleto
-        print(f"🔍 Coluna mapeada para 'boleto_ev': {cols_map_det.get('boleto_ev')}")
-        print(f"🔍 Coluna mapeada para 'fatura_c_gd': {cols_map_det.get('fatura_c_gd')}")
-        
-        if not col_inst_det:
-            return json.dumps({"error": "Coluna Instalação não achada no detalhe.", "details": _diagnosticar_colunas(df)})
+    if medidor is None:
+        df_mes = read_sheet_filtered(book, aba_detalhe, h_idx_det, posicoes, aceita)
+    else:
+        filtro = {"segundos": 0.0, "linhas": 0}
+        def aceita_medindo(linha):
+            inicio_linha = time.perf_counter()
+            try:
+                return aceita(linha)
+            finally:
+                filtro["segundos"] += time.perf_counter() - inicio_linha
+                filtro["linhas"] += 1
 
-        # --- TRAVA DE SEGURANÇA: FILTRO DE DATA OBRIGATÓRIO ---
-        if not cols_map_det['ref']:
-            # Se não achou coluna de data, aborta para não gerar 850 faturas
-            return json.dumps({
-                "error": "Não encontrei a coluna de DATA/MÊS na planilha.", 
-                "details": f"O sistema precisa saber o mês para gerar apenas as faturas corretas. {_diagnosticar_colunas(df)}"
-            })
+        inicio = time.perf_counter()
+        df_mes = read_sheet_filtered(book, aba_detalhe, h_idx_det, posicoes, aceita_medindo)
+        medidor.registrar("leitura_detalhe", time.perf_counter() - inicio - filtro["segundos"], len(df_mes))
+        medidor.registrar("filtro_data", filtro["segundos"], filtro["linhas"])
 
-        # 2. Carregar Aba Clientes (com suporte a base externa)
-        mapa_clientes = {}
-        
-        # 2.1 Tentar carregar base de clientes externa primeiro
-        config = carregar_config()
-        mapa_clientes_externo = carregar_base_clientes_externa(config)
-        
-        if mapa_clientes_externo:
-            print(f"✓ Base de clientes externa carregada com sucesso: {len(mapa_clientes_externo)} registros")
-            mapa_clientes = mapa_clientes_externo
-        
-        # 2.2 Tentar carregar aba de clientes do relatório (para complementar ou substituir)
-        aba_clientes = None
-        
-        print(f"📋 Procurando aba de clientes no relatório. Abas disponíveis: {xls.sheet_names}")
-        
-        for sheet in xls.sheet_names:
-            if 'info' in sheet.lower() and 'cliente' in sheet.lower(): 
-                aba_clientes = sheet
-                print(f"✓ Aba de clientes encontrada: '{aba_clientes}'")
-                break
-        
-        if not aba_clientes:
-            print("⚠ Aba 'Infos Clientes' não encontrada pelo nome, tentando busca por colunas...")
-            aba_clientes, h_idx_cli = find_sheet_and_header(xls, ["Nome/Razão Social", "CPF/CNPJ", "Instalação"], prefer_name="Infos")
-            if aba_clientes:
-                print(f"✓ Aba encontrada por busca: '{aba_clientes}' (header linha {h_idx_cli})")
-        else:
-            # Para aba Infos Clientes, procurar por colunas específicas
-            _, h_idx_cli = find_sheet_and_header(xls, ["Nome/Razão Social", "CPF/CNPJ", "Instalação"], prefer_name=aba_clientes)
-            print(f"✓ Header da aba '{aba_clientes}' na linha {h_idx_cli}")
-            
-        if aba_clientes:
-            try:
-                df_cli = pd.read_excel(xls, sheet_name=aba_clientes, header=h_idx_cli)
-                print(f"✓ Aba '{aba_clientes}' carregada com {len(df_cli)} linhas")
-                print(f"  Colunas: {list(df_cli.columns[:10])}")
-                mapa_clientes_interno = criar_mapa_completo_clientes(df_cli)
-                print(f"✓ Mapa de clientes interno carregado: {len(mapa_clientes_interno)} registros.")
-                
-                # Merge: dados internos complementam/sobrescrevem externos
-                if mapa_clientes_externo:
-                    # Mesclar: prioridade para dados do relatório (mais atualizados)
-                    for uc, dados in mapa_clientes_interno.items():
-                        if uc in mapa_clientes:
-                            # Atualizar apenas campos não vazios do relatório
-                            for campo, valor in dados.items():
-                                if valor and valor.strip():
-                                    mapa_clientes[uc][campo] = valor
-                        else:
-                            mapa_clientes[uc] = dados
-                    print(f"✓ Dados mesclados: {len(mapa_clientes)} registros totais")
-                else:
-                    mapa_clientes = mapa_clientes_interno
-                    
-            except Exception as e:
-                print(f"✗ ERRO ao carregar aba clientes: {str(e)}")
-        else:
-            if not mapa_clientes:
-                print("✗ AVISO: Nenhuma fonte de dados de clientes disponível!")
+    df_mes.columns = [colunas_det[i] for i in posicoes]
+    return df_mes
+
+def ler_detalhe_por_periodo(book, aba_detalhe, h_idx_det, colunas_det, posicoes, cols_map_det, periodos):
+    """
+    Versão em lote de ler_detalhe_do_mes: uma única passada pela aba Detalhe
+    separa as linhas de todos os `periodos` (AAAAMM) pedidos.
+    Retorna {periodo: DataFrame}; períodos sem linhas ficam de fora.
+    """
+    periodo = _periodo_da_linha(colunas_det, posicoes, cols_map_det, periodos)
+    grupos = read_sheet_grouped(book, aba_detalhe, h_idx_det, posicoes, periodo)
+    for df_mes in grupos.values():
+        df_mes.columns = [colunas_det[i] for i in posicoes]
+    return grupos
+
+def _ids_das_linhas(df_mes, col_inst_det) -> pd.Series:
+    """UC de cada linha como texto (chave original do join com os clientes)."""
+    return df_mes[col_inst_det].astype(object).map(str).str.strip()
+
+def tabela_clientes(mapa_clientes: Dict[str, Dict], raw_ids: pd.Series = None) -> pd.DataFrame:
+    """
+    Converte o mapa UC -> ficha numa tabela indexada pela chave (original ou limpa),
+    pronta para o join com as linhas do mês. A coluna '_tem_ficha' marca as fichas
+    não vazias (as vazias contam como cliente não mapeado, como antes).
+    Com `raw_ids`, só entram as chaves que essas UCs usam no join (chave original
+    ou, na falta dela, a limpa): a base externa pode ter dezenas de milhares de
+    UCs e o mês só centenas, então a tabela não é montada com a base inteira.
+    """
+    if raw_ids is not None:
+        ids = pd.Series(pd.unique(raw_ids), dtype=object)
+        usadas = {}
+        for raw_id, limpa in zip(ids.tolist(), _limpar_uc_serie(ids).tolist()):
+            chave = raw_id if raw_id in mapa_clientes else limpa
+            if chave in mapa_clientes:
+                usadas[chave] = mapa_clientes[chave]
+        mapa_clientes = usadas
+    chaves = list(mapa_clientes)
+    tabela = pd.DataFrame(list(mapa_clientes.values()), index=pd.Index(chaves, dtype=object))
+    tabela['_tem_ficha'] = [bool(f) for f in mapa_clientes.values()]
+    return tabela
+
+def juntar_fichas_clientes(raw_ids: pd.Series, tabela: pd.DataFrame):
+    """
+    Left join das UCs do mês com a tabela de clientes: chave original primeiro,
+    chave limpa (regras de limpar_uc) para quem não casou.
+    Retorna (fichas alinhadas ao índice de raw_ids, máscara de UCs mapeadas).
+    """
+    posicoes = tabela.index.get_indexer(raw_ids)
+    sem_chave = posicoes == -1
+    if sem_chave.any():
+        limpas = _limpar_uc_serie(raw_ids[sem_chave])
+        posicoes[sem_chave] = tabela.index.get_indexer(limpas)
+
+    achou = posicoes != -1
+    fichas = tabela.iloc[np.where(achou, posicoes, 0)] if len(tabela) else tabela.reindex(range(len(raw_ids)))
+    fichas = fichas.set_axis(raw_ids.index, axis=0)
+    fichas = fichas.where(pd.Series(achou, index=raw_ids.index), axis=0)
+    mapeado = pd.Series(achou, index=raw_ids.index) & fichas['_tem_ficha'].eq(True)
+    return fichas.drop(columns=['_tem_ficha']), mapeado
+
+def montar_clientes(df_mes, cols_map_det, col_inst_det, mapa_clientes, vencimento_str, tabela=None, invalidos=None,
+                    formato='registros'):
+    """
+    Monta a lista de clientes (dicts prontos para o PDF) e os warnings do mês.
+    `tabela` (opcional) é o tabela_clientes já montado (com pelo menos as UCs de
+    `df_mes`), para reaproveitar entre vários meses ou partes. Se `invalidos` for passado, as contagens de
+    valores não numéricos são acumuladas nele e os warnings correspondentes
+    ficam a cargo de quem chamou (processamento em partes).
+    Com formato='colunar', `clientes` vem como {campo: [valores]} (ver FORMATOS_RESULTADO).
+    Retorna (clientes, warnings).
+    """
+    raw_ids = _ids_das_linhas(df_mes, col_inst_det)
+    if tabela is None:
+        tabela = tabela_clientes(mapa_clientes, raw_ids)
+    fichas, mapeado = juntar_fichas_clientes(raw_ids, tabela)
+
+    warnings = [
+        {"type": "warning", "title": "Cliente não achado", "message": f"UC {raw_id} sem cadastro."}
+        for raw_id in raw_ids[~mapeado]
+    ]
 
+    if invalidos is None:
+        invalidos_mes = {}
+        metricas = compute_metrics_frame(df_mes, cols_map_det, vencimento_str, fichas, invalidos_mes)
+        warnings.extend(_avisos_valores_invalidos(invalidos_mes))
+    else:
+        metricas = compute_metrics_frame(df_mes, cols_map_det, vencimento_str, fichas, invalidos)
+    nome = _campo_cadastral(df_mes, cols_map_det, 'nome', fichas)
+
+    saida = pd.DataFrame({
+        "raw_id": raw_ids,
+        "instalacao": raw_ids,
+        "nome": nome.where(nome != '', "Cliente não identificado"),
+        "documento": _campo_cadastral(df_mes, cols_map_det, 'doc', fichas),
+        "num_conta": _campo_cadastral(df_mes, cols_map_det, 'num_conta', fichas),
+        "endereco": metricas['endereco'],
+        "status_mapeamento": np.where(mapeado, "OK", "Nome Não Mapeado"),
+        "economiaTotal": metricas['economiaMes'],
+    }, index=df_mes.index)
+    saida = pd.concat([saida, metricas.drop(columns=['endereco'])], axis=1)
+
+    if formato == 'colunar':
+        return saida.to_dict('list'), warnings
+    return saida.to_dict('records'), warnings
+
+def ler_clientes_do_relatorio(xls, indice, medidor=None):
+    """
+    Mapa UC -> ficha da aba 'Infos Clientes' do relatório (etapa "base_interna").
+    Retorna None se a aba não existe ou não pôde ser lida.
+    """
+    medidor = medidor or MedidorEtapas()
+    aba_clientes, h_idx_cli = localizar_aba_clientes(indice)
+    if not aba_clientes:
+        return None
+    try:
+        with medidor.etapa("base_interna") as info:
+            df_cli = pd.read_excel(xls, sheet_name=aba_clientes, header=h_idx_cli)
+            print(f"✓ Aba '{aba_clientes}' carregada com {len(df_cli)} linhas")
+            print(f"  Colunas: {list(df_cli.columns[:10])}")
+            mapa_clientes_interno = criar_mapa_completo_clientes(df_cli)
+            print(f"✓ Mapa de clientes interno carregado: {len(mapa_clientes_interno)} registros.")
+            info["linhas"] = len(df_cli)
+        return mapa_clientes_interno
+    except Exception as e:
+        print(f"✗ ERRO ao carregar aba clientes: {str(e)}")
+        return None
 
-        # 3. Filtrar por Mês (AGORA COM LOG E TRATAMENTO DE ERRO)
-        df_mes = pd.DataFrame()
-        date_input = mes_referencia_str.strip()
-        if len(date_input) == 7: date_input += '-01'
+def carregar_mapa_clientes(xls, indice, medidor=None, config=None):
+    """
+    Monta o mapa UC -> ficha: base externa (config.json) complementada/sobrescrita
+    pela aba 'Infos Clientes' do relatório.
+    Etapas medidas: "base_externa", "base_interna" e "mescla".
+    """
+    medidor = medidor or MedidorEtapas()
+    
+    # 2.1 Tentar carregar base de clientes externa primeiro
+    mapa_clientes = carregar_base_externa_medida(carregar_base_clientes_externa, config, medidor)
+    
+    # 2.2 Tentar carregar aba de clientes do relatório (para complementar ou substituir)
+    mapa_clientes_interno = ler_clientes_do_relatorio(xls, indice, medidor)
+    return mesclar_mapas_clientes(mapa_clientes, mapa_clientes_interno, medidor)
+
+def _preparar_mes(file_content, mes_referencia_str, medidor):
+    """
+    Etapas comuns até o processamento: abre a planilha, lê do Detalhe as linhas
+    do mês e monta o mapa de clientes. Retorna (df_mes, detalhe, mapa_clientes, erro).
+    file_content: bytes, buffer ou caminho (ver abrir_planilha).
+    """
+    config = carregar_config()
+    with abrir_planilha(file_content) as fonte:
+        with medidor.etapa("abertura_planilha"):
+            xls = pd.ExcelFile(fonte, engine='openpyxl')
+
+        with medidor.etapa("cabecalhos"):
+            # Primeiras linhas de todas as abas numa única passada (busca de cabeçalhos)
+            indice = WorkbookIndex.from_excel_file(xls)
         
+            # 1. Carregar Aba Detalhe
+            det, erro = mapear_detalhe(indice, config, medidor)
+        if erro: return None, None, None, erro
+
+        # 1.1 Ler do Detalhe só as linhas do mês de referência com boleto >= R$ 5
+        #     (filtros aplicados na leitura)
         try:
-            mes_ref_dt = datetime.strptime(date_input, '%Y-%m-%d')
-            df['__ref_dt'] = df[cols_map_det['ref']].apply(safe_parse_date)
-            
-            # Filtra onde Ano e Mês batem
-            df_mes = df[(df['__ref_dt'].dt.year == mes_ref_dt.year) & (df['__ref_dt'].dt.month == mes_ref_dt.month)].copy()
-            
+            df_mes = ler_detalhe_do_mes(xls.book, det['aba'], det['h_idx'], det['colunas'], det['posicoes'], det['cols_map'], mes_referencia_str,
+                                        medidor)
             print(f"✓ Filtro de Data Aplicado: {len(df_mes)} registros encontrados para {mes_referencia_str}")
         except Exception as e:
-            return json.dumps({"error": f"Erro ao filtrar data na coluna '{cols_map_det['ref']}': {str(e)}"})
-
-        if cols_map_det.get('boleto_ev'):
-            df_mes = df_mes[df_mes[cols_map_det['boleto_ev']].apply(to_num) >= 5].copy()
+            return None, None, None, {"error": f"Erro ao filtrar data na coluna '{det['cols_map']['ref']}': {str(e)}"}
 
         if df_mes.empty: 
-            return json.dumps({"error": f"Nenhum registro encontrado para {mes_referencia_str}. Verifique se a data na planilha bate com a data selecionada."})
+            return None, None, None, {"error": f"Nenhum registro encontrado para {mes_referencia_str}. Verifique se a data na planilha bate com a data selecionada."}
 
-        # 4. Processamento
-        clientes = []
-        warnings = []
+        # 2. Carregar Aba Clientes (com suporte a base externa)
+        mapa_clientes = carregar_mapa_clientes(xls, indice, medidor, config)
+        return df_mes, det, mapa_clientes, None
 
-        for idx, row in df_mes.iterrows():
+def processar_relatorio_para_fatura(file_content, mes_referencia_str, vencimento_str, formato='registros'):
+    """
+    Processa o mês de referência e devolve o JSON do resultado.
+    file_content: bytes, memoryview/bytearray (ou outro buffer), JsBuffer do
+    Pyodide ou caminho do arquivo (mapeado em memória) - ver abrir_planilha.
+    formato='registros' (padrão): {"data": [ {campo: valor}, ... ], "warnings": [...]}
+    formato='colunar': {"formato": "colunar", "total": n, "colunas": {campo: [valores]}, "warnings": [...]}
+        - cada nome de campo aparece uma vez só (payload bem menor para milhares de UCs);
+        - a linha i é {campo: colunas[campo][i]} (ver decodificarColunar no excelProcessor.js).
+    Os dois formatos trazem "metrics": tempo e nº de linhas de cada etapa (ver MedidorEtapas).
+    """
+    if formato not in FORMATOS_RESULTADO:
+        return json.dumps({"error": f"Formato de resultado desconhecido: {formato}. Use {FORMATOS_RESULTADO}."})
+    medidor = MedidorEtapas()
+    try:
+        df_mes, det, mapa_clientes, erro = _preparar_mes(file_content, mes_referencia_str, medidor)
+        if erro: return _json_com_metricas(erro, medidor)
+
+        # 3. Processamento (colunar: todas as UCs do mês de uma vez)
+        with medidor.etapa("metricas") as info:
+            clientes, warnings = montar_clientes(df_mes, det['cols_map'], det['col_inst'], mapa_clientes, vencimento_str,
+                                                 formato=formato)
+            info["linhas"] = len(df_mes)
+
+        if formato == 'colunar':
+            return _json_com_metricas({"formato": "colunar", "total": len(df_mes), "colunas": clientes, "warnings": warnings}, medidor)
+        return _json_com_metricas({"data": clientes, "warnings": warnings}, medidor)
+
+    except Exception as e:
+        return json.dumps({"error": f"Erro crítico: {traceback.format_exc()}"})
+
+def processar_relatorio_ndjson(file_content, mes_referencia_str, vencimento_str, tamanho_lote=200):
+    """
+    Versão em streaming de processar_relatorio_para_fatura: gerador de linhas
+    NDJSON (uma por registro, terminadas em '\n'), produzidas em partes de
+    `tamanho_lote` UCs. Cada linha tem um "type":
+        "warning"  - mesmos dicts de "warnings", emitidos junto da parte em que ocorrem
+        "cliente"  - {"type": "cliente", "data": {...}} (mesmo dict de "data")
+        "resumo"   - última linha: totais de clientes e warnings, e "metrics" (tempo por etapa)
+        "error"    - {"type": "error", "error": ...}; encerra o fluxo
+    O consumidor pode começar a gerar PDFs a partir do primeiro cliente.
+    """
+    def linha(registro):
+        return json.dumps(registro) + "\n"
+
+    medidor = MedidorEtapas()
+    try:
+        df_mes, det, mapa_clientes, erro = _preparar_mes(file_content, mes_referencia_str, medidor)
+        if erro:
+            yield linha({"type": "error", **erro})
+            return
+
+        tabela = tabela_clientes(mapa_clientes, _ids_das_linhas(df_mes, det['col_inst']))
+        invalidos = {}
+        total_clientes = total_warnings = 0
+        tempo_metricas = 0.0  # só o cálculo; o tempo do consumidor entre as partes fica de fora
+        for inicio in range(0, len(df_mes), tamanho_lote):
+            parte = df_mes.iloc[inicio:inicio + tamanho_lote]
+            inicio_parte = time.perf_counter()
+            clientes, warnings = montar_clientes(parte, det['cols_map'], det['col_inst'], mapa_clientes,
+                                                 vencimento_str, tabela, invalidos)
+            tempo_metricas += time.perf_counter() - inicio_parte
+            for warning in warnings:
+                yield linha(warning)
+            for cliente in clientes:
+                yield linha({"type": "cliente", "data": cliente})
+            total_clientes += len(clientes)
+            total_warnings += len(warnings)
+
+        # Contagens de valores não numéricos só fecham depois da última parte
+        for warning in _avisos_valores_invalidos(invalidos):
+            yield linha(warning)
+            total_warnings += 1
+
+        medidor.registrar("metricas", tempo_metricas, len(df_mes))
+        yield linha({"type": "resumo", "mes_referencia": mes_referencia_str,
+                     "clientes": total_clientes, "warnings": total_warnings, "metrics": medidor.resumo()})
+
+    except Exception as e:
+        yield linha({"type": "error", "error": f"Erro crítico: {traceback.format_exc()}"})
+
+def processar_relatorio_multimeses(file_content, competencias):
+    """
+    Reprocessa várias competências a partir de uma única leitura da planilha.
+
+    Args:
+        competencias: lista de pares (mes_referencia, vencimento), ex:
+            [("2025-10-01", "2025-11-10"), ("2025-11-01", "2025-12-10")]
+
+    file_content: bytes, buffer ou caminho (ver abrir_planilha).
+    A aba Detalhe é percorrida uma vez (linhas separadas por período) e o mapa
+    de clientes é montado uma vez. Retorna JSON com "resultados": um item por
+    competência, na ordem pedida, com "data"/"warnings" ou "error" (mesmas
+    mensagens de processar_relatorio_para_fatura).
+    """
+    medidor = MedidorEtapas()
+    try:
+        config = carregar_config()
+        with abrir_planilha(file_content) as fonte:
+            with medidor.etapa("abertura_planilha"):
+                xls = pd.ExcelFile(fonte, engine='openpyxl')
+
+            with medidor.etapa("cabecalhos"):
+                indice = WorkbookIndex.from_excel_file(xls)
+                det, erro = mapear_detalhe(indice, config, medidor)
+            if erro: return _json_com_metricas(erro, medidor)
+
+            periodos = [periodo_referencia(mes) for mes, _ in competencias]
             try:
-                raw_id = str(row.get(col_inst_det, '')).strip()
-                id_limpo = limpar_uc(raw_id)
-                
-                ficha = {}
-                status_map = "OK"
-                if raw_id in mapa_clientes: ficha = mapa_clientes[raw_id]
-                elif id_limpo in mapa_clientes: ficha = mapa_clientes[id_limpo]
-                
-                if not ficha:
-                    status_map = "Nome Não Mapeado"
-                    warnings.append({"type": "warning", "title": "Cliente não achado", "message": f"UC {raw_id} sem cadastro."})
-
-                def get_val(field):
-                    col_det = cols_map_det.get(field)
-                    if col_det and pd.notna(row.get(col_det)) and str(row.get(col_det)).strip() != '':
-                        return safe_str(row.get(col_det))
-                    if ficha and field in ficha and ficha[field]:
-                        return ficha[field]
-                    return ""
-
-                metrics = compute_metrics(row, cols_map_det, vencimento_str)
-                
-                ends = []
-                rua = get_val('endereco'); bairro = get_val('bairro'); cidade = get_val('cidade')
-                if rua: ends.append(rua)
-                if bairro: ends.append(bairro)
-                if cidade: ends.append(cidade)
-                endereco_completo = " - ".join(ends)
-
-                cliente = {
-                    "raw_id": raw_id,
-                    "instalacao": raw_id,
-                    "nome": get_val('nome') or "Cliente não identificado",
-                    "documento": get_val('doc'),
-                    "num_conta": get_val('num_conta'),
-                    "endereco": endereco_completo,
-                    "status_mapeamento": status_map,
-                    "economiaTotal": metrics['economiaMes'],
-                }
-                
-                cliente.update(metrics)
-                clientes.append(cliente)
-
-            except Exception as ex:
-                warnings.append({"type": "error", "title": "Erro linha", "message": str(ex)})
-
-        return json.dumps({"data": clientes, "warnings": warnings})
+                with medidor.etapa("leitura_detalhe") as info:
+                    grupos = ler_detalhe_por_periodo(xls.book, det['aba'], det['h_idx'], det['colunas'], det['posicoes'], det['cols_map'], periodos)
+                    info["linhas"] = sum(len(df) for df in grupos.values())
+            except Exception as e:
+                return _json_com_metricas({"error": f"Erro ao filtrar data na coluna '{det['cols_map']['ref']}': {str(e)}"}, medidor)
+
+            mapa_clientes = carregar_mapa_clientes(xls, indice, medidor, config) if grupos else {}
+            ids = [_ids_das_linhas(df, det['col_inst']) for df in grupos.values()]
+            tabela = tabela_clientes(mapa_clientes, pd.concat(ids) if ids else pd.Series([], dtype=object))
+
+            resultados = []
+            for (mes_referencia_str, vencimento_str), periodo in zip(competencias, periodos):
+                item = {"mes_referencia": mes_referencia_str, "vencimento": vencimento_str}
+                df_mes = grupos.get(periodo)
+                if df_mes is None:
+                    item["error"] = f"Nenhum registro encontrado para {mes_referencia_str}. Verifique se a data na planilha bate com a data selecionada."
+                else:
+                    print(f"✓ Filtro de Data Aplicado: {len(df_mes)} registros encontrados para {mes_referencia_str}")
+                    with medidor.etapa("metricas") as info:
+                        item["data"], item["warnings"] = montar_clientes(
+                            df_mes, det['cols_map'], det['col_inst'], mapa_clientes, vencimento_str, tabela)
+                        info["linhas"] = len(df_mes)
+                resultados.append(item)
+
+            return _json_com_metricas({"resultados": resultados}, medidor)
 
     except Exception as e:
         return json.dumps({"error": f"Erro crítico: {traceback.format_exc()}"})
\ No newline at end of file
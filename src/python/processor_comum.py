@@ -0,0 +1,782 @@
+"""
+Partes do processador que não dependem do pandas: configuração, cache da base
+de clientes externa, regras escalares de valores monetários, da chave da UC e
+do mês de referência, COLUMNS_MAP, resolução do layout (aliases e cache por
+assinatura do cabeçalho), montagem do mapa de clientes e medição das etapas.
+
+Compartilhadas pelo motor pandas (processor.py, utils_normalizers.py) e pelo
+motor leve (processor_leve.py); no Pyodide este arquivo é executado antes
+deles, no mesmo escopo global (ver excelProcessor.js).
+"""
+import json
+import os
+import re
+import hashlib
+import tempfile
+import getpass
+import time
+import traceback
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+CO2_PER_KWH = 0.07
+TREES_PER_TON_CO2 = 8
+
+# Formatos aceitos para o resultado de processar_relatorio_para_fatura
+FORMATOS_RESULTADO = ('registros', 'colunar')
+
+# =================================================================
+# CONFIGURAÇÃO E CARREGAMENTO DE BASE EXTERNA
+# =================================================================
+
+def carregar_config():
+    """Carrega configuração do arquivo config.json"""
+    try:
+        # Tentar diferentes caminhos para compatibilidade com Pyodide e servidor
+        possible_paths = []
+        
+        # 1. Caminho raiz do Pyodide (onde excelProcessor.js escreve o arquivo)
+        possible_paths.append(Path('/config.json'))
+        
+        # 2. Tentar usar __file__ (funciona em servidor Python normal)
+        try:
+            possible_paths.append(Path(__file__).parent / 'config.json')
+        except NameError:
+            pass  # __file__ não existe no Pyodide
+        
+        # 3. Tentar caminhos relativos
+        possible_paths.append(Path('config.json'))
+        possible_paths.append(Path('./config.json'))
+        possible_paths.append(Path('src/python/config.json'))
+        
+        # Tentar cada caminho
+        for config_path in possible_paths:
+            try:
+                if config_path.exists():
+                    with open(config_path, 'r', encoding='utf-8') as f:
+                        config = json.load(f)
+                        print(f"✓ Configuração carregada de: {config_path}")
+                        return config
+            except:
+                continue
+        
+        print("⚠ Arquivo config.json não encontrado em nenhum caminho")
+    except Exception as e:
+        print(f"⚠ Erro ao carregar config.json: {e}")
+    return {}
+
+# Versão do formato do cache; incrementar quando o conteúdo do mapa mudar
+CACHE_BASE_CLIENTES_VERSAO = 2
+
+def _hash_arquivo(caminho, bloco=1 << 20):
+    """SHA-256 do conteúdo do arquivo (lido em blocos de 1 MB)."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for parte in iter(lambda: f.read(bloco), b''):
+            h.update(parte)
+    return h.hexdigest()
+
+def _usuario_atual():
+    try:
+        return str(os.getuid())
+    except AttributeError:  # Windows: a pasta temporária já é do usuário
+        try:
+            return getpass.getuser()
+        except Exception:
+            return "usuario"
+
+def _pasta_cache(config):
+    """
+    Pasta dos caches em disco: client_database_cache_dir ou, por padrão, uma
+    pasta do usuário dentro da pasta temporária (criada com permissão 0700).
+    """
+    configurada = config.get('client_database_cache_dir')
+    if configurada:
+        return Path(configurada)
+    return Path(tempfile.gettempdir()) / f"gerador_faturas_egs_{_usuario_atual()}"
+
+def _pasta_cache_confiavel(pasta, criar=False):
+    """
+    A pasta de cache só é usada se for do usuário atual e ninguém mais puder
+    gravar nela: num servidor compartilhado, outro usuário poderia plantar ali
+    um cache com dados de clientes trocados.
+    """
+    try:
+        if criar:
+            pasta.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = os.stat(pasta)
+    except OSError:
+        return False
+    if not hasattr(os, 'getuid'):
+        return True
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        print(f"⚠ Pasta de cache ignorada (de outro usuário ou gravável por outros): {pasta}")
+        return False
+    return True
+
+def _temporario_do_processo(arquivo):
+    """Arquivo temporário para gravação atômica, um por processo (lote em paralelo)."""
+    return arquivo.with_name(f"{arquivo.name}.{os.getpid()}.tmp")
+
+def _arquivo_cache_base_clientes(db_path, config):
+    """Arquivo de cache do mapa de clientes para este caminho de origem."""
+    nome = hashlib.sha1(os.path.abspath(db_path).encode('utf-8')).hexdigest()[:16]
+    return _pasta_cache(config) / f"base_clientes_{nome}.json"
+
+def _mapa_para_json(mapa):
+    """
+    Mapa UC -> ficha em JSON: cada ficha uma vez só e as chaves apontando para
+    ela, para que a UC crua e a limpa continuem dividindo a mesma ficha.
+    """
+    fichas, chaves, ids = [], [], {}
+    for uc, ficha in mapa.items():
+        if id(ficha) not in ids:
+            ids[id(ficha)] = len(fichas)
+            fichas.append(ficha)
+        chaves.append([uc, ids[id(ficha)]])
+    return {"fichas": fichas, "chaves": chaves}
+
+def _mapa_do_json(dados):
+    fichas = dados["fichas"]
+    return {uc: fichas[i] for uc, i in dados["chaves"]}
+
+def _chave_cache_base_clientes(db_path, config):
+    """O que identifica o mapa em cache: origem, tamanho, mtime e a configuração de leitura."""
+    st = os.stat(db_path)
+    return {
+        "versao": CACHE_BASE_CLIENTES_VERSAO,
+        "path": os.path.abspath(db_path),
+        "size": st.st_size,
+        "mtime": st.st_mtime_ns,
+        "sheet": config.get('client_database_sheet'),
+        "header_row": config.get('client_database_header_row'),
+    }
+
+def _ler_cache_base_clientes(db_path, config):
+    """
+    Retorna o mapa em cache se ainda corresponder ao arquivo, ou None.
+    Tamanho/mtime iguais bastam; se só o mtime mudou, o hash do conteúdo decide.
+    """
+    arquivo = _arquivo_cache_base_clientes(db_path, config)
+    if not arquivo.exists() or not _pasta_cache_confiavel(arquivo.parent):
+        return None
+    try:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        chave = _chave_cache_base_clientes(db_path, config)
+        meta = cache["meta"]
+        if all(meta.get(k) == v for k, v in chave.items()):
+            return _mapa_do_json(cache)
+        # Só o mtime mudou (arquivo regravado/sincronizado): o conteúdo decide
+        mesma_origem = all(meta.get(k) == v for k, v in chave.items() if k != "mtime")
+        if mesma_origem and meta.get("sha256") == _hash_arquivo(db_path):
+            mapa = _mapa_do_json(cache)
+            _salvar_cache_base_clientes(db_path, config, mapa, meta["sha256"])
+            return mapa
+    except Exception as e:
+        print(f"⚠ Cache da base de clientes ignorado: {e}")
+    return None
+
+def _salvar_cache_base_clientes(db_path, config, mapa, sha256=None):
+    """
+    Grava o mapa já pronto (JSON, nada executável) de forma atômica ao lado
+    dos metadados da origem.
+    """
+    arquivo = _arquivo_cache_base_clientes(db_path, config)
+    try:
+        if not _pasta_cache_confiavel(arquivo.parent, criar=True):
+            return
+        meta = {**_chave_cache_base_clientes(db_path, config), "sha256": sha256 or _hash_arquivo(db_path)}
+        temporario = _temporario_do_processo(arquivo)
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({"meta": meta, **_mapa_para_json(mapa)}, f, ensure_ascii=False)
+        os.replace(temporario, arquivo)
+    except Exception as e:
+        print(f"⚠ Não foi possível gravar o cache da base de clientes: {e}")
+
+
+def escolher_aba_base_clientes(sheet_names, config):
+    """Aba configurada em client_database_sheet ou, sem ela, a primeira com nome relevante (ou a primeira)."""
+    sheet_name = config.get('client_database_sheet', None)
+    if not sheet_name or sheet_name not in sheet_names:
+        # Tentar primeira aba ou aba com nome relevante
+        for sn in sheet_names:
+            if any(term in sn.lower() for term in ['cliente', 'base', 'cadastro']):
+                sheet_name = sn
+                break
+        if not sheet_name:
+            sheet_name = sheet_names[0]
+    return sheet_name
+
+def carregar_base_clientes(config, ler_mapa):
+    """
+    Carrega a base de clientes de um arquivo externo configurado.
+    Confere a configuração e o arquivo e usa o cache em disco; sem cache,
+    `ler_mapa(db_path, config)` lê o arquivo (cada motor com o seu leitor).
+    Retorna um mapa {UC: {nome, doc, endereco, bairro, cidade, num_conta}}
+    """
+    if not config.get('enable_external_client_db', False):
+        print("📋 Base de clientes externa desabilitada na configuração")
+        return {}
+    
+    db_path = config.get('client_database_path', '')
+    
+    # Prioridade 1: Arquivo carregado via upload no Pyodide (/external_client_db.xlsx)
+    # Prioridade 2: Caminho do SharePoint (expandir variáveis de ambiente)
+    if db_path and not db_path.startswith('/'):
+        db_path = os.path.expandvars(db_path)
+    
+    if not db_path or not os.path.exists(db_path):
+        print(f"⚠ Arquivo de base de clientes não encontrado: {db_path}")
+        return {}
+    
+    usar_cache = config.get('enable_client_database_cache', True)
+    if usar_cache:
+        mapa = _ler_cache_base_clientes(db_path, config)
+        if mapa is not None:
+            print(f"⚡ Base de clientes externa carregada do cache: {len(mapa)} registros")
+            return mapa
+
+    try:
+        print(f"📂 Carregando base de clientes externa: {db_path}")
+        mapa = ler_mapa(db_path, config)
+        print(f"✓ Mapa de clientes externos criado: {len(mapa)} registros")
+        
+        if usar_cache and mapa:
+            _salvar_cache_base_clientes(db_path, config, mapa)
+        return mapa
+        
+    except Exception as e:
+        print(f"✗ ERRO ao carregar base de clientes externa: {str(e)}")
+        print(f"   Traceback: {traceback.format_exc()}")
+        return {}
+
+# =================================================================
+# VALORES MONETÁRIOS, CHAVE DA UC E MÊS DE REFERÊNCIA (REGRAS ESCALARES)
+# =================================================================
+
+# Marcadores de "sem valor" usados nas planilhas (contam como 0, não como erro)
+_MARCADORES_ZERO = {'-', '--', '—', '–'}
+
+def normalizar_texto_monetario(s):
+    """
+    Prepara um texto monetário (BR ou US, já sem espaços nas pontas) para o
+    float(): tira 'R$' e espaços, o negativo entre parênteses (formato
+    contábil) e os separadores de milhar; o último separador é o decimal.
+    Retorna (texto, negativo); texto None para os marcadores de zero.
+    """
+    neg = s.startswith('(') and s.endswith(')')
+    if neg: s = s[1:-1]
+
+    s = re.sub(r"\s+", "", s.replace('R$', ''))
+    if s in _MARCADORES_ZERO: return None, neg
+
+    if ',' in s and '.' in s:
+        if s.rfind(',') > s.rfind('.'):  # BR: 1.234,56
+            s = s.replace('.', '').replace(',', '.')
+        else:  # US: 1,234.56
+            s = s.replace(',', '')
+    elif ',' in s:  # BR: 1234,56
+        s = s.replace(',', '.')
+    return s, neg
+
+def numero_monetario(x) -> float:
+    """
+    Valor monetário/numérico de uma célula como float (to_num sem pandas):
+    vazio, NaN, marcadores de zero e texto que não é número valem 0.0.
+    """
+    if x is None or (isinstance(x, float) and x != x): return 0.0
+    if isinstance(x, (int, float)): return float(x)
+
+    s = str(x).strip()
+    if s == '': return 0.0
+    s, neg = normalizar_texto_monetario(s)
+    if s is None: return 0.0
+
+    try:
+        v = float(s)
+    except ValueError:
+        return 0.0
+    if v != v: return 0.0  # 'nan' escrito na célula
+    return -v if neg else v
+
+def limpar_uc(valor):
+    """Chave limpa da UC: só letras e dígitos, em maiúsculas ('10/1548741-6' -> '1015487416')."""
+    if not valor: return ""
+    return re.sub(r'[^a-zA-Z0-9]', '', str(valor)).upper()
+
+def periodo_referencia(mes_referencia_str: str) -> int:
+    """Código AAAAMM de um mês de referência 'AAAA-MM' ou 'AAAA-MM-DD'."""
+    date_input = mes_referencia_str.strip()
+    if len(date_input) == 7: date_input += '-01'
+    mes_ref_dt = datetime.strptime(date_input, '%Y-%m-%d')
+    return mes_ref_dt.year * 100 + mes_ref_dt.month
+
+# COLUMNS_MAP AJUSTADO COM NOMES REAIS DAS COLUNAS DO RELATÓRIO
+COLUMNS_MAP = {
+    'ref': ["REF (sempre dia 01 de cada mês)", "REF", "Mês de Referência", "Competência", "Data", "Data Ref", "Referencia", "Mês", "Referência", "Data Emissao"],
+    'inst': ["Instalação", "Nº Instalação", "UC", "Codigo"],
+    # Dados Cadastrais
+    'nome': ["NOME COMPLETO OU RAZÃO SOCIAL", "Nome Cliente", "Nome/Razão Social", "Cliente", "NOME", "RAZÃO SOCIAL"],
+    'doc': ["CNPJ", "Documento", "CPF/CNPJ", "CPF"],
+    'endereco': ["ENDEREÇO COMPLETO", "Endereço", "Logradouro", "Rua"],
+    'bairro': ["Bairro"],
+    'cidade': ["Cidade", "Município"],
+    'num_conta': ["Número da conta", "Conta Contrato", "Conta"],
+    
+    # ============================================================
+    # DADOS FINANCEIROS - TODOS COLETADOS DA PLANILHA
+    # ============================================================
+    
+    # Quantidades (kWh)
+    'consumo_qtd': ["CONSUMO_FP", "Energia consumida - Fora ponta - quantidade", "Consumo KWh"],
+    'comp_qtd': ["CRÉD. CONSUMIDO_FP", "Creditos consumidos - Fora ponta - quantidade", "Energia Compensada"],
+    
+    # Tarifas (R$/kWh) - COLETADAS, NÃO CALCULADAS
+    'tarifa_consumo': [
+        "TARIFA FP",                    # ← Tarifa com impostos (prioridade)
+        "TARIFA S/ IMPOSTOS FP",        # ← Tarifa sem impostos (fallback)
+        "Energia consumida - Fora ponta - tarifa",
+        "Tarifa Cheia"
+    ],
+    'tarifa_credito': [
+        "Tarifa média compensada sobre energia compensada",  # ← Tarifa média real
+        "TARIFA_Comp_FP",               # ← Tarifa de compensação
+        "Tarifa EGS",
+        "Tarifa Acordada"
+    ],
+    
+    # Valores da Distribuidora (R$)
+    'fatura_c_gd': ["FATURA C/GD", "FATURA C/GD COM RESTITUIÇÃO", "Saldo Próximo Mês", "Valor Fatura Distribuidora"],
+    'outros': [
+        "OUTROS",                       # ← Contrib. Ilum. Pública e Outros
+        "Contrib Ilum Publica",
+        "CIP",
+        "Iluminação Pública"
+    ],
+    
+    # Boleto EGS (R$)
+    'boleto_ev': [
+        "Valor enviado para emissão",              # ← PRIORIDADE 1
+        "Boleto Emitido Gera StarkBank",           # ← PRIORIDADE 2
+        "Boleto PAGO StarkBank",                   # ← PRIORIDADE 3
+        "Boleto Hube definido para a ref. Mensal", # ← PRIORIDADE 4
+        "valorTotal",
+        "Valor Cobrado",
+        "Valor Boleto"
+    ],
+    
+    # Custos para Economia (R$) - COLETADOS, NÃO CALCULADOS
+    'custo_sem_gd': [
+        "CUSTO_S_GD ",                  # ← Com espaço (nome real)
+        "CUSTO_S_GD",                   # ← Sem espaço (fallback)
+        "Custo Sem GD",
+        "CUSTO SEM GD"
+    ],
+    'custo_com_gd': [
+        "CUSTO_C_GD\n(Fatura real+Boleto Gera Final)",
+        "CUSTO_C_GD\n(Fatura real+Boleto Gera Padrão)",
+        "CUSTO_C_GD",
+        "Custo Com GD"
+    ],
+    
+    # Economia (R$) - COLETADA DIRETAMENTE
+    'economia': [
+        "Ganho energia compensada (R$) Final",  # ← Economia final
+        "Ganho Total (R$) Padrão",
+        "Ganho total Final",
+        "Economia",
+        "Ganho"
+    ]
+}
+
+# =================================================================
+# RESOLUÇÃO DE LAYOUT (ALIASES PRÉ-COMPILADOS E CACHE POR ASSINATURA)
+# =================================================================
+
+# Termos da coluna UC, em ordem de prioridade; sem nenhum deles vale a
+# primeira coluna cujo nome normalizado contém "instal" ou "cod"
+TERMOS_UC = ["INSTALACAO", "INSTALAÇÃO", "Nº INSTALACAO", "UC", "CODIGO"]
+
+# Campos lidos das abas/bases de clientes
+CAMPOS_CADASTRAIS = ['nome', 'doc', 'endereco', 'bairro', 'cidade', 'num_conta']
+
+def _norm_alias(s):
+    return re.sub(r'[^a-zA-Z0-9]', '', str(s).lower())
+
+# Aliases já na forma comparada, calculados uma vez só: (alias original, chave)
+#   exatos: nome sem diferenciar maiúsculas (pick_col, aba Detalhe)
+#   normalizados: só letras e dígitos (abas de clientes e coluna UC)
+_ALIASES_EXATOS = {campo: [(a, a.lower()) for a in aliases] for campo, aliases in COLUMNS_MAP.items()}
+_ALIASES_NORMALIZADOS = {campo: [(a, _norm_alias(a)) for a in aliases] for campo, aliases in COLUMNS_MAP.items()}
+_TERMOS_UC_NORMALIZADOS = [(t, _norm_alias(t)) for t in TERMOS_UC]
+
+def _coluna_uc_indexada(por_norm):
+    """Coluna UC sobre o índice {nome normalizado: coluna}. Retorna (coluna, termo que casou)."""
+    for termo, chave in _TERMOS_UC_NORMALIZADOS:
+        if chave in por_norm: return por_norm[chave], termo
+    for chave, coluna in por_norm.items():
+        if "instal" in chave: return coluna, "*instal*"
+        if "cod" in chave: return coluna, "*cod*"
+    return None, None
+
+def resolver_colunas_detalhe(colunas):
+    """
+    Mapeamento da aba Detalhe: para cada campo do COLUMNS_MAP o primeiro alias
+    presente no cabeçalho (sem diferenciar maiúsculas), mais a coluna UC.
+    Retorna (cols_map, col_inst, aliases); aliases[campo] é o alias que casou
+    (None se nenhum) e aliases['uc'] o termo da coluna UC.
+    """
+    por_nome = {str(c).strip().lower(): c for c in colunas}
+    por_norm = {_norm_alias(c): c for c in colunas}
+    cols_map, aliases = {}, {}
+    for campo, candidatos in _ALIASES_EXATOS.items():
+        cols_map[campo] = aliases[campo] = None
+        for alias, chave in candidatos:
+            if chave in por_nome:
+                cols_map[campo], aliases[campo] = por_nome[chave], alias
+                break
+    col_inst, aliases['uc'] = _coluna_uc_indexada(por_norm)
+    return cols_map, col_inst, aliases
+
+def resolver_colunas_clientes(colunas, campos=CAMPOS_CADASTRAIS):
+    """
+    Mapeamento de uma aba de clientes (nomes comparados só por letras e dígitos).
+    Retorna (col_uc, cols_cli, aliases), como em resolver_colunas_detalhe.
+    """
+    por_norm = {_norm_alias(c): c for c in colunas}
+    col_uc, alias_uc = _coluna_uc_indexada(por_norm)
+    cols_cli, aliases = {}, {'uc': alias_uc}
+    for campo in campos:
+        cols_cli[campo] = aliases[campo] = None
+        for alias, chave in _ALIASES_NORMALIZADOS[campo]:
+            if chave in por_norm:
+                cols_cli[campo], aliases[campo] = por_norm[chave], alias
+                break
+    return col_uc, cols_cli, aliases
+
+# Versão do cache de layouts; incrementar quando o formato das entradas mudar
+CACHE_LAYOUT_VERSAO = 1
+MAX_LAYOUTS_EM_CACHE = 20
+
+# Entradas gravadas com outro COLUMNS_MAP não valem
+_ASSINATURA_ALIASES = hashlib.sha1(repr((COLUMNS_MAP, TERMOS_UC)).encode('utf-8')).hexdigest()[:16]
+
+def assinatura_cabecalho(indice, aba, h_idx, colunas_chave, prefer_name=None, max_rows=20):
+    """
+    Hash de tudo o que decide a busca do cabeçalho (WorkbookIndex.find_header)
+    e o mapeamento: linhas 0..h_idx da aba e as primeiras linhas das abas que a
+    busca percorre antes dela. Mesma assinatura, mesmo resultado.
+    """
+    ordem = list(indice.sheet_names)
+    if prefer_name:
+        ordem = sorted(ordem, key=lambda x: 0 if prefer_name.lower() in x.lower() else 1)
+    anteriores = ordem[:ordem.index(aba)]
+    conteudo = repr((
+        colunas_chave, aba, h_idx, indice.rows(aba, max_rows)[:h_idx + 1],
+        [(sheet, indice.rows(sheet, max_rows)) for sheet in anteriores],
+    ))
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+def _arquivo_cache_layouts(config):
+    return _pasta_cache(config) / "layouts.json"
+
+def _ler_cache_layouts(config):
+    """Entradas do cache de layouts (mais recentes primeiro), ou [] se inválido."""
+    arquivo = _arquivo_cache_layouts(config)
+    if not arquivo.exists() or not _pasta_cache_confiavel(arquivo.parent):
+        return []
+    try:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get("versao") == CACHE_LAYOUT_VERSAO and cache.get("aliases") == _ASSINATURA_ALIASES:
+            return cache["layouts"]
+    except Exception as e:
+        print(f"⚠ Cache de layouts ignorado: {e}")
+    return []
+
+def _salvar_cache_layouts(config, layouts):
+    """Grava as entradas de forma atômica (um temporário por processo, para o lote em paralelo)."""
+    arquivo = _arquivo_cache_layouts(config)
+    try:
+        if not _pasta_cache_confiavel(arquivo.parent, criar=True):
+            return
+        temporario = _temporario_do_processo(arquivo)
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({"versao": CACHE_LAYOUT_VERSAO, "aliases": _ASSINATURA_ALIASES,
+                       "layouts": layouts[:MAX_LAYOUTS_EM_CACHE]}, f, ensure_ascii=False)
+        os.replace(temporario, arquivo)
+    except Exception as e:
+        print(f"⚠ Não foi possível gravar o cache de layouts: {e}")
+
+def resolver_layout(indice, tipo, colunas_chave, prefer_name, mapear, config=None):
+    """
+    Aba, linha de cabeçalho e mapeamento de colunas de uma aba do relatório.
+
+    Se a assinatura do cabeçalho (assinatura_cabecalho) de algum layout já visto
+    confere com a planilha, o resultado gravado é reaproveitado sem buscar o
+    cabeçalho nem mapear colunas. Senão resolve tudo: indice.find_header e
+    `mapear(colunas)` -> (mapeamento, aliases), e grava no cache em disco
+    (desligado com "enable_layout_cache": false no config.json).
+
+    Retorna (layout, relatorio), ou (None, None) se a aba não foi encontrada:
+        layout: {"aba", "h_idx", "colunas", "mapeamento"}
+        relatorio: {"assinatura", "cache" ("hit"/"miss"/"off"), "aba", "h_idx",
+                    "aliases" (campo -> alias que casou), "mudancas" (aliases
+                    diferentes do último layout deste tipo)}
+    """
+    config = config or {}
+    usar_cache = config.get('enable_layout_cache', True)
+    layouts = _ler_cache_layouts(config) if usar_cache else []
+    do_tipo = [e for e in layouts if e["tipo"] == tipo]
+
+    for entrada in do_tipo:
+        if entrada["aba"] not in indice.sheet_names:
+            continue
+        assinatura = assinatura_cabecalho(indice, entrada["aba"], entrada["h_idx"], colunas_chave, prefer_name)
+        if assinatura == entrada["assinatura"]:
+            print(f"⚡ Layout '{tipo}' reconhecido pela assinatura do cabeçalho ({assinatura[:12]})")
+            relatorio = {"assinatura": assinatura, "cache": "hit", "aba": entrada["aba"], "h_idx": entrada["h_idx"],
+                         "aliases": entrada["aliases"], "mudancas": []}
+            return entrada, relatorio
+
+    aba, h_idx = indice.find_header(colunas_chave, prefer_name=prefer_name, max_rows=20)
+    if not aba:
+        return None, None
+    colunas = [str(c).strip() for c in indice.column_names(aba, h_idx)]
+    mapeamento, aliases = mapear(colunas)
+    assinatura = assinatura_cabecalho(indice, aba, h_idx, colunas_chave, prefer_name)
+
+    # Campos que passaram a casar com outro alias (ou com nenhum) desde o último layout
+    mudancas = []
+    if do_tipo:
+        anteriores = do_tipo[0]["aliases"]
+        mudancas = [{"campo": campo, "antes": anteriores.get(campo), "agora": alias}
+                    for campo, alias in aliases.items() if anteriores.get(campo) != alias]
+        for m in mudancas:
+            print(f"⚠ Layout '{tipo}' mudou: campo '{m['campo']}' agora casa com {m['agora']!r} (antes {m['antes']!r})")
+
+    entrada = {"tipo": tipo, "assinatura": assinatura, "aba": aba, "h_idx": h_idx,
+               "colunas": colunas, "mapeamento": mapeamento, "aliases": aliases}
+    if usar_cache:
+        _salvar_cache_layouts(config, [entrada] + [e for e in layouts if e["assinatura"] != assinatura])
+    relatorio = {"assinatura": assinatura, "cache": "miss" if usar_cache else "off", "aba": aba, "h_idx": h_idx,
+                 "aliases": aliases, "mudancas": mudancas}
+    return entrada, relatorio
+
+
+def _mapear_layout_detalhe(colunas):
+    cols_map, col_inst, aliases = resolver_colunas_detalhe(colunas)
+    return {"cols_map": cols_map, "col_inst": col_inst}, aliases
+
+def resolver_layout_detalhe(indice, config=None, medidor=None):
+    """
+    resolver_layout da aba Detalhe (cabeçalho com REF, Instalação ou Data).
+    Retorna (aba, h_idx, colunas, cols_map, col_inst) ou None se a aba não foi
+    encontrada; o relatório do layout vai para medidor.layout["detalhe"].
+    """
+    layout, relatorio = resolver_layout(indice, "detalhe", ["REF", "Instalação", "Data"], "Detalhe",
+                                        _mapear_layout_detalhe, config)
+    if not layout:
+        return None
+    if medidor is not None:
+        medidor.layout["detalhe"] = relatorio
+    mapeamento = layout["mapeamento"]
+    return layout["aba"], layout["h_idx"], layout["colunas"], mapeamento["cols_map"], mapeamento["col_inst"]
+
+def _diagnosticar_colunas(colunas) -> str:
+    mostrar = colunas[:10]
+    res = f"Colunas encontradas ({len(colunas)}): {', '.join(mostrar)}"
+    if len(colunas) > 10: res += "..."
+    return res
+
+def mapear_detalhe(indice, config=None, medidor=None):
+    """
+    Localiza a aba Detalhe e resolve o mapeamento de colunas só pelo cabeçalho
+    (ou pela assinatura do cabeçalho já vista; ver resolver_layout).
+    Retorna (detalhe, erro): `detalhe` é um dict com aba, h_idx, colunas,
+    cols_map, col_inst e posicoes (colunas a ler); `erro` é o dict de erro do JSON.
+    """
+    resolvido = resolver_layout_detalhe(indice, config, medidor)
+    if not resolvido: return None, {"error": "Aba 'Detalhe Por UC' não encontrada."}
+    aba_detalhe, h_idx_det, colunas_det, cols_map_det, col_inst_det = resolvido
+    
+    # Log de debug para verificar mapeamento do boleto
+    print(f"🔍 Coluna mapeada para 'boleto_ev': {cols_map_det.get('boleto_ev')}")
+    print(f"🔍 Coluna mapeada para 'fatura_c_gd': {cols_map_det.get('fatura_c_gd')}")
+    
+    if not col_inst_det:
+        return None, {"error": "Coluna Instalação não achada no detalhe.", "details": _diagnosticar_colunas(colunas_det)}
+
+    # --- TRAVA DE SEGURANÇA: FILTRO DE DATA OBRIGATÓRIO ---
+    if not cols_map_det['ref']:
+        # Se não achou coluna de data, aborta para não gerar 850 faturas
+        return None, {
+            "error": "Não encontrei a coluna de DATA/MÊS na planilha.", 
+            "details": f"O sistema precisa saber o mês para gerar apenas as faturas corretas. {_diagnosticar_colunas(colunas_det)}"
+        }
+
+    # Ler do Detalhe só as colunas usadas (COLUMNS_MAP + UC)
+    usadas = {c for c in cols_map_det.values() if c} | {col_inst_det}
+    posicoes = [i for i, c in enumerate(colunas_det) if c in usadas]
+    return {
+        "aba": aba_detalhe, "h_idx": h_idx_det, "colunas": colunas_det,
+        "cols_map": cols_map_det, "col_inst": col_inst_det, "posicoes": posicoes,
+    }, None
+
+# =================================================================
+# MÉTRICAS DE EXECUÇÃO (tempo por etapa)
+# =================================================================
+
+# Log estruturado das etapas. Fica em silêncio até alguém configurar o logging
+# (ex: logging.basicConfig(level=logging.INFO)); silenciar de novo com
+# logging.getLogger("processor").setLevel(logging.WARNING).
+logger = logging.getLogger("processor")
+
+class MedidorEtapas:
+    """
+    Cronometra as etapas do processamento (tempo de parede e nº de linhas).
+    O resumo() vai no bloco "metrics" do resultado; cada etapa também é
+    registrada no logger "processor" (nível INFO, com extra={"etapa": {...}}).
+    Em `layout` ficam os relatórios de resolver_layout por aba (ex: "detalhe").
+    """
+    def __init__(self):
+        self.etapas = []
+        self.layout = {}
+        self._inicio = time.perf_counter()
+
+    def registrar(self, nome, segundos, linhas=None):
+        registro = {"etapa": nome, "segundos": round(segundos, 4), "linhas": linhas}
+        self.etapas.append(registro)
+        logger.info("etapa=%s segundos=%.4f linhas=%s", nome, segundos, linhas, extra={"etapa": registro})
+        return registro
+
+    @contextmanager
+    def etapa(self, nome):
+        """Mede o bloco; atribua info['linhas'] dentro dele para registrar a contagem."""
+        info = {"linhas": None}
+        inicio = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio, info["linhas"])
+
+    def resumo(self):
+        resumo = {"etapas": self.etapas, "total_segundos": round(time.perf_counter() - self._inicio, 4)}
+        if self.layout:
+            resumo["layout"] = self.layout
+        return resumo
+
+# Lugar do bloco "metrics" no resultado; o encoder o troca pelo resumo ao chegar nele
+_METRICAS_AO_FINAL = object()
+
+def _json_com_metricas(resultado, medidor):
+    """
+    json.dumps(resultado) com o bloco "metrics" por último, numa única chamada.
+    O resumo só é montado quando o encoder chega na chave "metrics" (hook
+    `default`), depois do resto do resultado: assim a etapa "serializacao"
+    (tempo até ali) entra nas próprias métricas.
+    """
+    dados = resultado.get("data")
+    if isinstance(dados, list):
+        linhas = len(dados)
+    elif isinstance(dados, dict):
+        linhas = 1  # um registro só (ex: buscar_cliente_armazenado)
+    else:
+        linhas = resultado.get("total")
+
+    inicio = time.perf_counter()
+    def metricas(obj):
+        if obj is not _METRICAS_AO_FINAL:
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+        medidor.registrar("serializacao", time.perf_counter() - inicio, linhas)
+        return medidor.resumo()
+
+    return json.dumps({**resultado, "metrics": _METRICAS_AO_FINAL}, default=metricas)
+
+def _avisos_valores_invalidos(invalidos):
+    """Um warning por coluna financeira com células não numéricas ({coluna: quantidade})."""
+    return [{
+        "type": "warning",
+        "title": "Valor não numérico",
+        "message": f"{n} célula(s) da coluna '{col}' não são números válidos e foram consideradas R$ 0,00."
+    } for col, n in invalidos.items()]
+
+# =================================================================
+# MAPA DE CLIENTES (BASE EXTERNA + ABA DO RELATÓRIO)
+# =================================================================
+
+def localizar_aba_clientes(indice):
+    """
+    Aba 'Infos Clientes' do relatório (pelo nome ou, na falta, pelas colunas)
+    e a linha do cabeçalho. Retorna (aba, h_idx); aba None se não houver.
+    """
+    aba_clientes = None
+    
+    print(f"📋 Procurando aba de clientes no relatório. Abas disponíveis: {indice.sheet_names}")
+    
+    for sheet in indice.sheet_names:
+        if 'info' in sheet.lower() and 'cliente' in sheet.lower(): 
+            aba_clientes = sheet
+            print(f"✓ Aba de clientes encontrada: '{aba_clientes}'")
+            break
+    
+    colunas_cli = ["Nome/Razão Social", "CPF/CNPJ", "Instalação"]
+    if not aba_clientes:
+        print("⚠ Aba 'Infos Clientes' não encontrada pelo nome, tentando busca por colunas...")
+        aba_clientes, h_idx_cli = indice.find_header(colunas_cli, prefer_name="Infos", max_rows=20)
+        if aba_clientes:
+            print(f"✓ Aba encontrada por busca: '{aba_clientes}' (header linha {h_idx_cli})")
+    else:
+        # Para aba Infos Clientes, procurar por colunas específicas
+        _, h_idx_cli = indice.find_header(colunas_cli, prefer_name=aba_clientes, max_rows=20)
+        print(f"✓ Header da aba '{aba_clientes}' na linha {h_idx_cli}")
+    return aba_clientes, h_idx_cli
+
+def carregar_base_externa_medida(carregar_externa, config=None, medidor=None):
+    """
+    Base de clientes externa (config.json) medida na etapa "base_externa".
+    `carregar_externa(config)` é o carregador do motor (ver carregar_base_clientes).
+    """
+    medidor = medidor or MedidorEtapas()
+    with medidor.etapa("base_externa") as info:
+        if config is None:
+            config = carregar_config()
+        mapa_clientes_externo = carregar_externa(config)
+        info["linhas"] = len(mapa_clientes_externo)
+    
+    if mapa_clientes_externo:
+        print(f"✓ Base de clientes externa carregada com sucesso: {len(mapa_clientes_externo)} registros")
+    return mapa_clientes_externo
+
+def mesclar_mapas_clientes(mapa_clientes_externo, mapa_clientes_interno, medidor=None):
+    """
+    Dados internos (aba do relatório) complementam/sobrescrevem a base externa
+    (etapa "mescla"). As fichas da base externa são atualizadas no lugar.
+    Sem aba de clientes no relatório (mapa interno None) fica a base externa.
+    """
+    if mapa_clientes_interno is None:
+        if not mapa_clientes_externo:
+            print("✗ AVISO: Nenhuma fonte de dados de clientes disponível!")
+        return mapa_clientes_externo
+
+    medidor = medidor or MedidorEtapas()
+    with medidor.etapa("mescla") as info:
+        if mapa_clientes_externo:
+            mapa_clientes = mapa_clientes_externo
+            # Mesclar: prioridade para dados do relatório (mais atualizados)
+            for uc, dados in mapa_clientes_interno.items():
+                if uc in mapa_clientes:
+                    # Atualizar apenas campos não vazios do relatório
+                    for campo, valor in dados.items():
+                        if valor and valor.strip():
+                            mapa_clientes[uc][campo] = valor
+                else:
+                    mapa_clientes[uc] = dados
+            print(f"✓ Dados mesclados: {len(mapa_clientes)} registros totais")
+        else:
+            mapa_clientes = mapa_clientes_interno
+        info["linhas"] = len(mapa_clientes)
+    return mapa_clientes
@@ -0,0 +1,639 @@
+"""
+Motor leve do processador: processar_relatorio_leve tem o mesmo contrato e o
+mesmo JSON de processar_relatorio_para_fatura (processor.py), sem pandas nem
+numpy - só openpyxl (read_only) e estruturas da biblioteca padrão.
+
+No navegador é o motor carregado na inicialização (ver excelProcessor.js):
+basta o micropip + openpyxl para a página ficar pronta. O pandas só é
+carregado quando alguém pede o streaming (NDJSON) ou o lote de vários meses.
+
+Para dar o mesmo resultado, cada coluna lida passa pela mesma inferência de
+tipos do read_excel (ver _inferir_coluna): é ela que decide, por exemplo, que
+a UC 123 numa coluna com vazios sai como "123.0", como no motor pandas.
+
+Diferença conhecida: REF em texto fora dos formatos de safe_parse_date (e das
+variações AAAA-MM / MM/AAAA tratadas aqui) fica fora do mês; o motor pandas
+ainda tenta adivinhar essas datas com pd.to_datetime.
+
+No Pyodide todos os módulos dividem o mesmo escopo global, então os nomes
+definidos aqui não repetem os do processor.py nem os dos módulos comuns (que
+são importados, não redefinidos): a entrada é processar_relatorio_leve, e o
+processar_relatorio_para_fatura do motor pandas fica intacto ao lado dela.
+"""
+import json
+import math
+import re
+import time
+import traceback
+import warnings as python_warnings
+from datetime import datetime, timedelta
+
+from openpyxl import load_workbook
+
+try:
+    # Execução como módulo (servidor / scripts de linha de comando)
+    from excel_utils import WorkbookIndex, abrir_planilha, nomes_de_colunas, _converter_celula, _TEXTOS_NA, _NAN
+    from processor_comum import (
+        CO2_PER_KWH, TREES_PER_TON_CO2, FORMATOS_RESULTADO,
+        carregar_config, carregar_base_clientes, escolher_aba_base_clientes,
+        resolver_colunas_clientes, mapear_detalhe, normalizar_texto_monetario, numero_monetario, limpar_uc,
+        periodo_referencia,
+        localizar_aba_clientes, carregar_base_externa_medida, mesclar_mapas_clientes,
+        MedidorEtapas, _json_com_metricas, _avisos_valores_invalidos,
+    )
+except ImportError:
+    # Pyodide: excel_utils.py e processor_comum.py já foram executados no mesmo escopo global
+    pass
+
+# Suprime warnings do openpyxl
+python_warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
+
+# =================================================================
+# INFERÊNCIA DE TIPOS (MESMAS REGRAS DO read_excel / TextParser)
+# =================================================================
+
+# Textos que o parser do pandas aceita como número (sem '_', sem dígitos unicode)
+_RE_INTEIRO = re.compile(r'[ \t\n\r\f\v]*[+-]?[0-9]+[ \t\n\r\f\v]*')
+_RE_REAL = re.compile(
+    r'[ \t\n\r\f\v]*[+-]?(?:(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|inf(?:inity)?)[ \t\n\r\f\v]*',
+    re.IGNORECASE)
+_TEXTOS_BOOL = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False}
+
+# Faixas de inteiros que o parser guarda como int64 / uint64. Colunas com inteiros
+# acima de int64 (células >= 9,2e18, que não existem nos relatórios) podem sair
+# com outro tipo que no pandas.
+_INT64_MIN, _INT64_MAX, _UINT64_MAX = -2 ** 63, 2 ** 63 - 1, 2 ** 64 - 1
+
+
+def _eh_vazio(v):
+    """Célula que o parser lê como NaN ('' de célula vazia, textos NA e erros de fórmula)."""
+    if v is None:
+        return True
+    if isinstance(v, str):
+        return v in _TEXTOS_NA
+    return isinstance(v, float) and v != v
+
+
+def _como_numero(v):
+    """Número que o parser veria na célula, ou None se ela não for numérica."""
+    if isinstance(v, (bool, int, float)):
+        return v
+    if isinstance(v, str):
+        if _RE_INTEIRO.fullmatch(v):
+            return int(v)
+        if _RE_REAL.fullmatch(v):
+            return float(v)
+    return None
+
+
+def _inferir_numerica(valores, vazios):
+    """Parte numérica da inferência: (tipo, valores) ou None se alguma célula não for número."""
+    numeros = []
+    tem_real = tem_inteiro = tem_negativo = tem_grande = False
+    for v, vazio in zip(valores, vazios):
+        if vazio:
+            numeros.append(None)
+            continue
+        n = _como_numero(v)
+        if n is None:
+            return None
+        if isinstance(n, bool):
+            pass
+        elif isinstance(n, int):
+            if not _INT64_MIN <= n <= _UINT64_MAX:
+                return None
+            tem_inteiro = True
+            tem_negativo = tem_negativo or n < 0
+            tem_grande = tem_grande or n > _INT64_MAX
+        else:
+            tem_real = True
+        numeros.append(n)
+
+    if tem_real:
+        return 'float', [_NAN if n is None else float(n) for n in numeros]
+    if tem_grande and (tem_negativo or any(vazios)):
+        return None  # nem int64 nem uint64 comportam a coluna
+    if any(vazios):
+        return 'float', [_NAN if n is None else float(n) for n in numeros]
+    if tem_inteiro:
+        return 'int', [int(n) for n in numeros]
+    return 'bool', numeros
+
+
+def _inferir_coluna(valores):
+    """
+    Tipo e valores que a coluna teria no DataFrame do read_excel.
+    Retorna (tipo, valores) com tipo em 'int', 'float', 'bool', 'datetime' ou
+    'object'; vazios viram NaN nas colunas 'float' e None nas demais.
+    """
+    vazios = [_eh_vazio(v) for v in valores]
+
+    # 1. Numérica: todas as células preenchidas são números (ou textos numéricos)
+    numerica = _inferir_numerica(valores, vazios)
+    if numerica is not None:
+        return numerica
+
+    # 2. Texto/misturada: vazios viram NaN e valores iguais passam a ser o
+    #    primeiro deles (ex: False depois de 0 vira 0), como no parser
+    vistos = {}
+    objetos = []
+    for v, vazio in zip(valores, vazios):
+        if vazio:
+            objetos.append(None)
+        else:
+            objetos.append(vistos.setdefault(v, v))
+    preenchidos = [v for v in objetos if v is not None]
+
+    # 3. Textos 'True'/'False' (e células lógicas) viram booleanos, se a primeira
+    #    célula não for lógica; com vazios, a coluna continua objeto
+    if not isinstance(objetos[0], int) and all(
+            isinstance(v, bool) or (isinstance(v, str) and v in _TEXTOS_BOOL) for v in preenchidos):
+        booleanos = [v if v is None or isinstance(v, bool) else _TEXTOS_BOOL[v] for v in objetos]
+        return ('object' if any(vazios) else 'bool'), booleanos
+
+    # 4. Datas: só datas/horas do Excel (vazios viram NaT)
+    if all(isinstance(v, datetime) for v in preenchidos):
+        return 'datetime', objetos
+
+    return 'object', objetos
+
+
+def _textos_da_coluna(coluna):
+    """Equivalente ao _coluna_texto do processor.py: '' nos vazios, str(valor).strip() nos demais."""
+    tipo, valores = coluna
+    if tipo == 'float':
+        return ['' if v != v else str(v).strip() for v in valores]
+    return ['' if v is None else str(v).strip() for v in valores]
+
+
+def _ids_da_coluna(coluna):
+    """Equivalente a astype(object).map(str).str.strip(): vazios viram 'nan' (ou 'NaT' em datas)."""
+    tipo, valores = coluna
+    vazio = 'NaT' if tipo == 'datetime' else 'nan'
+    if tipo == 'float':
+        return [str(v).strip() for v in valores]
+    return [vazio if v is None else str(v).strip() for v in valores]
+
+
+def _texto_monetario(s):
+    """
+    Mesmas regras do parse_money_series para uma célula de texto (BR ou US):
+    normalizar_texto_monetario e o que o pd.to_numeric aceita como número.
+    Retorna o float, ou None se o texto não for um número válido.
+    """
+    s, neg = normalizar_texto_monetario(s)
+    if s is None:
+        s = '0'
+    if _RE_INTEIRO.fullmatch(s) or _RE_REAL.fullmatch(s):
+        v = float(s)
+        return -v if neg else v
+    return None
+
+
+def _valores_monetarios(coluna):
+    """
+    Equivalente ao parse_money_series sobre a coluna inferida.
+    Retorna (floats, invalidos): vazios viram 0.0; células preenchidas que não
+    são números (texto inválido, datas, horas) também, e entram em `invalidos`.
+    """
+    tipo, valores = coluna
+    if tipo in ('int', 'bool'):
+        return [float(v) for v in valores], 0
+    if tipo == 'float':
+        return [0.0 if v != v else v for v in valores], 0
+
+    tem_texto = any(isinstance(v, str) for v in valores)
+    resultado = []
+    invalidos = 0
+    for v in valores:
+        if v is None:
+            resultado.append(0.0)
+        elif isinstance(v, str) and tem_texto:
+            s = v.strip()
+            if s == '':
+                resultado.append(0.0)
+                continue
+            n = _texto_monetario(s)
+            if n is None or n != n:
+                invalidos += 1
+                n = 0.0
+            resultado.append(n)
+        elif isinstance(v, (bool, int, float)):
+            resultado.append(float(v))
+        else:
+            invalidos += 1
+            resultado.append(0.0)
+    return resultado, invalidos
+
+
+# =================================================================
+# CONVERSÕES ESCALARES (FILTRO DO MÊS)
+# =================================================================
+
+_FORMATOS_DATA_LEVE = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
+# Só mês e ano (o pd.to_datetime do motor pandas entende esses também)
+_FORMATOS_MES_LEVE = ('%Y-%m', '%m/%Y', '%Y/%m', '%m-%Y')
+
+
+def _data_leve(val):
+    """
+    safe_parse_date sem pandas: datas do Excel, os formatos de _FORMATOS_DATA_LEVE
+    (só a parte da data) e mês/ano. Números contam como nanossegundos desde
+    1970, como no pd.to_datetime. Textos livres ficam de fora (None).
+    """
+    if val is None or (isinstance(val, float) and val != val): return None
+    if isinstance(val, datetime): return val
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        try:
+            return datetime(1970, 1, 1) + timedelta(microseconds=val / 1000)
+        except (OverflowError, ValueError):
+            return None
+    texto = str(val).strip()
+    candidatos = (texto[:10], texto.split(' ')[0] if texto else texto)
+    for s in candidatos:
+        for fmt in _FORMATOS_DATA_LEVE:
+            try: return datetime.strptime(s, fmt)
+            except ValueError: continue
+    for fmt in _FORMATOS_MES_LEVE:
+        try: return datetime.strptime(texto, fmt)
+        except ValueError: continue
+    try:
+        return datetime.fromisoformat(texto)
+    except ValueError:
+        return None
+
+
+# =================================================================
+# LEITURA DAS ABAS
+# =================================================================
+
+def _ler_tabela(book, aba, h_idx):
+    """
+    Lê a aba inteira como o pd.read_excel(header=h_idx) leria.
+    Retorna (nomes, {nome: coluna inferida}, nº de linhas de dados).
+    """
+    ws = book[aba]
+    if getattr(book, 'read_only', False):
+        ws.reset_dimensions()
+
+    # Mesmo corte do leitor openpyxl do pandas: vazios à direita de cada linha
+    # e linhas vazias no fim da aba saem; as demais são completadas com ""
+    linhas = []
+    ultima = -1
+    for i, row in enumerate(ws.iter_rows(values_only=True)):
+        linha = ["" if v is None else _converter_celula(v) for v in row]
+        while linha and isinstance(linha[-1], str) and linha[-1] == "":
+            linha.pop()
+        if linha:
+            ultima = i
+        linhas.append(linha)
+    linhas = linhas[:ultima + 1]
+    if h_idx >= len(linhas):
+        raise ValueError(f"Linha de cabeçalho {h_idx} fora da aba '{aba}' ({len(linhas)} linhas)")
+
+    largura = max(len(linha) for linha in linhas)
+    linhas = [linha + [""] * (largura - len(linha)) for linha in linhas]
+
+    nomes = nomes_de_colunas(linhas[h_idx])
+    dados = linhas[h_idx + 1:]
+    if largura == 1:
+        # Com uma coluna só, o parser pula as linhas em branco
+        dados = [linha for linha in dados if not (isinstance(linha[0], str) and not linha[0].strip())]
+    colunas = {nome: _inferir_coluna([linha[j] for linha in dados]) for j, nome in enumerate(nomes)}
+    return nomes, colunas, len(dados)
+
+
+def _ler_detalhe_leve(book, det, mes_referencia_str, medidor):
+    """
+    Lê da aba Detalhe só as linhas do mês com boleto >= R$ 5 (filtro na leitura,
+    como o ler_detalhe_do_mes). Retorna ({nome: coluna inferida}, nº de linhas).
+    """
+    colunas_det, posicoes, cols_map_det = det['colunas'], det['posicoes'], det['cols_map']
+    i_ref = posicoes.index(colunas_det.index(cols_map_det['ref']))
+    i_boleto = None
+    if cols_map_det.get('boleto_ev'):
+        i_boleto = posicoes.index(colunas_det.index(cols_map_det['boleto_ev']))
+    alvo = divmod(periodo_referencia(mes_referencia_str), 100)
+
+    ws = book[det['aba']]
+    if getattr(book, 'read_only', False):
+        ws.reset_dimensions()
+
+    inicio = time.perf_counter()
+    tempo_filtro = 0.0
+    avaliadas = 0
+    aceitas = []
+    linhas = ws.iter_rows(min_row=det['h_idx'] + 1, values_only=True)
+    next(linhas, None)  # cabeçalho
+    for row in linhas:
+        linha = [_converter_celula(row[p]) if p < len(row) else None for p in posicoes]
+        inicio_linha = time.perf_counter()
+        ref = linha[i_ref]
+        data = ref if isinstance(ref, datetime) else _data_leve(ref)
+        aceita = (data is not None and (data.year, data.month) == alvo
+                  and (i_boleto is None or numero_monetario(linha[i_boleto]) >= 5))
+        tempo_filtro += time.perf_counter() - inicio_linha
+        avaliadas += 1
+        if aceita:
+            aceitas.append(["" if v is None else v for v in linha])
+
+    colunas = {colunas_det[p]: _inferir_coluna([linha[j] for linha in aceitas]) for j, p in enumerate(posicoes)}
+    medidor.registrar("leitura_detalhe", time.perf_counter() - inicio - tempo_filtro, len(aceitas))
+    medidor.registrar("filtro_data", tempo_filtro, avaliadas)
+    return colunas, len(aceitas)
+
+
+# =================================================================
+# CLIENTES
+# =================================================================
+
+def _criar_mapa_clientes(nomes, colunas):
+    """criar_mapa_completo_clientes sobre a tabela lida por _ler_tabela."""
+    col_uc, cols_cli, _ = resolver_colunas_clientes(nomes)
+
+    if not col_uc:
+        print("✗ ERRO: Coluna UC não encontrada na aba Infos Clientes")
+        return {}
+
+    print(f"✓ Coluna UC encontrada: '{col_uc}'")
+    print(f"✓ Colunas mapeadas: {cols_cli}")
+
+    raw_ucs = _textos_da_coluna(colunas[col_uc])
+    validas = [uc != '' and uc.lower() != 'nan' for uc in raw_ucs]
+    campos = {field: _textos_da_coluna(colunas[col_name])
+              for field, col_name in cols_cli.items() if col_name}
+
+    # Chave original e chave limpa apontam para a mesma ficha; linhas posteriores prevalecem
+    mapa = {}
+    for i, raw_uc in enumerate(raw_ucs):
+        if not validas[i]:
+            continue
+        ficha = {field: textos[i] for field, textos in campos.items()}
+        mapa[raw_uc] = ficha
+        chave_limpa = limpar_uc(raw_uc)
+        if chave_limpa: mapa[chave_limpa] = ficha
+
+    print(f"✓ Mapa criado com {len(mapa)} registros")
+    return mapa
+
+
+def _ler_base_clientes_leve(db_path, config):
+    """Lê a base de clientes externa só com openpyxl (ver carregar_base_clientes)."""
+    book = load_workbook(db_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet_name = escolher_aba_base_clientes([ws.title for ws in book.worksheets], config)
+        print(f"📄 Usando aba: '{sheet_name}'")
+
+        h_idx = config.get('client_database_header_row', None)
+        if h_idx is None:
+            _, h_idx = WorkbookIndex(book).find_header(
+                ["Instalação", "Nome", "CPF", "CNPJ", "Endereço", "NOME COMPLETO"],
+                prefer_name=sheet_name, max_rows=20
+            )
+        else:
+            print(f"✓ Usando header configurado: linha {h_idx}")
+
+        nomes, colunas, n_linhas = _ler_tabela(book, sheet_name, h_idx)
+        print(f"✓ Base externa carregada: {n_linhas} linhas")
+        print(f"  Colunas disponíveis: {nomes[:15]}")
+        return _criar_mapa_clientes(nomes, colunas)
+    finally:
+        book.close()
+
+
+def carregar_base_clientes_externa_leve(config):
+    """
+    carregar_base_clientes_externa do processor.py, lendo a base só com openpyxl.
+    Retorna um mapa {UC: {nome, doc, endereco, bairro, cidade, num_conta}}
+    """
+    return carregar_base_clientes(config, _ler_base_clientes_leve)
+
+
+def _ler_clientes_do_relatorio_leve(book, indice, medidor):
+    """ler_clientes_do_relatorio do processor.py, lendo a aba com _ler_tabela."""
+    aba_clientes, h_idx_cli = localizar_aba_clientes(indice)
+    if not aba_clientes:
+        return None
+    try:
+        with medidor.etapa("base_interna") as info:
+            nomes, colunas, n_linhas = _ler_tabela(book, aba_clientes, h_idx_cli)
+            print(f"✓ Aba '{aba_clientes}' carregada com {n_linhas} linhas")
+            print(f"  Colunas: {nomes[:10]}")
+            mapa_clientes_interno = _criar_mapa_clientes(nomes, colunas)
+            print(f"✓ Mapa de clientes interno carregado: {len(mapa_clientes_interno)} registros.")
+            info["linhas"] = n_linhas
+        return mapa_clientes_interno
+    except Exception as e:
+        print(f"✗ ERRO ao carregar aba clientes: {str(e)}")
+        return None
+
+
+def _carregar_mapa_clientes_leve(book, indice, medidor, config):
+    """carregar_mapa_clientes do processor.py: base externa + aba 'Infos Clientes' do relatório."""
+    mapa_clientes = carregar_base_externa_medida(carregar_base_clientes_externa_leve, config, medidor)
+    return mesclar_mapas_clientes(mapa_clientes, _ler_clientes_do_relatorio_leve(book, indice, medidor), medidor)
+
+
+# =================================================================
+# MÉTRICAS (MESMO RESULTADO DE compute_metrics_frame)
+# =================================================================
+
+def _arredondar_valor(valor, casas=2):
+    """
+    Arredondamento do _arredondar do processor.py (np.round), valor a valor:
+    meio a par em valor * 10**casas, e round() do Python perto de empates.
+    """
+    valor = float(valor) + 0.0  # -0.0 vira 0.0, como em float(x or 0)
+    if not math.isfinite(valor):
+        return valor
+    escala = 10.0 ** casas
+    escalado = valor * escala
+    if abs(abs(escalado) % 1.0 - 0.5) < 1e-6:
+        return round(valor, casas)
+    inteiro = float(round(escalado))
+    if inteiro == 0.0:
+        inteiro = math.copysign(0.0, escalado)  # np.rint preserva o sinal de -0.4 -> -0.0
+    return inteiro / escala
+
+
+def _valor_cadastral(colunas, cols_map, field, fichas):
+    """Valor da linha primeiro, ficha do cliente depois (_campo_cadastral)."""
+    col = cols_map.get(field)
+    n = len(fichas)
+    valores = _textos_da_coluna(colunas[col]) if col and col in colunas else [''] * n
+    resultado = []
+    for valor, ficha in zip(valores, fichas):
+        if valor == '' and ficha is not None:
+            da_ficha = ficha.get(field)
+            if da_ficha is None or (isinstance(da_ficha, float) and da_ficha != da_ficha):
+                da_ficha = ''
+            valor = da_ficha
+        resultado.append(valor)
+    return resultado
+
+
+def _montar_clientes_leve(colunas, n, cols_map_det, col_inst_det, mapa_clientes, vencimento_str, formato):
+    """montar_clientes do processor.py sobre as colunas lidas. Retorna (clientes, warnings)."""
+    raw_ids = _ids_da_coluna(colunas[col_inst_det])
+
+    # Chave original primeiro, chave limpa (limpar_uc) para quem não casou
+    fichas = []
+    mapeado = []
+    for raw_id in raw_ids:
+        if raw_id in mapa_clientes:
+            ficha = mapa_clientes[raw_id]
+        else:
+            ficha = mapa_clientes.get(limpar_uc(raw_id))
+        fichas.append(ficha)
+        mapeado.append(bool(ficha))
+
+    warnings = [
+        {"type": "warning", "title": "Cliente não achado", "message": f"UC {raw_id} sem cadastro."}
+        for raw_id, ok in zip(raw_ids, mapeado) if not ok
+    ]
+
+    invalidos = {}
+    def get(key):
+        col = cols_map_det.get(key)
+        if not col or col not in colunas:
+            return [0.0] * n
+        valores, n_invalidos = _valores_monetarios(colunas[col])
+        if n_invalidos:
+            invalidos[col] = n_invalidos
+        return valores
+
+    consumo_qtd = get('consumo_qtd')
+    comp_qtd = get('comp_qtd')
+    tarifa_consumo = get('tarifa_consumo')
+    tarifa_credito = get('tarifa_credito')
+    dist_total = get('fatura_c_gd')
+    outros = get('outros')
+    egs_total = get('boleto_ev')
+    custo_sem_solar = get('custo_sem_gd')
+    custo_com_solar = get('custo_com_gd')
+    economia_planilha = get('economia')
+    warnings.extend(_avisos_valores_invalidos(invalidos))
+
+    # Mesma cadeia de fallback: economia da planilha -> diferença de custos -> zero
+    economia_mes = []
+    for economia, sem, com in zip(economia_planilha, custo_sem_solar, custo_com_solar):
+        if economia > 0:
+            economia_mes.append(economia)
+        elif sem > 0 and com > 0:
+            diferenca = sem - com
+            economia_mes.append(diferenca if diferenca != diferenca or diferenca > 0.0 else 0.0)
+        else:
+            economia_mes.append(0.0)
+    co2_evitado = [c * CO2_PER_KWH for c in consumo_qtd]
+    arvores = [(c / 1000.0) * TREES_PER_TON_CO2 for c in co2_evitado]
+
+    def r(valores, casas=2):
+        return [_arredondar_valor(v, casas) for v in valores]
+
+    # Endereço completo: "rua - bairro - cidade", pulando partes vazias
+    endereco = _valor_cadastral(colunas, cols_map_det, 'endereco', fichas)
+    for field in ('bairro', 'cidade'):
+        parte = _valor_cadastral(colunas, cols_map_det, field, fichas)
+        endereco = [e + (' - ' if e != '' and p != '' else '') + p for e, p in zip(endereco, parte)]
+
+    nome = _valor_cadastral(colunas, cols_map_det, 'nome', fichas)
+    economia_r = r(economia_mes)
+    emissao_iso = datetime.now().strftime('%Y-%m-%d')
+    saida = {
+        "raw_id": raw_ids,
+        "instalacao": list(raw_ids),
+        "nome": [v if v != '' else "Cliente não identificado" for v in nome],
+        "documento": _valor_cadastral(colunas, cols_map_det, 'doc', fichas),
+        "num_conta": _valor_cadastral(colunas, cols_map_det, 'num_conta', fichas),
+        "endereco": endereco,
+        "status_mapeamento": ["OK" if ok else "Nome Não Mapeado" for ok in mapeado],
+        "economiaTotal": economia_r,
+
+        # Bloco Distribuidora
+        "dist_consumo_qtd": r(consumo_qtd),
+        "dist_consumo_tar": r(tarifa_consumo, 4),
+        "dist_consumo_total": r(dist_total),
+        "dist_comp_qtd": r(comp_qtd),
+        "dist_comp_tar": [0] * n,
+        "dist_comp_total": [0] * n,
+        "dist_outros": r(outros),
+        "dist_total": r(dist_total),
+
+        # Bloco EGS / Boleto
+        "det_credito_qtd": r(comp_qtd),
+        "det_credito_tar": r(tarifa_credito, 4),
+        "det_credito_total": r(egs_total),
+        "det_total_contrib": r(egs_total),
+        "totalPagar": r(egs_total),
+
+        # Economia
+        "econ_total_sem": r(custo_sem_solar),
+        "econ_total_com": r(custo_com_solar),
+        "economiaMes": list(economia_r),
+
+        # Métricas Ambientais
+        "co2Evitado": r(co2_evitado),
+        "arvoresEquivalentes": r(arvores, 1),
+
+        # Datas (emissão calculada uma vez para o lote todo)
+        "vencimento_iso": [vencimento_str] * n,
+        "emissao_iso": [emissao_iso] * n,
+    }
+
+    if formato == 'colunar':
+        return saida, warnings
+    campos = list(saida)
+    return [dict(zip(campos, valores)) for valores in zip(*saida.values())], warnings
+
+
+# =================================================================
+# PROCESSADOR PRINCIPAL
+# =================================================================
+
+def processar_relatorio_leve(file_content, mes_referencia_str, vencimento_str, formato='registros'):
+    """
+    Mesmo contrato e mesmo JSON do processar_relatorio_para_fatura (processor.py)
+    (formatos 'registros' e 'colunar', bloco "metrics" com as mesmas etapas),
+    lendo a planilha só com openpyxl. file_content aceita o mesmo que lá
+    (bytes, buffer, JsBuffer ou caminho; ver abrir_planilha).
+    """
+    if formato not in FORMATOS_RESULTADO:
+        return json.dumps({"error": f"Formato de resultado desconhecido: {formato}. Use {FORMATOS_RESULTADO}."})
+    medidor = MedidorEtapas()
+    book = None
+    try:
+        config = carregar_config()
+        with abrir_planilha(file_content) as fonte:
+            with medidor.etapa("abertura_planilha"):
+                book = load_workbook(fonte, read_only=True, data_only=True, keep_links=False)
+
+            with medidor.etapa("cabecalhos"):
+                indice = WorkbookIndex(book)
+                det, erro = mapear_detalhe(indice, config, medidor)
+            if erro: return _json_com_metricas(erro, medidor)
+
+            try:
+                colunas, n = _ler_detalhe_leve(book, det, mes_referencia_str, medidor)
+                print(f"✓ Filtro de Data Aplicado: {n} registros encontrados para {mes_referencia_str}")
+            except Exception as e:
+                return _json_com_metricas({"error": f"Erro ao filtrar data na coluna '{det['cols_map']['ref']}': {str(e)}"}, medidor)
+
+            if n == 0:
+                return _json_com_metricas({"error": f"Nenhum registro encontrado para {mes_referencia_str}. Verifique se a data na planilha bate com a data selecionada."}, medidor)
+
+            mapa_clientes = _carregar_mapa_clientes_leve(book, indice, medidor, config)
+
+        with medidor.etapa("metricas") as info:
+            clientes, warnings = _montar_clientes_leve(colunas, n, det['cols_map'], det['col_inst'], mapa_clientes,
+                                                       vencimento_str, formato)
+            info["linhas"] = n
+
+        if formato == 'colunar':
+            return _json_com_metricas({"formato": "colunar", "total": n, "colunas": clientes, "warnings": warnings}, medidor)
+        return _json_com_metricas({"data": clientes, "warnings": warnings}, medidor)
+
+    except Exception as e:
+        return json.dumps({"error": f"Erro crítico: {traceback.format_exc()}"})
+    finally:
+        if book is not None:
+            book.close()
@@ -0,0 +1,72 @@
+"""
+Script de teste: processar_relatorio_para_fatura (nos dois motores) aceita
+bytes, buffers (memoryview/bytearray) e o caminho do arquivo, com o mesmo
+resultado, e o LeitorBuffer se comporta como um arquivo binário.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import io
+import json
+import tempfile
+
+import processor
+import processor_leve
+from excel_utils import LeitorBuffer, abrir_planilha
+from test_multimeses import _planilha_exemplo
+
+
+def _sem_metricas(resultado_json):
+    resultado = json.loads(resultado_json)
+    resultado.pop("metrics", None)
+    return resultado
+
+
+def test_leitor_buffer():
+    leitor = LeitorBuffer(bytearray(b"0123456789"))
+    assert leitor.read(3) == b"012"
+    assert leitor.seek(-2, io.SEEK_END) == 8
+    assert leitor.read() == b"89"
+    assert leitor.read(5) == b""
+    leitor.seek(4)
+    destino = bytearray(3)
+    assert leitor.readinto(destino) == 3 and destino == b"456"
+    leitor.close()
+    assert leitor.closed
+
+
+def test_mesmo_resultado_por_bytes_buffer_e_caminho():
+    conteudo = _planilha_exemplo()
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = Path(pasta) / "relatorio.xlsx"
+        caminho.write_bytes(conteudo)
+        for motor in (processor.processar_relatorio_para_fatura, processor_leve.processar_relatorio_leve):
+            esperado = _sem_metricas(motor(conteudo, "2025-10", "2025-11-10"))
+            assert "error" not in esperado, motor.__name__
+            for fonte in (memoryview(conteudo), bytearray(conteudo), str(caminho), caminho):
+                obtido = _sem_metricas(motor(fonte, "2025-10", "2025-11-10"))
+                assert obtido == esperado, (motor.__name__, type(fonte).__name__)
+
+        lote = json.loads(processor.processar_relatorio_multimeses(caminho, [("2025-10", "2025-11-10")]))
+        assert "error" not in lote["resultados"][0]
+        # O mapeamento foi fechado: o arquivo pode ser removido (Windows recusa arquivo mapeado)
+        caminho.unlink()
+
+
+def test_arquivo_vazio():
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = Path(pasta) / "vazio.xlsx"
+        caminho.write_bytes(b"")
+        with abrir_planilha(caminho) as fonte:
+            assert fonte.read() == b""
+        for motor in (processor.processar_relatorio_para_fatura, processor_leve.processar_relatorio_leve):
+            resultado = json.loads(motor(caminho, "2025-10", "2025-11-10"))
+            assert resultado["error"].startswith("Erro crítico"), motor.__name__
+
+
+if __name__ == "__main__":
+    test_leitor_buffer()
+    test_mesmo_resultado_por_bytes_buffer_e_caminho()
+    test_arquivo_vazio()
+    print("✅ planilha aceita por bytes, buffer e caminho")
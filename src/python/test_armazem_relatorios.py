@@ -0,0 +1,149 @@
+"""
+Script de teste: armazém SQLite dos relatórios (armazem_relatorios.py) - o mês
+lido do armazém dá o mesmo JSON que a planilha, a reingestão do mesmo arquivo
+é reaproveitada e a busca por UC traz o mesmo registro do mês inteiro.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import io
+import json
+import math
+import sqlite3
+from contextlib import closing
+import tempfile
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+
+from openpyxl import Workbook
+
+import processor
+from armazem_relatorios import (
+    ingerir_relatorio, meses_armazenados, processar_mes_armazenado, buscar_cliente_armazenado,
+    _codificar, _decodificar,
+)
+from gerar_relatorio_sintetico import gerar_relatorio_sintetico, MES_FINAL_PADRAO
+from test_multimeses import _planilha_exemplo
+
+
+def _sem_metricas(resultado_json):
+    resultado = json.loads(resultado_json)
+    resultado.pop("metrics", None)
+    return resultado
+
+
+def _confere(conteudo, meses, vencimento="2025-12-10"):
+    with tempfile.TemporaryDirectory() as pasta:
+        db = str(Path(pasta) / "armazem.db")
+        assert "error" not in ingerir_relatorio(conteudo, db)
+        for mes in meses:
+            for formato in ("registros", "colunar"):
+                esperado = _sem_metricas(processor.processar_relatorio_para_fatura(conteudo, mes, vencimento, formato))
+                obtido = _sem_metricas(processar_mes_armazenado(db, mes, vencimento, formato))
+                assert obtido == esperado, (mes, formato)
+
+
+def test_mesmo_resultado_que_a_planilha():
+    _confere(_planilha_exemplo(), ("2025-09", "2025-10", "2025-11-01", "2025-12", "2019-01"))
+    for layout in ("padrao", "alternativo"):
+        _confere(gerar_relatorio_sintetico(40, meses=3, layout=layout, fracao_texto=0.5), (MES_FINAL_PADRAO,))
+
+
+def test_valores_que_o_sqlite_nao_guarda():
+    # Datas, horas, booleanos, erros de fórmula (NaN) e inteiros fora de 64 bits
+    wb = Workbook()
+    cli = wb.active
+    cli.title = "Infos Clientes"
+    cli.append(["Instalação", "Nome/Razão Social", "CPF/CNPJ"])
+    cli.append([123, "Cliente Um", 11122233344])
+    cli.append([None, "Sem UC", None])
+
+    det = wb.create_sheet("Detalhe Por UC")
+    det.append(["Instalação", "REF (sempre dia 01 de cada mês)", "CONSUMO_FP", "FATURA C/GD",
+                "Valor enviado para emissão", "Conta Contrato", "Endereço"])
+    det.append([123, datetime(2025, 10, 1), True, "#DIV/0!", 30.125, 2 ** 70, time(10, 30)])
+    det.append([None, "2025-10-01", 2.5, "R$ 1.050,50", 10, None, datetime(2025, 1, 2)])
+    det.append([456, datetime(2025, 10, 1), "abc", -1.5, 3, "x", "Rua A"])
+    det.append([789, "sem data", 1, 1, 100, 1, "Rua B"])
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    _confere(buffer.getvalue(), ("2025-10",), "2025-11-10")
+
+
+def test_codificacao_explicita():
+    valores = [None, "texto", 7, 2 ** 70, 1.5, float("nan"), float("inf"), True, False,
+               datetime(2025, 10, 1, 8, 30), date(2025, 1, 2), time(10, 30), timedelta(days=1, seconds=5),
+               pd.Timestamp("2025-10-01"), pd.NaT]
+    for valor in valores:
+        codificado = _codificar(valor)
+        assert codificado is valor or isinstance(codificado, bytes)
+        if isinstance(codificado, bytes):
+            json.loads(codificado)  # JSON marcado, nada de pickle
+        volta = _decodificar(codificado)
+        assert type(volta) is type(valor), valor
+        assert volta == valor or (valor != valor and (volta is pd.NaT or math.isnan(volta)))
+    try:
+        _codificar(object())
+        assert False, "tipo desconhecido deveria falhar"
+    except TypeError:
+        pass
+
+
+def test_reingestao_e_resumo():
+    conteudo = _planilha_exemplo()
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = Path(pasta) / "relatorio.xlsx"
+        caminho.write_bytes(conteudo)
+        db = str(Path(pasta) / "armazem.db")
+
+        primeira = ingerir_relatorio(caminho, db)
+        assert primeira["reaproveitado"] is False and primeira["origem"] == str(caminho)
+        assert ingerir_relatorio(conteudo, db)["reaproveitado"] is True   # mesmo sha256
+        assert ingerir_relatorio(conteudo, db, forcar=True)["reaproveitado"] is False
+
+        resumo = meses_armazenados(db)
+        assert resumo["meses"]["2025-10"] == {"linhas": 2, "emitir": 2}
+        assert resumo["linhas"] == sum(m["linhas"] for m in resumo["meses"].values())
+
+        # Outro relatório substitui o anterior
+        outro = gerar_relatorio_sintetico(10, meses=1)
+        assert ingerir_relatorio(outro, db)["reaproveitado"] is False
+        assert list(meses_armazenados(db)["meses"]) == [MES_FINAL_PADRAO[:7]]
+
+
+def test_busca_por_uc():
+    conteudo = gerar_relatorio_sintetico(30, meses=2, fracao_texto=0.5)
+    with tempfile.TemporaryDirectory() as pasta:
+        db = str(Path(pasta) / "armazem.db")
+        ingerir_relatorio(conteudo, db)
+        registros = json.loads(processar_mes_armazenado(db, MES_FINAL_PADRAO, "2025-12-10"))["data"]
+        for registro in registros[:10]:
+            obtido = json.loads(buscar_cliente_armazenado(db, registro["instalacao"], MES_FINAL_PADRAO, "2025-12-10"))
+            assert obtido["data"] == registro
+            # Só as linhas da UC são lidas
+            leitura = obtido["metrics"]["etapas"][0]
+            assert leitura["etapa"] == "leitura_armazem"
+            assert leitura["linhas"] == sum(r["instalacao"] == registro["instalacao"] for r in registros)
+
+        with closing(sqlite3.connect(db)) as con:
+            plano = " ".join(linha[-1] for linha in con.execute(
+                "EXPLAIN QUERY PLAN SELECT c0 FROM detalhe WHERE mes = 202511 AND uc = 'X' AND emitir = 1"))
+        assert "detalhe_uc" in plano, plano
+
+        nao_achou = json.loads(buscar_cliente_armazenado(db, "99/999-9", MES_FINAL_PADRAO, "2025-12-10"))
+        assert nao_achou["error"].startswith("UC 99/999-9 não encontrada")
+
+        sem_armazem = json.loads(processar_mes_armazenado(str(Path(pasta) / "outro.db"), MES_FINAL_PADRAO, "2025-12-10"))
+        assert sem_armazem["error"].startswith("Armazém não encontrado")
+
+
+if __name__ == "__main__":
+    test_mesmo_resultado_que_a_planilha()
+    test_valores_que_o_sqlite_nao_guarda()
+    test_codificacao_explicita()
+    test_reingestao_e_resumo()
+    test_busca_por_uc()
+    print("✅ armazém de relatórios confere com a planilha")
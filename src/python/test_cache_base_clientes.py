@@ -0,0 +1,68 @@
+"""
+Script de teste: cache em disco da base de clientes externa - o mapa volta do
+JSON igual (inclusive com UC crua e limpa dividindo a mesma ficha), a gravação
+usa um temporário por processo e pastas graváveis por outros são ignoradas.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import os
+import tempfile
+
+from processor_comum import (
+    _ler_cache_base_clientes, _salvar_cache_base_clientes, _arquivo_cache_base_clientes, _pasta_cache,
+)
+
+
+def _mapa():
+    ficha = {"nome": "Cliente Um", "doc": "111"}
+    return {"10/1-1": ficha, "1011": ficha, "20/2-2": {"nome": "Cliente Dois", "doc": ""}}
+
+
+def test_ida_e_volta():
+    with tempfile.TemporaryDirectory() as pasta:
+        base = Path(pasta) / "base.xlsx"
+        base.write_bytes(b"conteudo da base")
+        config = {"client_database_cache_dir": str(Path(pasta) / "cache")}
+
+        assert _ler_cache_base_clientes(str(base), config) is None
+        _salvar_cache_base_clientes(str(base), config, _mapa())
+        arquivo = _arquivo_cache_base_clientes(str(base), config)
+        assert arquivo.suffix == ".json"
+        assert [p.name for p in arquivo.parent.iterdir()] == [arquivo.name]  # temporário já renomeado
+
+        mapa = _ler_cache_base_clientes(str(base), config)
+        assert mapa == _mapa() and list(mapa) == list(_mapa())
+        assert mapa["10/1-1"] is mapa["1011"]
+
+        # Só o mtime mudou: o hash do conteúdo confirma o cache
+        os.utime(base, ns=(0, 0))
+        assert _ler_cache_base_clientes(str(base), config) == _mapa()
+        base.write_bytes(b"outro conteudo!!")
+        assert _ler_cache_base_clientes(str(base), config) is None
+
+
+def test_pasta_gravavel_por_outros():
+    if not hasattr(os, "getuid"):
+        return
+    with tempfile.TemporaryDirectory() as pasta:
+        base = Path(pasta) / "base.xlsx"
+        base.write_bytes(b"conteudo da base")
+        config = {"client_database_cache_dir": str(Path(pasta) / "cache")}
+        _salvar_cache_base_clientes(str(base), config, _mapa())
+        os.chmod(Path(pasta) / "cache", 0o777)
+        assert _ler_cache_base_clientes(str(base), config) is None
+
+
+def test_pasta_padrao_por_usuario():
+    pasta = _pasta_cache({})
+    assert pasta.parent == Path(tempfile.gettempdir())
+    assert pasta.name != "gerador_faturas_egs"
+
+
+if __name__ == "__main__":
+    test_ida_e_volta()
+    test_pasta_gravavel_por_outros()
+    test_pasta_padrao_por_usuario()
+    print("✅ cache da base de clientes ok")
@@ -0,0 +1,70 @@
+"""
+Script de teste: o motor colunar (compute_metrics_frame) deve produzir
+exatamente o mesmo resultado do caminho linha a linha (compute_metrics).
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+import pandas as pd
+
+from processor import compute_metrics, compute_metrics_frame, pick_col, COLUMNS_MAP
+
+
+def _df_exemplo():
+    return pd.DataFrame({
+        "Instalação": ["10/364440-8", "10/10232-7", "10/1035655-8", "10/113971-6", "10/999-1"],
+        "CONSUMO_FP": [2664, "1.234,5", None, 253, "abc"],
+        "CRÉD. CONSUMIDO_FP": [2564, 45, 497, "123", np.nan],
+        "TARIFA FP": [1.2127, "1,11623", 1.00005, None, 0.99995],
+        "Tarifa média compensada sobre energia compensada": [1.2127, 1.0148745519713258, None, 0.91404, 1.00005],
+        "FATURA C/GD": [121.27, "R$ 73,02", 1.005, 2.675, -0.0],
+        "OUTROS": [0, 17.16, "83,24", None, "(1,50)"],
+        "Valor enviado para emissão": [2456.45, "35,96", 378.4, 102.98, "1.234.567,891"],
+        "CUSTO_S_GD ": [3230.7, 120.97, 686.02, 310.16, 0],
+        "CUSTO_C_GD\n(Fatura real+Boleto Gera Final)": [2577.72, 108.98, 700.0, 275.84, 5],
+        "Ganho energia compensada (R$) Final": [652.98, 0, None, -3, 0],
+        "Bairro": ["Centro", None, "", "Vila Nova", " "],
+        "Cidade": ["Campo Grande", "Dourados", None, "", "Corumbá"],
+    })
+
+
+def test_frame_igual_linha_a_linha():
+    df = _df_exemplo()
+    df.columns = [str(c).strip() for c in df.columns]
+    cols_map = {k: pick_col(df, *v) for k, v in COLUMNS_MAP.items()}
+
+    esperado = [compute_metrics(row, cols_map, "2025-12-10") for _, row in df.iterrows()]
+    obtido = compute_metrics_frame(df, cols_map, "2025-12-10").drop(columns=['endereco']).to_dict('records')
+
+    assert obtido == esperado
+
+
+def test_endereco_concatenado_com_fichas():
+    df = _df_exemplo()
+    df.columns = [str(c).strip() for c in df.columns]
+    cols_map = {k: pick_col(df, *v) for k, v in COLUMNS_MAP.items()}
+    fichas = pd.DataFrame([
+        {"endereco": "Rua A, 10", "bairro": "Ignorado", "cidade": ""},
+        {"endereco": "", "bairro": "Jardim"},
+        {},
+        {"endereco": "Av. B"},
+        {"cidade": "Ladário"},
+    ], index=df.index)
+
+    endereco = compute_metrics_frame(df, cols_map, "2025-12-10", fichas)['endereco'].tolist()
+
+    assert endereco == [
+        "Rua A, 10 - Centro - Campo Grande",
+        "Jardim - Dourados",
+        "",
+        "Av. B - Vila Nova",
+        "Corumbá",
+    ]
+
+
+if __name__ == "__main__":
+    test_frame_igual_linha_a_linha()
+    test_endereco_concatenado_com_fichas()
+    print("✅ compute_metrics_frame confere com compute_metrics")
@@ -0,0 +1,36 @@
+"""
+Script de teste: o resultado colunar, remontado linha a linha, é idêntico ao
+resultado em registros (mesmos campos, valores e tipos).
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import json
+
+from processor import processar_relatorio_para_fatura
+from test_multimeses import _planilha_exemplo
+
+
+def test_colunar_igual_a_registros():
+    conteudo = _planilha_exemplo()
+    registros = json.loads(processar_relatorio_para_fatura(conteudo, "2025-10", "2025-11-10"))
+    colunar = json.loads(processar_relatorio_para_fatura(conteudo, "2025-10", "2025-11-10", formato="colunar"))
+
+    colunas = colunar["colunas"]
+    linhas = [{campo: colunas[campo][i] for campo in colunas} for i in range(colunar["total"])]
+
+    assert colunar["formato"] == "colunar"
+    assert json.dumps(linhas) == json.dumps(registros["data"])
+    assert colunar["warnings"] == registros["warnings"]
+
+
+def test_formato_desconhecido():
+    resultado = json.loads(processar_relatorio_para_fatura(_planilha_exemplo(), "2025-10", "2025-11-10", formato="xml"))
+    assert "error" in resultado
+
+
+if __name__ == "__main__":
+    test_colunar_igual_a_registros()
+    test_formato_desconhecido()
+    print("✅ formato colunar confere com o formato em registros")
@@ -0,0 +1,37 @@
+"""
+Script de teste: os relatórios sintéticos (nos dois layouts) são reconhecidos
+pelo processador, com todas as colunas do COLUMNS_MAP mapeadas.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import json
+
+from gerar_relatorio_sintetico import gerar_relatorio_sintetico, formatar_br, MES_FINAL_PADRAO
+from processor import processar_relatorio_para_fatura
+from utils_normalizers import to_num
+
+
+def test_formatar_br():
+    assert formatar_br(1234.5) == "R$ 1.234,50"
+    assert formatar_br(-73.02, prefixo=False) == "-73,02"
+    assert to_num(formatar_br(987654.32)) == 987654.32
+
+
+def test_layouts_processados():
+    for layout in ("padrao", "alternativo"):
+        conteudo = gerar_relatorio_sintetico(40, meses=3, layout=layout, fracao_texto=0.5,
+                                             fracao_sem_cadastro=0, fracao_abaixo_minimo=0)
+        resultado = json.loads(processar_relatorio_para_fatura(conteudo, MES_FINAL_PADRAO, "2025-12-10"))
+
+        assert "error" not in resultado, (layout, resultado.get("error"))
+        assert len(resultado["data"]) == 40, layout
+        assert resultado["warnings"] == [], layout
+        assert all(c["status_mapeamento"] == "OK" and c["totalPagar"] >= 5 for c in resultado["data"]), layout
+
+
+if __name__ == "__main__":
+    test_formatar_br()
+    test_layouts_processados()
+    print("✅ relatórios sintéticos processados nos dois layouts")
@@ -0,0 +1,102 @@
+"""
+Script de teste: resolução do layout do Detalhe com cache por assinatura do
+cabeçalho - mesma resposta com e sem cache, layout novo resolvido de novo e
+relatório de qual alias casou para cada campo.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import io
+import json
+import tempfile
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from excel_utils import WorkbookIndex
+from gerar_relatorio_sintetico import gerar_relatorio_sintetico, MES_FINAL_PADRAO
+from processor import processar_relatorio_para_fatura
+from processor_comum import MedidorEtapas, resolver_layout_detalhe, resolver_colunas_detalhe
+from test_multimeses import _planilha_exemplo
+
+
+def _indice(linhas_antes, cabecalho):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Detalhe Por UC"
+    for linha in linhas_antes:
+        ws.append(linha)
+    ws.append(cabecalho)
+    ws.append(["10/1-1", datetime(2025, 10, 1), 100, 30.5])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return WorkbookIndex.from_source(io.BytesIO(buffer.getvalue()))
+
+
+def test_aliases_vencedores():
+    _, _, aliases = resolver_colunas_detalhe(["Instalação", "Competência", "CUSTO_S_GD", "Valor Boleto"])
+    assert aliases["ref"] == "Competência"
+    assert aliases["boleto_ev"] == "Valor Boleto"
+    assert aliases["custo_sem_gd"] == "CUSTO_S_GD"   # "CUSTO_S_GD " (com espaço) nunca casa
+    assert aliases["uc"] == "INSTALAÇÃO"
+    assert aliases["economia"] is None
+
+
+def test_cache_por_assinatura():
+    cabecalho = ["Instalação", "REF", "CONSUMO_FP", "Valor enviado para emissão"]
+    with tempfile.TemporaryDirectory() as pasta:
+        config = {"client_database_cache_dir": pasta}
+
+        medidor_a, medidor_b = MedidorEtapas(), MedidorEtapas()
+        primeiro = resolver_layout_detalhe(_indice([["RELATÓRIO"]], cabecalho), config, medidor_a)
+        segundo = resolver_layout_detalhe(_indice([["RELATÓRIO"]], cabecalho), config, medidor_b)
+        assert primeiro == segundo == ("Detalhe Por UC", 1, cabecalho, primeiro[3], "Instalação")
+        assert medidor_a.layout["detalhe"]["cache"] == "miss"
+        assert medidor_b.layout["detalhe"]["cache"] == "hit"
+        assert medidor_b.layout["detalhe"]["aliases"]["boleto_ev"] == "Valor enviado para emissão"
+
+        # Linha de título diferente antes do cabeçalho: nada de reaproveitar às cegas
+        medidor = MedidorEtapas()
+        resolver_layout_detalhe(_indice([["OUTRO TÍTULO"]], cabecalho), config, medidor)
+        assert medidor.layout["detalhe"]["cache"] == "miss"
+
+        # Coluna do boleto renomeada: layout novo, com a mudança de alias relatada
+        medidor = MedidorEtapas()
+        novo = resolver_layout_detalhe(_indice([["RELATÓRIO"]], cabecalho[:3] + ["Valor Boleto"]), config, medidor)
+        assert novo[3]["boleto_ev"] == "Valor Boleto"
+        assert medidor.layout["detalhe"]["cache"] == "miss"
+        assert {"campo": "boleto_ev", "antes": "Valor enviado para emissão", "agora": "Valor Boleto"} \
+            in medidor.layout["detalhe"]["mudancas"]
+
+        # Sem aba Detalhe reconhecível
+        assert resolver_layout_detalhe(_indice([], ["Qualquer", "Coisa"]), config) is None
+
+
+def test_cache_desligado():
+    with tempfile.TemporaryDirectory() as pasta:
+        config = {"client_database_cache_dir": pasta, "enable_layout_cache": False}
+        medidor = MedidorEtapas()
+        resolver_layout_detalhe(_indice([], ["Instalação", "REF"]), config, medidor)
+        assert medidor.layout["detalhe"]["cache"] == "off"
+        assert not any(Path(pasta).iterdir())
+
+
+def test_relatorio_no_resultado():
+    for conteudo, alias_ref in ((_planilha_exemplo(), "REF (sempre dia 01 de cada mês)"),
+                                (gerar_relatorio_sintetico(10, 1, layout="alternativo"), "Competência")):
+        mes = "2025-10" if alias_ref.startswith("REF") else MES_FINAL_PADRAO
+        for _ in range(2):
+            resultado = json.loads(processar_relatorio_para_fatura(conteudo, mes, "2025-12-10"))
+            assert "error" not in resultado
+            layout = resultado["metrics"]["layout"]["detalhe"]
+            assert layout["aliases"]["ref"] == alias_ref
+        assert layout["cache"] in ("hit", "off")
+
+
+if __name__ == "__main__":
+    test_aliases_vencedores()
+    test_cache_por_assinatura()
+    test_cache_desligado()
+    test_relatorio_no_resultado()
+    print("✅ cache de layout ok")
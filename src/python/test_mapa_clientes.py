@@ -0,0 +1,68 @@
+"""
+Script de teste: criar_mapa_completo_clientes indexa cada ficha pela UC
+original e pela UC limpa (mesmo objeto), ignorando UCs vazias; o join das
+UCs do mês usa a chave original primeiro e a limpa depois.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+import pandas as pd
+
+from processor import criar_mapa_completo_clientes, tabela_clientes, juntar_fichas_clientes
+
+
+def test_chaves_original_e_limpa():
+    df = pd.DataFrame({
+        "Instalação": ["10/364440-8", np.nan, " nan ", "", 123.0, "10/364440-8"],
+        "Nome/Razão Social": ["Antigo", "X", "Y", "Z", 1.5, " Novo "],
+        "CPF/CNPJ": ["111", "2", "3", "4", np.nan, "999"],
+    })
+
+    mapa = criar_mapa_completo_clientes(df)
+
+    assert list(mapa) == ["10/364440-8", "103644408", "123.0", "1230"]
+    assert mapa["10/364440-8"] == {"nome": "Novo", "doc": "999"}  # última linha prevalece
+    assert mapa["10/364440-8"] is mapa["103644408"]
+    assert mapa["123.0"] == {"nome": "1.5", "doc": ""}
+
+
+def test_sem_coluna_uc():
+    assert criar_mapa_completo_clientes(pd.DataFrame({"Nome": ["A"]})) == {}
+
+
+def test_join_chave_original_depois_limpa():
+    mapa = {
+        "10/1-2": {"nome": "Original"},
+        "1012": {"nome": "Limpa", "doc": "9"},
+        "AB": {},
+    }
+    raw_ids = pd.Series(["10/1-2", "101-2", "a-b", "zz"], index=[7, 8, 9, 10])
+
+    fichas, mapeado = juntar_fichas_clientes(raw_ids, tabela_clientes(mapa))
+
+    assert fichas["nome"].tolist()[:2] == ["Original", "Limpa"]
+    assert fichas["nome"].iloc[2:].isna().all()
+    assert mapeado.tolist() == [True, True, False, False]  # ficha vazia conta como não mapeada
+    assert list(fichas.index) == [7, 8, 9, 10]
+
+
+def test_tabela_so_com_as_ucs_do_mes():
+    mapa = {f"{i}/1-1": {"nome": f"Cliente {i}", "doc": str(i)} for i in range(500)}
+    mapa.update({"77": {"nome": "Só limpa"}, "AB": {}})
+    raw_ids = pd.Series(["3/1-1", "3/1-1", "7-7", "a-b", "zz", "499/1-1"], index=[5, 6, 7, 8, 9, 10])
+
+    tabela = tabela_clientes(mapa, raw_ids)
+    assert sorted(tabela.index) == ["3/1-1", "499/1-1", "77", "AB"]
+    completo = juntar_fichas_clientes(raw_ids, tabela_clientes(mapa))
+    parcial = juntar_fichas_clientes(raw_ids, tabela)
+    assert parcial[0].equals(completo[0]) and parcial[1].equals(completo[1])
+
+
+if __name__ == "__main__":
+    test_chaves_original_e_limpa()
+    test_sem_coluna_uc()
+    test_join_chave_original_depois_limpa()
+    test_tabela_so_com_as_ucs_do_mes()
+    print("✅ criar_mapa_completo_clientes/juntar_fichas_clientes ok")
@@ -0,0 +1,71 @@
+"""
+Script de teste: o resultado traz o bloco "metrics" com o tempo de cada etapa,
+e as mesmas etapas saem no logger "processor" quando ele está ligado.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import json
+import logging
+
+from processor import processar_relatorio_para_fatura
+from processor_comum import MedidorEtapas, _json_com_metricas
+from test_multimeses import _planilha_exemplo
+
+ETAPAS = ["abertura_planilha", "cabecalhos", "leitura_detalhe", "filtro_data",
+          "base_externa", "base_interna", "mescla", "metricas", "serializacao"]
+
+
+class _Coletor(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.etapas = []
+
+    def emit(self, record):
+        self.etapas.append(record.etapa)
+
+
+def test_metricas_por_etapa():
+    coletor = _Coletor()
+    log = logging.getLogger("processor")
+    nivel_anterior = log.level
+    log.addHandler(coletor)
+    log.setLevel(logging.INFO)
+    try:
+        resultado = json.loads(processar_relatorio_para_fatura(_planilha_exemplo(), "2025-10", "2025-11-10"))
+    finally:
+        log.removeHandler(coletor)
+        log.setLevel(nivel_anterior)
+
+    etapas = resultado["metrics"]["etapas"]
+    assert [e["etapa"] for e in etapas] == ETAPAS
+    assert all(e["segundos"] >= 0 for e in etapas)
+    por_nome = {e["etapa"]: e for e in etapas}
+    assert por_nome["leitura_detalhe"]["linhas"] == 2
+    assert por_nome["filtro_data"]["linhas"] == 5   # todas as linhas do Detalhe passam pelo filtro
+    assert por_nome["metricas"]["linhas"] == 2
+    assert coletor.etapas == etapas
+
+
+def test_serializacao():
+    for resultado, linhas in (({"data": [{"a": 1}, {"a": 2}], "warnings": []}, 2),
+                              ({"data": {"a": 1, "b": 2, "c": 3}, "warnings": []}, 1),   # um registro só
+                              ({"formato": "colunar", "total": 5, "colunas": {}}, 5),
+                              ({"error": "x"}, None)):
+        corpo = _json_com_metricas(resultado, MedidorEtapas())
+        lido = json.loads(corpo)
+        assert list(lido)[-1] == "metrics" and "metrics" not in resultado
+        assert lido["metrics"]["etapas"][-1]["etapa"] == "serializacao"
+        assert lido["metrics"]["etapas"][-1]["linhas"] == linhas
+    try:
+        _json_com_metricas({"data": [object()]}, MedidorEtapas())
+        assert False, "objeto não serializável deveria falhar"
+    except TypeError:
+        pass
+
+
+if __name__ == "__main__":
+    test_metricas_por_etapa()
+    test_serializacao()
+    print("✅ metrics por etapa ok")
@@ -0,0 +1,63 @@
+"""
+Script de teste: processar_relatorio_multimeses (uma leitura da planilha) deve
+devolver, para cada competência, o mesmo que processar_relatorio_para_fatura.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import io
+import json
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from processor import processar_relatorio_para_fatura, processar_relatorio_multimeses
+
+
+def _planilha_exemplo():
+    wb = Workbook()
+    cli = wb.active
+    cli.title = "Infos Clientes"
+    cli.append(["Instalação", "Nome/Razão Social", "CPF/CNPJ"])
+    cli.append(["10/1-1", "Cliente Um", "111"])
+    cli.append(["10/2-2", "Cliente Dois", "222"])
+
+    det = wb.create_sheet("Detalhe Por UC")
+    det.append(["Instalação", "REF (sempre dia 01 de cada mês)", "CONSUMO_FP",
+                "FATURA C/GD", "Valor enviado para emissão", "Conta Contrato"])
+    det.append(["10/1-1", datetime(2025, 9, 1), 100, 50.5, 30.25, 123])
+    det.append(["10/2-2", datetime(2025, 9, 1), 200, 80, 2.0, None])   # boleto < 5
+    det.append(["10/1-1", "01/10/2025", 110, "55,10", "31,40", 123])
+    det.append(["10/3-3", datetime(2025, 10, 1), 90, "abc", 12, 456])  # sem cadastro
+    det.append(["10/2-2", datetime(2025, 11, 1), 210, 82, 45.9, 789])
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def test_lote_igual_a_meses_separados():
+    conteudo = _planilha_exemplo()
+    competencias = [
+        ("2025-09-01", "2025-10-10"),
+        ("2025-10", "2025-11-10"),
+        ("2025-12-01", "2026-01-10"),  # sem registros
+        ("2025-10-01", "2025-11-20"),
+    ]
+
+    lote = json.loads(processar_relatorio_multimeses(conteudo, competencias))["resultados"]
+
+    assert [(r["mes_referencia"], r["vencimento"]) for r in lote] == competencias
+    for (mes, venc), resultado in zip(competencias, lote):
+        separado = json.loads(processar_relatorio_para_fatura(conteudo, mes, venc))
+        separado.pop("metrics")
+        resultado = {k: v for k, v in resultado.items() if k not in ("mes_referencia", "vencimento")}
+        assert resultado == separado, mes
+    assert [len(r.get("data", [])) for r in lote] == [1, 2, 0, 2]
+    assert "error" in lote[2]
+
+
+if __name__ == "__main__":
+    test_lote_igual_a_meses_separados()
+    print("✅ processar_relatorio_multimeses confere com os meses processados um a um")
@@ -0,0 +1,38 @@
+"""
+Script de teste: o fluxo NDJSON (processar_relatorio_ndjson) traz os mesmos
+clientes e warnings do JSON único, na mesma ordem, e fecha com o resumo.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import json
+
+from processor import processar_relatorio_para_fatura, processar_relatorio_ndjson
+from test_multimeses import _planilha_exemplo
+
+
+def test_ndjson_igual_ao_json_unico():
+    conteudo = _planilha_exemplo()
+    completo = json.loads(processar_relatorio_para_fatura(conteudo, "2025-10", "2025-11-10"))
+
+    linhas = list(processar_relatorio_ndjson(conteudo, "2025-10", "2025-11-10", tamanho_lote=1))
+    registros = [json.loads(linha) for linha in linhas]
+
+    assert all(linha.endswith("\n") for linha in linhas)
+    assert [r["data"] for r in registros if r["type"] == "cliente"] == completo["data"]
+    assert [r for r in registros if r["type"] == "warning"] == completo["warnings"]
+    resumo = registros[-1]
+    assert resumo.pop("metrics")["etapas"]
+    assert resumo == {"type": "resumo", "mes_referencia": "2025-10", "clientes": 2, "warnings": 2}
+
+
+def test_ndjson_erro():
+    registros = [json.loads(l) for l in processar_relatorio_ndjson(_planilha_exemplo(), "2019-01", "2019-02-10")]
+    assert len(registros) == 1 and registros[0]["type"] == "error"
+
+
+if __name__ == "__main__":
+    test_ndjson_igual_ao_json_unico()
+    test_ndjson_erro()
+    print("✅ processar_relatorio_ndjson confere com processar_relatorio_para_fatura")
@@ -0,0 +1,239 @@
+"""
+Script de teste: validação dos PDFs (pdf_value_validator.py) - em lote, em
+paralelo e em modo contínuo, com manifesto, conciliação com o processador e
+saída por registro.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import os
+import csv
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pdfplumber")
+
+import pdf_value_validator
+from pdf_value_validator import (processar_pasta, validar_pdf, validar_em_paralelo, NOME_MANIFESTO,
+                                 carregar_esperados, conciliar, gerar_relatorio, uc_do_arquivo, vigiar_pasta)
+
+PASTA_PDFS_EXEMPLO = Path(__file__).resolve().parents[2] / "validados_divergentes"
+
+
+def _pasta_com_pdfs(destino: Path):
+    for pdf in sorted(PASTA_PDFS_EXEMPLO.glob("*.pdf")):
+        shutil.copy2(pdf, destino / pdf.name)
+    (destino / "UC_000_corrompido.pdf").write_bytes(b"%PDF-1.4 quebrado")
+
+
+def test_paralelo_igual_ao_sequencial():
+    """
+    Com pool de processos: mesmos resultados, na mesma ordem, da execução
+    sequencial; o PDF corrompido vira erro sem derrubar o lote.
+    """
+    with tempfile.TemporaryDirectory() as seq, tempfile.TemporaryDirectory() as par:
+        _pasta_com_pdfs(Path(seq))
+        _pasta_com_pdfs(Path(par))
+
+        esperado = processar_pasta(seq, mover_arquivos=False)
+        obtido = processar_pasta(par, mover_arquivos=True, workers=2, timeout=60)
+
+        nomes = [r['arquivo'] for r in obtido]
+        assert nomes == sorted(nomes)
+        assert [(r['arquivo'], r['valor_pagina1'], r['valor_pagina2'], r['divergente']) for r in obtido] == \
+               [(r['arquivo'], r['valor_pagina1'], r['valor_pagina2'], r['divergente']) for r in esperado]
+        assert obtido[0]['erro']
+        # Movidos pelo processo principal: nada sobra na origem
+        assert not list(Path(par).glob("*.pdf"))
+        assert len(list((Path(par) / "validados_divergentes").glob("*.pdf"))) == 3
+
+
+def _validar_travando(caminho):
+    # Worker que nunca termina o PDF "travado" (os demais seguem normais)
+    if "travado" in Path(caminho).name:
+        time.sleep(600)
+    return validar_pdf(caminho)
+
+
+def test_tempo_limite_por_arquivo():
+    """
+    Um PDF que trava estoura o tempo limite e sai com erro; os demais saem na
+    ordem de entrada. Com um worker só, os PDFs depois do travado só podem ser
+    validados pelo pool novo, montado depois de descartar o antigo.
+    """
+    original = pdf_value_validator.validar_pdf
+    pdf_value_validator.validar_pdf = _validar_travando
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            pasta = Path(pasta)
+            a, b = sorted(PASTA_PDFS_EXEMPLO.glob("*.pdf"))
+            caminhos = [pasta / nome for nome in ("UC_1_a.pdf", "UC_2_travado.pdf", "UC_3_b.pdf", "UC_4_a.pdf")]
+            for destino, origem in zip(caminhos, (a, a, b, a)):
+                shutil.copy2(origem, destino)
+
+            inicio = time.perf_counter()
+            saida = list(validar_em_paralelo([str(c) for c in caminhos], workers=1, timeout=5))
+            assert time.perf_counter() - inicio < 60
+
+        assert [caminho for caminho, _ in saida] == [str(c) for c in caminhos]
+        resultados = [r for _, r in saida]
+        assert "Tempo limite excedido" in resultados[1]['erro']
+        for r, origem in zip((resultados[0], resultados[2], resultados[3]), (a, b, a)):
+            assert r['erro'] is None, r
+            assert r['valor_pagina1'] == validar_pdf(str(origem))['valor_pagina1']
+    finally:
+        pdf_value_validator.validar_pdf = original
+
+
+def test_recorte_igual_a_pagina_inteira():
+    """A leitura por recorte acha os mesmos valores que a página inteira."""
+    for pdf in sorted(PASTA_PDFS_EXEMPLO.glob("*.pdf")):
+        recorte, inteira = validar_pdf(str(pdf)), validar_pdf(str(pdf), recortar=False)
+        assert recorte.pop('tempo_extracao') >= 0 and inteira.pop('tempo_extracao') >= 0
+        assert recorte == inteira
+
+
+def test_manifesto_revalida_so_o_que_mudou():
+    """O manifesto evita revalidar PDFs que não mudaram."""
+    validados = []
+    original = pdf_value_validator.validar_pdf
+    def validar_contando(caminho):
+        validados.append(Path(caminho).name)
+        return original(caminho)
+
+    pdf_value_validator.validar_pdf = validar_contando
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            pasta = Path(pasta)
+            _pasta_com_pdfs(pasta)
+            primeira = processar_pasta(str(pasta), mover_arquivos=False)
+            assert len(validados) == 3
+            assert (pasta / NOME_MANIFESTO).exists()
+
+            # Só o mtime mudou (hash igual): reaproveita; o corrompido (erro) é revalidado
+            validados.clear()
+            a, b = sorted(PASTA_PDFS_EXEMPLO.glob("*.pdf"))
+            os.utime(pasta / a.name, (1, 1))
+            segunda = processar_pasta(str(pasta), mover_arquivos=False)
+            assert validados == ["UC_000_corrompido.pdf"]
+            assert [(r['arquivo'], r['valor_pagina1'], r['divergente']) for r in segunda] == \
+                   [(r['arquivo'], r['valor_pagina1'], r['divergente']) for r in primeira]
+
+            # Conteúdo trocado: revalida e registra os novos valores
+            validados.clear()
+            shutil.copy2(b, pasta / a.name)
+            # Temporário de outra execução na mesma pasta: a compactação não mexe nele
+            alheio = (pasta / NOME_MANIFESTO).with_suffix(".tmp")
+            alheio.write_text("outra execução\n", encoding="utf-8")
+            terceira = processar_pasta(str(pasta), mover_arquivos=False)
+            assert validados == ["UC_000_corrompido.pdf", a.name]
+            assert terceira[1]['valor_pagina1'] == primeira[2]['valor_pagina1']
+            assert len((pasta / NOME_MANIFESTO).read_text(encoding="utf-8").splitlines()) == 3
+            assert alheio.read_text(encoding="utf-8") == "outra execução\n"
+            assert [p.name for p in pasta.glob("*.tmp")] == [alheio.name]
+    finally:
+        pdf_value_validator.validar_pdf = original
+
+
+def test_conciliacao_com_processador():
+    """A conciliação confere os PDFs com a saída do processador."""
+    assert uc_do_arquivo("UC_1015487416_20251130.pdf") == "1015487416"
+    assert uc_do_arquivo("1015487416_FULANO DE TAL_20251130.pdf") == "1015487416"
+    # O gerador mantém pontos, espaços etc. da UC; a chave é a mesma do carregar_esperados
+    assert uc_do_arquivo("10.154 8741a6_FULANO_20251130.pdf") == "101548741A6"
+    assert uc_do_arquivo("..._FULANO_20251130.pdf") is None
+
+    with tempfile.TemporaryDirectory() as pasta:
+        pasta = Path(pasta)
+        _pasta_com_pdfs(pasta)
+        # Saída do processador (formato colunar): 10/1548741-6 bate com a página 2
+        # mas não com a página 1; 10/395471-6 não bate com nenhuma; 10/999-9 ficou sem PDF
+        saida = pasta / "processado.json"
+        saida.write_text(json.dumps({
+            "formato": "colunar", "total": 3, "warnings": [],
+            "colunas": {"instalacao": ["10/1548741-6", "10/395471-6", "10/999-9"],
+                        "totalPagar": [119.45, 150.0, 80.0]},
+        }), encoding="utf-8")
+        esperados = carregar_esperados(str(saida))
+        assert set(esperados) == {"1015487416", "103954716", "109999"}
+
+        resultados = processar_pasta(str(pasta), mover_arquivos=False, usar_manifesto=False, esperados=esperados)
+        por_arquivo = {r['arquivo']: r for r in resultados}
+        assert por_arquivo["UC_1015487416_20251130.pdf"]['valor_esperado'] == 119.45
+        assert por_arquivo["UC_1015487416_20251130.pdf"]['divergente_esperado'] is True
+        assert por_arquivo["UC_103954716_20251130.pdf"]['divergente_esperado'] is True
+
+        conciliacao = conciliar(resultados, esperados)
+        assert [r['arquivo'] for r in conciliacao['diferentes']] == [
+            "UC_1015487416_20251130.pdf", "UC_103954716_20251130.pdf"]
+        assert conciliacao['faltando'] == ["10/999-9"]
+        assert conciliacao['inesperados'] == ["UC_000_corrompido.pdf"]
+        assert "10/999-9" in gerar_relatorio(resultados, esperados=esperados)
+
+
+def test_vigiar_pasta_valida_conforme_chegam():
+    """O modo contínuo (vigiar_pasta) valida os PDFs conforme chegam."""
+    with tempfile.TemporaryDirectory() as pasta:
+        pasta = Path(pasta)
+        pdfs = sorted(PASTA_PDFS_EXEMPLO.glob("*.pdf"))
+
+        def gerador():
+            # Primeiro PDF gravado em duas partes, como um ZIP sendo extraído
+            conteudo = pdfs[0].read_bytes()
+            with open(pasta / pdfs[0].name, 'wb') as f:
+                f.write(conteudo[:len(conteudo) // 2])
+                f.flush()
+                time.sleep(0.05)
+                f.write(conteudo[len(conteudo) // 2:])
+            time.sleep(0.5)
+            shutil.copy2(pdfs[1], pasta / pdfs[1].name)
+
+        escritor = threading.Thread(target=gerador)
+        escritor.start()
+        resultados = vigiar_pasta(str(pasta), workers=2, intervalo=0.2, encerrar_ocioso=1.5, usar_manifesto=False)
+        escritor.join()
+
+        assert sorted(r['arquivo'] for r in resultados) == [p.name for p in pdfs]
+        assert all(r['erro'] is None for r in resultados)
+        assert not list(pasta.glob("*.pdf"))
+        assert len(list((pasta / "validados_divergentes").glob("*.pdf"))) == 2
+
+
+def test_saida_por_registro_sem_guardar_resultados():
+    """A saída por registro (CSV/JSONL) dispensa guardar os resultados."""
+    with tempfile.TemporaryDirectory() as pasta:
+        pasta = Path(pasta)
+        _pasta_com_pdfs(pasta)
+        for extensao in ("csv", "jsonl"):
+            saida = pasta / f"registros.{extensao}"
+            resultados = processar_pasta(str(pasta), mover_arquivos=False, usar_manifesto=False,
+                                         saida=str(saida), guardar_resultados=False)
+            assert resultados == []
+            if extensao == "csv":
+                with open(saida, encoding="utf-8-sig", newline="") as f:
+                    registros = list(csv.DictReader(f))
+            else:
+                registros = [json.loads(l) for l in saida.read_text(encoding="utf-8").splitlines()]
+            assert [r['arquivo'] for r in registros] == [
+                "UC_000_corrompido.pdf", "UC_1015487416_20251130.pdf", "UC_103954716_20251130.pdf"]
+            assert [r['veredito'] for r in registros] == ["erro", "divergente", "divergente"]
+            assert float(registros[1]['valor_pagina1']) == 125.7
+            assert float(registros[1]['diferenca']) == 6.25
+            assert all(float(r['tempo_extracao']) >= 0 for r in registros)
+
+
+if __name__ == "__main__":
+    test_paralelo_igual_ao_sequencial()
+    test_tempo_limite_por_arquivo()
+    test_recorte_igual_a_pagina_inteira()
+    test_manifesto_revalida_so_o_que_mudou()
+    test_conciliacao_com_processador()
+    test_vigiar_pasta_valida_conforme_chegam()
+    test_saida_por_registro_sem_guardar_resultados()
+    print("✅ pdf_value_validator ok")
@@ -0,0 +1,87 @@
+"""
+Script de teste: o lote em paralelo grava um JSON por planilha (igual ao
+processamento individual) e o resumo consolidado.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import json
+import multiprocessing
+import os
+import tempfile
+
+import processar_lote
+from processor import processar_relatorio_para_fatura
+from processar_lote import listar_relatorios, main
+from test_multimeses import _planilha_exemplo
+
+
+def test_lote_em_paralelo():
+    with tempfile.TemporaryDirectory() as pasta:
+        conteudo = _planilha_exemplo()
+        for nome in ("Relatorio_A.xlsx", "Relatorio_B.xlsx"):
+            (Path(pasta) / nome).write_bytes(conteudo)
+        (Path(pasta) / "Relatorio_C.xlsx").write_bytes(b"corrompido")
+        (Path(pasta) / "~$Relatorio_A.xlsx").write_bytes(b"lock")
+
+        assert [Path(a).name for a in listar_relatorios(pasta)] == [
+            "Relatorio_A.xlsx", "Relatorio_B.xlsx", "Relatorio_C.xlsx"]
+
+        saida = Path(pasta) / "saida"
+        codigo = main([pasta, "--mes", "2025-10", "--vencimento", "2025-11-10",
+                       "--jobs", "2", "--saida", str(saida)])
+
+        assert codigo == 1  # Relatorio_C falhou
+        resumo = json.loads((saida / "resumo.json").read_text(encoding="utf-8"))
+        assert (resumo["arquivos"], resumo["ok"], resumo["erros"], resumo["clientes"]) == (3, 2, 1, 4)
+        esperado = json.loads(processar_relatorio_para_fatura(conteudo, "2025-10", "2025-11-10"))
+        obtido = json.loads((saida / "Relatorio_A.json").read_text(encoding="utf-8"))
+        assert obtido.pop("metrics").keys() == esperado.pop("metrics").keys()
+        assert obtido == esperado
+
+
+def test_mesmo_nome_em_pastas_diferentes():
+    with tempfile.TemporaryDirectory() as pasta:
+        for usina in ("usina_1", "usina_2"):
+            (Path(pasta) / usina).mkdir()
+            (Path(pasta) / usina / "relatorio.xlsx").write_bytes(_planilha_exemplo())
+        saida = Path(pasta) / "saida"
+        assert main([str(Path(pasta) / "*" / "relatorio.xlsx"), "--mes", "2025-10", "--vencimento", "2025-11-10",
+                     "--jobs", "1", "--saida", str(saida)]) == 0
+        assert sorted(p.name for p in saida.iterdir()) == [
+            "resumo.json", "usina_1__relatorio.json", "usina_2__relatorio.json"]
+
+
+def _morre_no_b(caminho, *args):
+    if caminho.endswith("Relatorio_B.xlsx"):
+        os._exit(1)
+    return _processar_arquivo_original(caminho, *args)
+
+_processar_arquivo_original = processar_lote.processar_arquivo
+
+
+def test_worker_morto_vira_erro_no_resumo():
+    # O worker herda a troca de função pelo fork; sem fork o cenário não se monta
+    if multiprocessing.get_start_method() != "fork":
+        return
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome in ("Relatorio_A.xlsx", "Relatorio_B.xlsx"):
+            (Path(pasta) / nome).write_bytes(_planilha_exemplo())
+        processar_lote.processar_arquivo = _morre_no_b
+        try:
+            resumo = processar_lote.processar_lote(listar_relatorios(pasta), "2025-10", "2025-11-10",
+                                                   str(Path(pasta) / "saida"), jobs=2)
+        finally:
+            processar_lote.processar_arquivo = _processar_arquivo_original
+        assert resumo["arquivos"] == 2 and resumo["erros"] >= 1
+        erro_b = next(r for r in resumo["resultados"] if r["arquivo"].endswith("Relatorio_B.xlsx"))
+        assert erro_b["status"] == "erro" and "BrokenProcessPool" in erro_b["erro"]
+        assert (Path(pasta) / "saida" / "resumo.json").exists()
+
+
+if __name__ == "__main__":
+    test_lote_em_paralelo()
+    test_mesmo_nome_em_pastas_diferentes()
+    test_worker_morto_vira_erro_no_resumo()
+    print("✅ processar_lote ok")
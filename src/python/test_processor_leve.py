@@ -0,0 +1,110 @@
+"""
+Script de teste: o motor leve (processor_leve.py, sem pandas) devolve o mesmo
+JSON que o processor.py - mesmos clientes, valores, tipos e warnings.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import ast
+import io
+import json
+from datetime import datetime
+
+from openpyxl import Workbook
+
+import processor
+import processor_leve
+from gerar_relatorio_sintetico import gerar_relatorio_sintetico, MES_FINAL_PADRAO
+from test_multimeses import _planilha_exemplo
+
+
+def _sem_metricas(resultado_json):
+    resultado = json.loads(resultado_json)
+    resultado.pop("metrics", None)
+    return json.dumps(resultado)
+
+
+def _confere(conteudo, mes, vencimento, formato="registros"):
+    esperado = _sem_metricas(processor.processar_relatorio_para_fatura(conteudo, mes, vencimento, formato))
+    obtido = _sem_metricas(processor_leve.processar_relatorio_leve(conteudo, mes, vencimento, formato))
+    assert obtido == esperado, (mes, formato, obtido, esperado)
+
+
+def test_exemplo_todos_os_meses():
+    conteudo = _planilha_exemplo()
+    for mes in ("2025-09", "2025-10", "2025-11-01", "2025-12", "2019-01"):
+        for formato in ("registros", "colunar"):
+            _confere(conteudo, mes, "2025-11-10", formato)
+
+
+def test_layouts_sinteticos():
+    for layout in ("padrao", "alternativo"):
+        conteudo = gerar_relatorio_sintetico(30, meses=2, layout=layout, fracao_texto=0.5)
+        _confere(conteudo, MES_FINAL_PADRAO, "2025-12-10")
+
+
+def test_inferencia_de_tipos():
+    # UCs numéricas com vazios (viram "123.0"), booleanos em texto e conta misturada
+    wb = Workbook()
+    cli = wb.active
+    cli.title = "Infos Clientes"
+    cli.append(["Instalação", "Nome/Razão Social", "CPF/CNPJ", "Cidade"])
+    cli.append([123, "Cliente Um", 11122233344, "TRUE"])
+    cli.append([None, "Sem UC", None, None])
+    cli.append([456, "Cliente Dois", "222", "false"])
+
+    det = wb.create_sheet("Detalhe Por UC")
+    det.append(["Instalação", "REF (sempre dia 01 de cada mês)", "CONSUMO_FP",
+                "FATURA C/GD", "Valor enviado para emissão", "Conta Contrato"])
+    det.append([123, datetime(2025, 10, 1), "100", "R$ 1.050,50", 30.125, "77"])
+    det.append([None, datetime(2025, 10, 1), None, None, 10, None])
+    det.append([456, "2025-10-01", 2.5, "-", "12,345", 88.5])
+    det.append([789, datetime(2025, 10, 1), 90, "abc", 7.005, "x"])
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    for formato in ("registros", "colunar"):
+        _confere(buffer.getvalue(), "2025-10", "2025-11-10", formato)
+
+
+def test_erros_iguais():
+    # Arquivo inválido: o traceback muda de motor para motor, o tipo de erro não
+    for motor in (processor.processar_relatorio_para_fatura, processor_leve.processar_relatorio_leve):
+        resultado = json.loads(motor(b"nao e xlsx", "2025-10", "2025-11-10"))
+        assert resultado["error"].startswith("Erro crítico"), motor.__name__
+    wb = Workbook()
+    wb.active.append(["Qualquer", "Coisa"])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    _confere(buffer.getvalue(), "2025-10", "2025-11-10")
+
+
+def _nomes_definidos(modulo):
+    arvore = ast.parse(Path(modulo.__file__).read_text(encoding="utf-8"))
+    nomes = set()
+    for no in arvore.body:
+        if isinstance(no, (ast.FunctionDef, ast.ClassDef)):
+            nomes.add(no.name)
+        elif isinstance(no, ast.Assign):
+            nomes.update(alvo.id for alvo in no.targets if isinstance(alvo, ast.Name))
+    return nomes
+
+
+def test_sem_nomes_repetidos_no_pyodide():
+    # No Pyodide os módulos dividem o escopo global: o que o motor leve define
+    # não pode ser sobrescrito pelos módulos do motor pandas (nem sobrescrevê-los)
+    import calculators_metrics, excel_utils, processor_comum, utils_normalizers
+    leve = _nomes_definidos(processor_leve)
+    for modulo in (processor, processor_comum, excel_utils, utils_normalizers, calculators_metrics):
+        repetidos = leve & _nomes_definidos(modulo)
+        assert not repetidos, (modulo.__name__, repetidos)
+
+
+if __name__ == "__main__":
+    test_exemplo_todos_os_meses()
+    test_layouts_sinteticos()
+    test_inferencia_de_tipos()
+    test_erros_iguais()
+    test_sem_nomes_repetidos_no_pyodide()
+    print("✅ motor leve confere com o motor pandas")
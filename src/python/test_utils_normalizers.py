@@ -0,0 +1,101 @@
+"""
+Script de teste: parse_money_series (colunar) e conversor_de_datas (streaming)
+seguem as mesmas regras das versões escalares (to_num, safe_parse_date), e o
+to_num as mesmas do numero_monetario sem pandas (processor_comum.py, motor leve).
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils_normalizers import (
+    to_num, parse_money_series, safe_parse_date, conversor_de_datas,
+)
+from processor_comum import numero_monetario, periodo_referencia
+
+CASOS = [
+    ("1.234,56", 1234.56),
+    ("1,234.56", 1234.56),
+    ("R$ 1.234,56", 1234.56),
+    ("R$\xa0125,70", 125.70),
+    ("35,96", 35.96),
+    ("35.96", 35.96),
+    ("(1.234,50)", -1234.5),
+    ("-73,02", -73.02),
+    ("—", 0.0),
+    ("-", 0.0),
+    ("", 0.0),
+    ("   ", 0.0),
+    (None, 0.0),
+    (np.nan, 0.0),
+    (2456.45, 2456.45),
+    (12, 12.0),
+    ("abc", 0.0),
+    ("1.234.567", 0.0),
+]
+
+
+def test_escalar():
+    for entrada, esperado in CASOS:
+        assert to_num(entrada) == esperado, entrada
+        assert numero_monetario(entrada) == esperado, entrada
+
+
+def test_colunar_igual_ao_escalar():
+    serie = pd.Series([c[0] for c in CASOS], dtype=object)
+    valores, invalidos = parse_money_series(serie)
+    assert valores.tolist() == [to_num(v) for v in serie]
+    assert invalidos == 2  # "abc" e "1.234.567"
+
+
+def test_textos_repetidos():
+    # Cada texto distinto é convertido uma vez e o valor volta para todas as células
+    textos = ["R$ 1.234,56", "(10,00)", "R$ 1.234,56", "0.12345678901234567", "(10,00)", "x"] * 3
+    valores, invalidos = parse_money_series(pd.Series(textos, dtype=object))
+    assert valores.tolist() == [to_num(v) for v in textos]
+    assert invalidos == 3
+
+
+def test_colunas_so_texto_e_so_numero():
+    texto = pd.Series(["1.234,56", None, "R$ 10,00"])
+    valores, invalidos = parse_money_series(texto)
+    assert valores.tolist() == [1234.56, 0.0, 10.0] and invalidos == 0
+
+    numeros = pd.Series([1.5, np.nan, 3])
+    valores, invalidos = parse_money_series(numeros)
+    assert valores.tolist() == [1.5, 0.0, 3.0] and invalidos == 0
+
+
+def test_datas_em_streaming_igual_ao_escalar():
+    valores = [
+        "01/11/2025", "01/10/2025", "15/11/2025", None, "2025-11-01", "01-11-2025",
+        "5 jul 2025", "xx", 45000, datetime(2025, 1, 1), "01/11/2025 10:30",
+        "2025/04/01", "2025-06-01 10:30", "#N/A",
+    ]
+    # Amostra pequena: o formato dominante (dd/mm/aaaa) é fixado no meio da lista
+    converter = conversor_de_datas(amostra=2)
+    for valor in valores * 2:
+        esperado, obtido = safe_parse_date(valor), converter(valor)
+        assert obtido == esperado or (pd.isna(obtido) and pd.isna(esperado)), valor
+
+
+def test_filtro_por_periodo():
+    converter = conversor_de_datas()
+    datas = [converter(v) for v in ["01/11/2025", "01/10/2025", "15/11/2025"]]
+    periodos = [d.year * 100 + d.month for d in datas]
+    assert [p == periodo_referencia("2025-11") for p in periodos] == [True, False, True]
+    assert periodo_referencia("2025-11-01") == 202511
+
+
+if __name__ == "__main__":
+    test_escalar()
+    test_colunar_igual_ao_escalar()
+    test_textos_repetidos()
+    test_colunas_so_texto_e_so_numero()
+    test_datas_em_streaming_igual_ao_escalar()
+    test_filtro_por_periodo()
+    print("✅ parse_money_series/conversor_de_datas conferem com as versões escalares")
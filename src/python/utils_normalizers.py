@@ -1,8 +1,15 @@
 import pandas as pd
+import numpy as np
 import re
 import unicodedata
 from datetime import datetime
 
+try:
+    from processor_comum import normalizar_texto_monetario, numero_monetario
+except ImportError:
+    # Pyodide: processor_comum.py já foi executado no mesmo escopo global
+    pass
+
 # =================================================================
 # FUNÇÕES DE NORMALIZAÇÃO E CONVERSÃO DE DADOS (src/python/utils_normalizers.py)
 # =================================================================
@@ -25,42 +32,179 @@ def safe_str(val, default="") -> str:
     return s if s else default
 
 def to_num(x) -> float:
-    """Converte valores monetários/numéricos PT-BR para float."""
-    if pd.isna(x): return 0.0
-    if isinstance(x, (int, float)): return float(x)
-    
-    s = str(x).strip()
-    # Tratamento de número negativo entre parênteses
-    neg = False
-    if s.startswith('(') and s.endswith(')'):
-        neg = True
-        s = s[1:-1]
-    
-    # Remove R$, %, espaços
-    s = re.sub(r"[Rr]\$|\%|[A-Za-z]", "", s).replace(" ", "")
-    s = s.replace('—', '0').replace('--', '0').replace('-', '-').strip()
-    
-    if not s or s in {",", ".", "-", "-."}: return 0.0
-    
-    s = s.replace("+", "")
-    # Lógica para distinguir milhar de decimal (1.234,56 -> 1234.56)
-    if "," in s and "." in s:
-        s = s.replace(".", "").replace(",", ".")
-    elif "," in s:
-        s = s.replace(",", ".")
-    
+    """
+    Converte valores monetários/numéricos (BR ou US) para float.
+    Versão escalar de parse_money_series - as duas seguem as mesmas regras
+    (numero_monetario, de processor_comum.py, mais os nulos do pandas).
+    """
     try:
-        v = float(s)
-        return -v if neg else v
-    except ValueError:
+        if pd.isna(x): return 0.0
+    except (TypeError, ValueError):
         return 0.0
+    if isinstance(x, np.number): return float(x)
+    return numero_monetario(x)
+
+_RE_NUMERO_SIMPLES = r'\s*[-+]?\d*\.?\d+\s*'
+
+def _textos_monetarios(textos):
+    """
+    Converte textos monetários distintos (array object) para float.
+
+    Caminho rápido em bloco: tira 'R$', reescreve os separadores BR/US só nas
+    células de cada formato e converte de uma vez o que virou número simples.
+    O resto (negativos entre parênteses, espaços internos, '—', texto livre)
+    passa pelas regras completas de processor_comum, uma a uma - o resultado
+    é sempre o mesmo de to_num.
+
+    Returns:
+        (valores, invalidos): arrays alinhados à entrada (float, bool).
+    """
+    texto = pd.Series(textos, dtype=object).str.replace('R$', '', regex=False)
+
+    # Vírgula decimal (BR: '1.234,56', '1234,56') ou vírgula de milhar (US: '1,234.56')
+    tem_virgula = texto.str.contains(',', regex=False).to_numpy()
+    tem_ponto = texto.str.contains('.', regex=False).to_numpy()
+    br = tem_virgula & ~tem_ponto
+    ambos = np.flatnonzero(tem_virgula & tem_ponto)
+    if len(ambos):
+        # BR quando a última vírgula vem depois do último ponto
+        br[ambos] = texto.iloc[ambos].str.contains(r',[^.]*$', regex=True).to_numpy()
+    us = tem_virgula & tem_ponto & ~br
+    if br.any():
+        texto[br] = texto[br].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    if us.any():
+        texto[us] = texto[us].str.replace(',', '', regex=False)
+
+    # Número simples depois da reescrita: float() direto, em bloco (coluna
+    # inteira de uma vez quando nenhum texto precisa das regras completas)
+    try:
+        valores = np.array(texto.astype(float), dtype=float)
+        simples = ~np.isnan(valores)
+    except ValueError:
+        simples = texto.str.fullmatch(_RE_NUMERO_SIMPLES).to_numpy()
+        valores = np.zeros(len(texto))
+        valores[simples] = texto[simples].astype(float).to_numpy()
+    valores[~simples] = 0.0
+
+    invalidos = np.zeros(len(texto), dtype=bool)
+    for i in np.flatnonzero(~simples):
+        s = textos[i].strip()
+        if s == '': continue
+        s, neg = normalizar_texto_monetario(s)
+        if s is None: continue
+        try: v = float(s)
+        except ValueError: v = np.nan
+        if v != v:
+            invalidos[i] = True
+        else:
+            valores[i] = -v if neg else v
+    return valores, invalidos
+
+def parse_money_series(serie: pd.Series):
+    """
+    Converte uma coluna inteira de valores monetários (BR ou US) para float.
+
+    - Colunas já numéricas são apenas convertidas para float (vazios -> 0.0).
+    - Colunas de texto são tratadas por _textos_monetarios, uma vez por texto
+      distinto (o mesmo valor se repete muito entre UCs e meses).
+
+    Returns:
+        (valores, invalidos): Series float alinhada à entrada e a quantidade
+        de células preenchidas que não puderam ser convertidas (viram 0.0).
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float).fillna(0.0), 0
+
+    valores = serie.astype(object)
+    resultado = np.zeros(len(serie))
+
+    tipo = pd.api.types.infer_dtype(valores, skipna=True)
+    if tipo == 'string':
+        eh_texto = valores.notna().to_numpy()
+    elif tipo == 'empty':
+        return pd.Series(resultado, index=serie.index), 0
+    elif tipo in ('mixed', 'mixed-integer'):
+        eh_texto = valores.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    else:  # inclusive 'mixed-integer-float': só números, sem texto
+        eh_texto = np.zeros(len(serie), dtype=bool)
+
+    # Células não-texto (números do Excel, booleanos etc.)
+    outros = ~eh_texto & valores.notna().to_numpy()
+    invalidos = 0
+    if outros.any():
+        numeros = pd.to_numeric(valores[outros], errors='coerce')
+        invalidos += int(numeros.isna().sum())
+        resultado[outros] = numeros.fillna(0.0).to_numpy(dtype=float)
+
+    if eh_texto.any():
+        codigos, distintos = pd.factorize(valores[eh_texto].astype(str).to_numpy(dtype=object))
+        numeros, falhas = _textos_monetarios(distintos)
+        resultado[eh_texto] = numeros[codigos]
+        invalidos += int(falhas[codigos].sum())
+
+    return pd.Series(resultado, index=serie.index), invalidos
+
+_FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
 
 def safe_parse_date(val):
     """Converte um valor para objeto datetime de forma segura."""
-    if pd.isna(val): return None
-    if isinstance(val, (datetime, pd.Timestamp)): return val
-    s = str(val).strip()[:10]
-    for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y'):
-        try: return datetime.strptime(s, fmt)
-        except: continue
-    return None
\ No newline at end of file
+    try:
+        if pd.isna(val): return None
+        if isinstance(val, datetime): return val
+        s = str(val).strip()[:10]  # Pega só a data se tiver hora
+        for fmt in _FORMATOS_DATA:
+            try: return datetime.strptime(s, fmt)
+            except ValueError: continue
+        return pd.to_datetime(val, dayfirst=True)
+    except Exception:
+        return None
+
+def _formato_dominante(textos) -> str:
+    """Formato de _FORMATOS_DATA que converte mais textos da amostra (já cortados em 10 caracteres)."""
+    textos = pd.Series(textos, dtype=object)
+    if textos.empty:
+        return _FORMATOS_DATA[0]
+    acertos = [pd.to_datetime(textos, format=fmt, errors='coerce').notna().sum() for fmt in _FORMATOS_DATA]
+    return _FORMATOS_DATA[int(np.argmax(acertos))]
+
+_MAX_DATAS_EM_CACHE = 4096
+
+def conversor_de_datas(amostra: int = 200):
+    """
+    Devolve uma função valor -> datetime (ou None) com o mesmo resultado de
+    safe_parse_date, para células que chegam uma a uma (leitura linha a linha
+    da aba Detalhe).
+
+    Os primeiros `amostra` textos definem o formato dominante
+    (_formato_dominante), que daí em diante é tentado antes dos demais (os
+    formatos de _FORMATOS_DATA não se sobrepõem, então a ordem não muda o
+    resultado); o que não casar segue para o safe_parse_date. Textos repetidos (a REF se repete em todas as UCs do mês)
+    são convertidos uma vez só.
+    """
+    vistos = []
+    convertidos = {}
+    formato = None
+
+    def converter(val):
+        nonlocal formato
+        if val is None: return None
+        if isinstance(val, datetime): return val
+        if not isinstance(val, str): return safe_parse_date(val)
+        if val in convertidos: return convertidos[val]
+
+        data = None
+        texto = val.strip()[:10]
+        if formato is not None:
+            try: data = datetime.strptime(texto, formato)
+            except ValueError: pass
+        else:
+            vistos.append(texto)
+            if len(vistos) >= amostra:
+                formato = _formato_dominante(vistos)
+        if data is None:
+            data = safe_parse_date(val)
+        if len(convertidos) < _MAX_DATAS_EM_CACHE:
+            convertidos[val] = data
+        return data
+
+    return converter